@@ -7,21 +7,76 @@ MongoDB数据库初始化脚本
 
 import sys
 import os
+import atexit
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 # 添加项目根目录到路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from pymongo import UpdateOne
+from pymongo.errors import ConfigurationError, OperationFailure
+
 from utils.config_manager import ConfigManager
 from utils.database_manager import DatabaseManager
 
 
+def _tuned_client_kwargs() -> dict:
+    """初始化工具使用的连接池参数：小而预热的连接池，适合短生命周期的CLI"""
+    return {
+        'minPoolSize': 2,
+        'maxPoolSize': 10,
+        'maxIdleTimeMS': 30000,
+        'socketTimeoutMS': 45000,
+        'serverSelectionTimeoutMS': 5000,
+        'retryWrites': True
+    }
+
+
+@lru_cache(maxsize=1)
+def _get_managers():
+    """获取共享的配置管理器和数据库管理器（各子命令复用同一连接池）"""
+    config_manager = ConfigManager()
+    db_manager = DatabaseManager(config_manager, client_kwargs=_tuned_client_kwargs())
+    atexit.register(db_manager.close)
+    return config_manager, db_manager
+
+
+def _save_sample_chats(db_manager: DatabaseManager, session_id: str,
+                       chat_records: list) -> int:
+    """
+    在一个事务中写入示例聊天记录并更新会话计数
+    
+    单机版mongod不支持事务，此时回退为非事务写入
+    
+    Returns:
+        成功插入的记录数
+    """
+    def _write(client_session):
+        inserted_count = db_manager.save_chat_records_bulk(
+            chat_records, client_session=client_session
+        )
+        db_manager.update_session(
+            session_id, client_session=client_session, message_count=inserted_count
+        )
+        return inserted_count
+    
+    try:
+        with db_manager.get_client().start_session() as client_session:
+            return client_session.with_transaction(_write)
+    except (OperationFailure, ConfigurationError) as e:
+        print(f"⚠️ 当前MongoDB不支持事务，改用普通写入: {e}")
+    
+    inserted_count = db_manager.save_chat_records_bulk(chat_records)
+    db_manager.update_session(session_id, message_count=inserted_count)
+    return inserted_count
+
+
 def create_sample_data():
     """创建示例数据"""
     
     # 初始化配置和数据库管理器
-    config_manager = ConfigManager()
-    db_manager = DatabaseManager(config_manager)
+    config_manager, db_manager = _get_managers()
     
     if not db_manager.is_connected():
         print("❌ 数据库连接失败，无法创建示例数据")
@@ -29,16 +84,23 @@ def create_sample_data():
     
     print("📝 创建示例数据...")
     
+    # 结果信息先缓冲，最后一次性输出
+    msgs = []
+    
     # 创建示例用户
     users_collection = db_manager.get_collection('users')
     
+    now = datetime.utcnow()
+    week_ago = now - timedelta(days=7)
+    two_hr_ago = now - timedelta(hours=2)
+    
     sample_users = [
         {
             'user_id': 'default',
             'username': '默认用户',
             'email': 'default@example.com',
-            'created_at': datetime.utcnow(),
-            'last_active': datetime.utcnow(),
+            'created_at': now,
+            'last_active': now,
             'settings': {
                 'preferred_language': 'zh',
                 'enable_tts': True,
@@ -49,8 +111,8 @@ def create_sample_data():
             'user_id': 'user001',
             'username': '测试用户1',
             'email': 'user001@example.com',
-            'created_at': datetime.utcnow() - timedelta(days=7),
-            'last_active': datetime.utcnow() - timedelta(hours=2),
+            'created_at': week_ago,
+            'last_active': two_hr_ago,
             'settings': {
                 'preferred_language': 'zh',
                 'enable_tts': True,
@@ -59,16 +121,15 @@ def create_sample_data():
         }
     ]
     
-    for user in sample_users:
-        try:
-            users_collection.update_one(
-                {'user_id': user['user_id']},
-                {'$set': user},
-                upsert=True
-            )
-            print(f"✅ 用户创建成功: {user['username']}")
-        except Exception as e:
-            print(f"❌ 用户创建失败: {e}")
+    try:
+        result = users_collection.bulk_write(
+            [UpdateOne({'user_id': user['user_id']}, {'$set': user}, upsert=True)
+             for user in sample_users],
+            ordered=False
+        )
+        msgs.append(f"✅ 用户创建成功: 新增 {result.upserted_count} 个，更新 {result.modified_count} 个")
+    except Exception as e:
+        msgs.append(f"❌ 用户创建失败: {e}")
     
     # 创建示例会话
     session_id = db_manager.create_session('default', '示例对话会话')
@@ -99,37 +160,34 @@ def create_sample_data():
             }
         ]
         
-        for i, chat in enumerate(sample_chats):
-            success = db_manager.save_chat_record(
-                user_message=chat['user_message'],
-                ai_response=chat['ai_response'],
-                session_id=session_id,
-                user_id='default',
-                asr_service=chat['asr_service'],
-                ai_service=chat['ai_service'],
-                tts_service=chat['tts_service'],
-                metadata={
+        chat_records = [
+            {
+                **chat,
+                'session_id': session_id,
+                'user_id': 'default',
+                'metadata': {
                     'recognition_time': 2.5 + i * 0.3,
                     'response_time': 1.2 + i * 0.2,
                     'confidence_score': 0.95 - i * 0.02
                 }
-            )
-            
-            if success:
-                print(f"✅ 示例聊天记录 {i+1} 创建成功")
+            }
+            for i, chat in enumerate(sample_chats)
+        ]
         
-        # 更新会话统计
-        db_manager.update_session(session_id, message_count=len(sample_chats))
+        # 写入聊天记录并更新会话统计
+        inserted_count = _save_sample_chats(db_manager, session_id, chat_records)
+        if inserted_count:
+            msgs.append(f"✅ 示例聊天记录创建成功: {inserted_count} 条")
     
-    print("✅ 示例数据创建完成")
+    msgs.append("✅ 示例数据创建完成")
+    print('\n'.join(msgs))
     return True
 
 
 def validate_database_structure():
     """验证数据库结构"""
     
-    config_manager = ConfigManager()
-    db_manager = DatabaseManager(config_manager)
+    config_manager, db_manager = _get_managers()
     
     if not db_manager.is_connected():
         print("❌ 数据库连接失败，无法验证结构")
@@ -142,29 +200,31 @@ def validate_database_structure():
     collection_names = database.list_collection_names()
     
     expected_collections = ['chat_records', 'users', 'sessions']
+    msgs = []
     
     for collection_name in expected_collections:
         if collection_name in collection_names:
             collection = db_manager.get_collection(collection_name)
-            count = collection.count_documents({})
-            print(f"✅ 集合 '{collection_name}' 存在，包含 {count} 条记录")
+            # 基于集合元数据的估算计数，无需扫描文档
+            count = collection.estimated_document_count()
+            msgs.append(f"✅ 集合 '{collection_name}' 存在，包含 {count} 条记录")
             
-            # 检查索引
-            indexes = list(collection.list_indexes())
-            print(f"   索引数量: {len(indexes)}")
-            for index in indexes:
-                print(f"     - {index['name']}: {list(index['key'].keys())}")
+            # 检查索引（一次listIndexes返回全部索引）
+            indexes = collection.index_information()
+            msgs.append(f"   索引数量: {len(indexes)}")
+            for name, spec in indexes.items():
+                msgs.append(f"     - {name}: {[field for field, _ in spec['key']]}")
         else:
-            print(f"⚠️ 集合 '{collection_name}' 不存在")
+            msgs.append(f"⚠️ 集合 '{collection_name}' 不存在")
     
+    print('\n'.join(msgs))
     return True
 
 
 def cleanup_database():
     """清理数据库（仅用于测试）"""
     
-    config_manager = ConfigManager()
-    db_manager = DatabaseManager(config_manager)
+    config_manager, db_manager = _get_managers()
     
     if not db_manager.is_connected():
         print("❌ 数据库连接失败，无法清理")
@@ -174,17 +234,19 @@ def cleanup_database():
     
     database = db_manager.get_database()
     
-    # 删除所有集合的数据（保留结构）
+    # 直接删除集合（元数据操作），随后重建索引以保留结构
     collections = ['chat_records', 'users', 'sessions']
     
     for collection_name in collections:
         try:
-            collection = database[collection_name]
-            result = collection.delete_many({})
-            print(f"✅ 清理集合 '{collection_name}': 删除了 {result.deleted_count} 条记录")
+            deleted_count = database[collection_name].estimated_document_count()
+            database.drop_collection(collection_name)
+            print(f"✅ 清理集合 '{collection_name}': 删除了 {deleted_count} 条记录")
         except Exception as e:
             print(f"❌ 清理集合 '{collection_name}' 失败: {e}")
     
+    db_manager.ensure_indexes()
+    
     print("✅ 数据库清理完成")
     return True
 
@@ -194,8 +256,7 @@ def test_database_operations():
     
     print("🧪 测试数据库操作...")
     
-    config_manager = ConfigManager()
-    db_manager = DatabaseManager(config_manager)
+    config_manager, db_manager = _get_managers()
     
     if not db_manager.is_connected():
         print("❌ 数据库连接失败，无法进行测试")
@@ -219,9 +280,9 @@ def test_database_operations():
         print("✅ 聊天记录保存测试通过")
         
         # 测试查询聊天历史
-        history = db_manager.get_chat_history(session_id=test_session_id)
-        if history:
-            print(f"✅ 聊天历史查询测试通过，找到 {len(history)} 条记录")
+        history_count = db_manager.get_chat_history(session_id=test_session_id, count_only=True)
+        if history_count:
+            print(f"✅ 聊天历史查询测试通过，找到 {history_count} 条记录")
         else:
             print("❌ 聊天历史查询测试失败")
         
@@ -291,8 +352,7 @@ def main():
             
         elif command == 'info':
             print("\n💾 显示数据库信息...")
-            config_manager = ConfigManager()
-            db_manager = DatabaseManager(config_manager)
+            config_manager, db_manager = _get_managers()
             db_manager.print_database_info()
             
         else:
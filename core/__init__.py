@@ -2,6 +2,6 @@
 核心业务模块 - 提供对话管理等核心功能
 """
 
-from .conversation_manager import ConversationManager
+from .conversation_manager import ConversationManager, ConvStats
 
-__all__ = ['ConversationManager'] 
\ No newline at end of file
+__all__ = ['ConversationManager', 'ConvStats'] 
\ No newline at end of file
@@ -4,28 +4,82 @@
 支持聊天记录的数据库存储功能
 """
 
+from __future__ import annotations
+
 import time
-import uuid
-from typing import Optional
+import queue
+import threading
+from datetime import datetime
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple, Optional, TYPE_CHECKING
 from utils.config_manager import ConfigManager
-from utils.menu_helper import MenuHelper
 from utils.database_manager import DatabaseManager
-from services.asr_service import ASRService
-from services.ai_service import AIServiceWithFallback
-from services.tts_service import TTSServiceInterface
-from services.vad_service import VoiceActivityDetector
+from utils.response_cache import SemanticResponseCache
+from utils.log import get_logger, flush_logs
+
+if TYPE_CHECKING:
+    # 仅用于类型注解，服务实例由调用方注入，避免导入时加载音频/模型依赖
+    from services.asr_service import ASRService
+    from services.ai_service import AIServiceWithFallback
+    from services.tts_service import TTSServiceInterface
+    from services.vad_service import VoiceActivityDetector
+
+
+# 各阶段耗时在累计数组中的下标
+_RECOGNITION, _AI, _TTS = 0, 1, 2
+
+# 输出分隔线
+_SEP = '=' * 60
+_TURN_BANNER = f"\n{_SEP}\n🗣️ 开始语音识别+AI对话+TTS合成\n{_SEP}"
+
+# 聊天记录中用于显示的字段
+_HISTORY_FIELDS = itemgetter('timestamp', 'user_message', 'ai_response')
+
+# 对话热路径上的输出使用缓冲日志，在阶段边界统一写出
+logger = get_logger('conversation')
+
+# 后台写库线程每批最多处理的记录数 / 等待新记录的超时（秒）
+_DB_WRITE_BATCH = 16
+_DB_WRITE_TIMEOUT = 0.5
+
+# 等待TTS播放完成的最长时间（秒），TTS后端异常未发出完成信号时不会一直阻塞对话
+_TTS_WAIT_TIMEOUT = 60
+
+
+class ConvStats(NamedTuple):
+    """对话统计信息"""
+    conversation_count: int
+    total_time: float
+    avg_recognition_time: float
+    avg_ai_response_time: float
+    avg_tts_time: float
+    conversations_per_minute: float
 
 
 class ConversationManager:
     """对话管理器"""
     
+    __slots__ = (
+        'config', 'asr_service', 'ai_service', 'tts_service', 'vad_service', 'user_id',
+        '_asr_name', '_ai_name', '_tts_name', '_tts_wait_mode', '_overlap_tts',
+        'db_manager', 'current_session_id', 'enable_database',
+        'conversation_count', 'start_time', '_wall_start', '_deadline', '_means', '_counts',
+        '_last_recognition_time', '_last_ai_response_time', '_last_tts_time',
+        '_executor', '_tts_executor', '_tts_done', '_response_cache',
+        '_db_queue', '_db_writer', '_pause_time', '_timeout',
+        '_stream_tts', '_reply_spoken', '_pending_stream_tts', '_tts_generation', '_meta_tpl',
+        '_stream_asr'
+    )
+    
     def __init__(self, 
                  config_manager: ConfigManager,
                  asr_service: ASRService,
                  ai_service: AIServiceWithFallback,
                  tts_service: Optional[TTSServiceInterface] = None,
                  vad_service: Optional[VoiceActivityDetector] = None,
-                 user_id: str = "default"):
+                 user_id: str = "default",
+                 db_manager: Optional[DatabaseManager] = None):
         """
         初始化对话管理器
         
@@ -36,6 +90,7 @@ class ConversationManager:
             tts_service: TTS语音合成服务（可选）
             vad_service: VAD语音活动检测服务（可选）
             user_id: 用户ID
+            db_manager: 数据库管理器（可选，未传入时按配置创建）
         """
         self.config = config_manager
         self.asr_service = asr_service
@@ -43,6 +98,9 @@ class ConversationManager:
         self.tts_service = tts_service
         self.vad_service = vad_service
         self.user_id = user_id
+        self._refresh_service_state()
+        self._tts_wait_mode = self._detect_tts_wait_mode(tts_service)
+        self.reload_config()
         
         # 初始化数据库管理器
         self.db_manager = None
@@ -51,7 +109,7 @@ class ConversationManager:
         
         if self.enable_database:
             try:
-                self.db_manager = DatabaseManager(config_manager)
+                self.db_manager = db_manager or DatabaseManager(config_manager)
                 if self.db_manager.is_connected():
                     # 创建新会话
                     self.current_session_id = self.db_manager.create_session(self.user_id)
@@ -65,34 +123,82 @@ class ConversationManager:
         else:
             print("💾 数据库存储已禁用")
         
+        # 聊天记录由后台线程写入数据库，不阻塞对话流程
+        self._db_queue = queue.Queue(maxsize=1024)
+        self._db_writer = None
+        if self.enable_database:
+            self._db_writer = threading.Thread(
+                target=self._db_writer_loop, name='chat-record-writer', daemon=True
+            )
+            self._db_writer.start()
+        
         # 对话统计
         self.conversation_count = 0
-        self.start_time = None
-        self.total_recognition_time = 0
-        self.total_ai_response_time = 0
-        self.total_tts_time = 0
+        self.start_time = None  # 单调时钟，用于计算时长
+        self._wall_start = None  # 墙上时钟，仅用于显示开始时间
+        self._deadline = None
+        # 识别 / AI响应 / TTS 各阶段的平均耗时及计入次数（增量更新）
+        self._means = [0.0, 0.0, 0.0]
+        self._counts = [0, 0, 0]
+        # 最近一轮对话各阶段耗时（写入聊天记录元数据）
+        self._last_recognition_time = 0.0
+        self._last_ai_response_time = 0.0
+        self._last_tts_time = 0.0
+        # 聊天记录元数据模板，每轮复制后填入本轮数值
+        self._meta_tpl = {
+            'recognition_time': 0.0,
+            'ai_response_time': 0.0,
+            'tts_time': 0.0,
+            'conversation_round': 0
+        }
+        
+        # 后台任务线程池（如在录音期间预热AI服务）
+        self._executor = ThreadPoolExecutor(max_workers=2)
+        
+        # 异步TTS播放使用单线程执行器，保证按顺序播放；播放结束时设置完成事件
+        self._tts_executor = ThreadPoolExecutor(max_workers=1)
+        self._tts_done = threading.Event()
+        self._tts_done.set()
+        self._reply_spoken = False  # 本轮回复是否已在生成时播放
+        self._pending_stream_tts = None  # 流式回复剩余句子的播放任务
+        self._tts_generation = 0  # 打断播放时递增，使已排队的句子失效
+        
+        # AI回复缓存（相似提问直接复用回复）
+        self._response_cache = SemanticResponseCache.from_config(config_manager)
+        if self._response_cache is not None:
+            print(f"⚡ AI回复缓存已启用（{len(self._response_cache)} 条）")
+        
+        # 麦克风输入流在整个对话期间保持打开，避免每轮重新打开音频设备
+        microphone = getattr(asr_service, 'microphone', None)
+        if hasattr(microphone, 'hold'):
+            microphone.hold()
         
         print("🎯 对话管理器初始化完成")
     
-    def run_single_conversation(self) -> bool:
+    def run_single_conversation(self, async_tts: bool = False) -> bool:
         """
         运行单次对话
         
+        Args:
+            async_tts: 是否异步播放回复（不等待播放完成即返回）
+        
         Returns:
             是否成功完成对话
         """
-        print("\n" + "="*60)
-        print("🗣️ 开始语音识别+AI对话+TTS合成")
-        print("="*60)
+        logger.info(_TURN_BANNER)
         
         try:
+            # 录音期间并行预热AI服务，与语音输入的等待时间重叠
+            if hasattr(self.ai_service, 'warmup'):
+                self._executor.submit(self.ai_service.warmup)
+            
             # 步骤1：语音录制和识别
             user_input = self._record_and_recognize()
             if not user_input:
                 return False
             
             # 步骤2：显示用户输入
-            print(f"\n👤 您说：{user_input}")
+            logger.info("\n👤 您说：%s", user_input)
             
             # 步骤3：获取AI回复
             ai_response = self._get_ai_response(user_input)
@@ -100,24 +206,73 @@ class ConversationManager:
                 return False
             
             # 步骤4：显示AI回复
-            print(f"🤖 AI回复：{ai_response}")
+            logger.info("🤖 AI回复：%s", ai_response)
             
-            # 步骤5：保存聊天记录到数据库
-            self._save_chat_record(user_input, ai_response)
+            # 流式回复在生成时已开始播放，同步模式下等待剩余句子播放完成
+            pending, self._pending_stream_tts = self._pending_stream_tts, None
+            if pending is not None and not self._overlap_tts:
+                pending.result()
             
-            # 步骤6：TTS语音播放
-            if self.tts_service:
-                self._play_tts_response(ai_response)
+            # 步骤5：TTS语音播放（流式回复已在生成时播放）
+            if self.tts_service and not self._reply_spoken:
+                self._play_tts_response(ai_response, async_play=self._overlap_tts or async_tts)
+            
+            # 步骤6：保存聊天记录到数据库（播放已结束时才记录本轮TTS耗时）
+            self._save_chat_record(user_input, ai_response)
             
-            print("="*60)
+            logger.info(_SEP)
             return True
             
         except KeyboardInterrupt:
-            print("\n❌ 用户中断对话")
+            logger.warning("\n❌ 用户中断对话")
             return False
         except Exception as e:
-            print(f"❌ 对话过程中发生错误：{e}")
+            logger.error("❌ 对话过程中发生错误：%s", e)
             return False
+        finally:
+            flush_logs()
+    
+    def reload_config(self):
+        """重新读取对话流程相关的配置项（在ConfigManager.reload_config()之后调用）"""
+        # 不在TTS播放时暂停录音检测：TTS异步播放，同时开始下一轮录音
+        self._overlap_tts = not self.config.get_bool(
+            'TTS_SETTINGS', 'pause_detection_during_tts', True
+        )
+        self._pause_time = self.config.get_float('CONVERSATION', 'response_pause_time', 1.0)
+        self._timeout = self.config.get_float('CONVERSATION', 'conversation_timeout', 300)
+        # 边录音边识别：需要VAD逐块输出音频且ASR服务支持增量识别
+        self._stream_asr = (self.config.get_bool('WHISPER_SETTINGS', 'streaming_recognition', True) and
+                            hasattr(self.vad_service, 'listen_stream') and
+                            hasattr(self.asr_service, 'recognize_stream'))
+    
+    @staticmethod
+    def _service_name(service, default: str) -> str:
+        """
+        获取服务名称（优先使用当前实际服务的名称）
+        
+        Args:
+            service: 服务实例
+            default: 无法获取名称时的默认值
+            
+        Returns:
+            服务名称
+        """
+        if service is None:
+            return default
+        if hasattr(service, 'get_current_service_name'):
+            return service.get_current_service_name()
+        if hasattr(service, 'get_service_name'):
+            return service.get_service_name()
+        return default
+    
+    def _refresh_service_state(self):
+        """更新缓存的服务名称和流式播放模式（服务切换时调用）"""
+        self._asr_name = self._service_name(self.asr_service, 'unknown')
+        self._ai_name = self._service_name(self.ai_service, 'unknown')
+        self._tts_name = self._service_name(self.tts_service, 'none')
+        # AI支持流式回复且启用了TTS时，边生成边按句播放
+        self._stream_tts = (self.tts_service is not None and
+                            getattr(self.ai_service, 'supports_streaming', False))
     
     def _save_chat_record(self, user_message: str, ai_response: str):
         """
@@ -131,41 +286,68 @@ class ConversationManager:
             return
         
         try:
-            # 获取服务名称
-            asr_service_name = self.asr_service.get_service_name() if hasattr(self.asr_service, 'get_service_name') else 'unknown'
-            ai_service_name = self.ai_service.get_current_service_name() if hasattr(self.ai_service, 'get_current_service_name') else 'unknown'
-            tts_service_name = self.tts_service.get_service_name() if self.tts_service and hasattr(self.tts_service, 'get_service_name') else 'none'
-            
-            # 构建元数据
-            metadata = {
-                'recognition_time': getattr(self, '_last_recognition_time', 0),
-                'ai_response_time': getattr(self, '_last_ai_response_time', 0),
-                'tts_time': getattr(self, '_last_tts_time', 0),
-                'conversation_round': self.conversation_count + 1
-            }
-            
-            # 保存到数据库
-            success = self.db_manager.save_chat_record(
-                user_message=user_message,
-                ai_response=ai_response,
-                session_id=self.current_session_id,
-                user_id=self.user_id,
-                asr_service=asr_service_name,
-                ai_service=ai_service_name,
-                tts_service=tts_service_name,
-                metadata=metadata
-            )
+            # 构建元数据（复制后交给写库线程，线程间不共享同一个字典）
+            metadata = self._meta_tpl.copy()
+            metadata['recognition_time'] = self._last_recognition_time
+            metadata['ai_response_time'] = self._last_ai_response_time
+            # 异步播放尚未结束时TTS耗时未知，不记录（避免存入错误的0）
+            if self._tts_done.is_set():
+                metadata['tts_time'] = self._last_tts_time
+            metadata['conversation_round'] = self.conversation_count + 1
             
-            if success:
-                # 更新会话统计
-                self.db_manager.update_session(
-                    self.current_session_id,
-                    message_count=self.conversation_count + 1,
-                    last_activity=self.db_manager._database.client.server_info()['localTime'] if self.db_manager._database else None
-                )
+            # 交给后台写库线程（消息数由数据库管理器按会话累加）
+            self._db_queue.put_nowait({
+                'user_message': user_message,
+                'ai_response': ai_response,
+                'session_id': self.current_session_id,
+                'user_id': self.user_id,
+                'asr_service': self._asr_name,
+                'ai_service': self._ai_name,
+                'tts_service': self._tts_name,
+                'metadata': metadata,
+                'session_updates': {'last_activity': datetime.utcnow()}
+            })
             
+        except queue.Full:
+            logger.warning("⚠️ 聊天记录写入队列已满，本条记录未保存")
         except Exception as e:
-            print(f"⚠️ 保存聊天记录失败: {e}")
+            logger.warning("⚠️ 保存聊天记录失败: %s", e)
+    
+    def _db_writer_loop(self):
+        """后台写库线程：按批取出聊天记录写入数据库，收到None时退出"""
+        while True:
+            try:
+                record = self._db_queue.get(timeout=_DB_WRITE_TIMEOUT)
+            except queue.Empty:
+                # 空闲时写入数据库管理器中超过刷新间隔的缓冲
+                self.db_manager.flush_if_due()
+                continue
+            
+            batch = [record]
+            while record is not None and len(batch) < _DB_WRITE_BATCH:
+                try:
+                    record = self._db_queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(record)
+            
+            try:
+                for record in batch:
+                    if record is not None:
+                        self.db_manager.queue_chat_record(**record)
+            except Exception as e:
+                logger.warning("⚠️ 保存聊天记录失败: %s", e)
+            finally:
+                for _ in batch:
+                    self._db_queue.task_done()
+            
+            if batch[-1] is None:
+                return
+    
+    def _wait_for_db_writes(self):
+        """等待后台写库线程处理完已提交的聊天记录"""
+        if self._db_writer is not None and self._db_writer.is_alive():
+            self._db_queue.join()
     
     def get_chat_history(self, limit: int = 10) -> list:
         """
@@ -181,6 +363,7 @@ class ConversationManager:
             return []
         
         try:
+            self._wait_for_db_writes()
             return self.db_manager.get_chat_history(
                 session_id=self.current_session_id,
                 limit=limit
@@ -203,20 +386,16 @@ class ConversationManager:
             return
         
         print(f"\n📜 最近 {len(history)} 条聊天记录:")
-        print("=" * 60)
+        print(_SEP)
         
+        # 数据库按时间倒序返回，反转后按时间顺序显示
         for i, record in enumerate(reversed(history), 1):
-            timestamp = record.get('timestamp', 'unknown')
-            user_msg = record.get('user_message', '')
-            ai_msg = record.get('ai_response', '')
-            
-            print(f"\n{i}. 时间: {timestamp}")
-            print(f"   👤 用户: {user_msg}")
-            print(f"   🤖 AI: {ai_msg}")
+            timestamp, user_msg, ai_msg = _HISTORY_FIELDS(record)
+            print(f"\n{i}. 时间: {timestamp}\n   👤 用户: {user_msg}\n   🤖 AI: {ai_msg}")
         
-        print("=" * 60)
+        print(_SEP)
     
-    def run_smart_continuous_conversation(self) -> dict:
+    def run_smart_continuous_conversation(self) -> ConvStats:
         """
         运行智能连续对话模式（无需手动交互）
         
@@ -228,20 +407,22 @@ class ConversationManager:
         print("💡 说话会自动识别，静音会自动处理")
         print("⚠️ 按 Ctrl+C 可退出程序")
         
-        self.start_time = time.time()
-        timeout = self.config.get_float('CONVERSATION', 'conversation_timeout', 300)
+        self._mark_start()
+        # 使用单调时钟计算截止时间，不受系统时间调整影响
+        self._deadline = self.start_time + self._timeout
         
         try:
             while True:
                 # 检查对话超时
-                if time.time() - self.start_time > timeout:
-                    print(f"\n⏰ 对话超时（{timeout}秒），自动退出")
+                if time.monotonic() >= self._deadline:
+                    print(f"\n⏰ 对话超时（{self._timeout}秒），自动退出")
                     break
                 
-                print(f"\n🔄 第 {self.conversation_count + 1} 轮对话")
+                logger.info("\n🔄 第 %d 轮对话", self.conversation_count + 1)
                 
-                # 等待TTS播放完成
-                self._wait_for_tts_completion()
+                # 等待TTS播放完成（重叠模式下边播放边录音）
+                if not self._overlap_tts:
+                    self._wait_for_tts_completion()
                 
                 # 运行一轮对话
                 success = self.run_single_conversation()
@@ -250,12 +431,11 @@ class ConversationManager:
                     self.conversation_count += 1
                     
                     # 对话间隔
-                    pause_time = self.config.get_float('CONVERSATION', 'response_pause_time', 1.0)
-                    print(f"⏸️ 等待 {pause_time} 秒后继续...")
-                    time.sleep(pause_time)
+                    logger.info("⏸️ 等待 %s 秒后继续...", self._pause_time)
+                    time.sleep(self._pause_time)
                 else:
                     # 如果识别失败，稍作等待后继续
-                    print("⏸️ 等待 2 秒后重试...")
+                    logger.info("⏸️ 等待 2 秒后重试...")
                     time.sleep(2)
                     
         except KeyboardInterrupt:
@@ -265,7 +445,7 @@ class ConversationManager:
         
         return self._get_conversation_stats()
     
-    def run_manual_continuous_conversation(self) -> dict:
+    def run_manual_continuous_conversation(self) -> ConvStats:
         """
         运行手动连续对话模式（需要按回车）
         
@@ -275,20 +455,23 @@ class ConversationManager:
         print("\n🔄 进入连续对话模式")
         print("💡 说'退出'、'结束'或按Ctrl+C可退出程序")
         
-        self.start_time = time.time()
+        self._mark_start()
         
         try:
             while True:
-                success = self.run_single_conversation()
+                # 回复在后台播放，播放期间即可显示下一轮的提示
+                success = self.run_single_conversation(async_tts=True)
                 
                 if success:
                     self.conversation_count += 1
                     
-                    # 等待TTS播放完成
-                    self._wait_for_tts_completion()
-                    
                 # 询问是否继续
                 choice = input("\n⏭️ 按Enter继续对话，输入'quit'退出：").strip().lower()
+                
+                # 等待TTS播放完成（用户输入期间通常已播放完毕）
+                if success:
+                    self._wait_for_tts_completion()
+                
                 if choice in ['quit', 'q', '退出', '结束']:
                     break
                     
@@ -306,9 +489,13 @@ class ConversationManager:
         Returns:
             识别结果文本
         """
-        start_time = time.time()
+        # 开始录音前写出缓冲的日志，确保提示完整显示
+        flush_logs()
         
         try:
+            if self._stream_asr:
+                return self._record_and_recognize_streaming()
+            
             # 使用VAD进行智能录音
             if self.vad_service:
                 audio_data = self.vad_service.listen_for_speech_with_vad(
@@ -324,19 +511,57 @@ class ConversationManager:
             if not audio_data:
                 return None
             
+            # 用户在TTS播放期间开始新的对话时，打断当前播放
+            if self._overlap_tts and self._is_tts_playing():
+                self._tts_generation += 1
+                self.tts_service.stop_speaking()
+            
             # 语音识别
-            recognition_start = time.time()
+            recognition_start = time.perf_counter()
             result = self.asr_service.recognize_chinese(audio_data)
-            recognition_time = time.time() - recognition_start
+            recognition_time = time.perf_counter() - recognition_start
             
-            self.total_recognition_time += recognition_time
+            self._record_timing(_RECOGNITION, recognition_time)
+            self._last_recognition_time = recognition_time
             
             return result
             
         except Exception as e:
-            print(f"❌ 录音和识别失败：{e}")
+            logger.error("❌ 录音和识别失败：%s", e)
             return None
     
+    def _record_and_recognize_streaming(self) -> Optional[str]:
+        """
+        边录音边识别：录音块逐块交给ASR服务，说话过程中即开始转录
+        
+        Returns:
+            识别结果文本
+        """
+        speech_end = []
+        
+        def _chunks():
+            chunks = self.vad_service.listen_stream(
+                self.asr_service.recognizer, 
+                self.asr_service.microphone
+            )
+            for index, chunk in enumerate(chunks):
+                # 用户在TTS播放期间开始说话时，打断当前播放
+                if not index and self._overlap_tts and self._is_tts_playing():
+                    self._tts_generation += 1
+                    self.tts_service.stop_speaking()
+                yield chunk
+            speech_end.append(time.perf_counter())
+        
+        result = self.asr_service.recognize_stream(_chunks(), language='zh')
+        
+        # 识别耗时从语音结束时算起
+        if speech_end:
+            recognition_time = time.perf_counter() - speech_end[0]
+            self._record_timing(_RECOGNITION, recognition_time)
+            self._last_recognition_time = recognition_time
+        
+        return result
+    
     def _get_ai_response(self, user_input: str) -> Optional[str]:
         """
         获取AI回复
@@ -347,91 +572,291 @@ class ConversationManager:
         Returns:
             AI回复内容
         """
+        self._reply_spoken = False
         try:
-            ai_start = time.time()
-            response = self.ai_service.get_response(user_input)
-            ai_time = time.time() - ai_start
+            ai_start = time.perf_counter()
+            
+            # 优先使用缓存的回复
+            if self._response_cache is not None:
+                cached_response = self._response_cache.lookup(user_input)
+                if cached_response is not None:
+                    logger.info("⚡ 命中AI回复缓存")
+                    ai_time = time.perf_counter() - ai_start
+                    self._record_timing(_AI, ai_time)
+                    self._last_ai_response_time = ai_time
+                    return cached_response
             
-            self.total_ai_response_time += ai_time
+            flush_logs()
+            if self._stream_tts:
+                response = self._stream_response_to_tts(user_input)
+            else:
+                response = self.ai_service.get_response(user_input)
+            ai_time = time.perf_counter() - ai_start
+            
+            self._record_timing(_AI, ai_time)
+            self._last_ai_response_time = ai_time
+            
+            # 只缓存主要服务的回复，回退服务的回复和随时间变化的回复不缓存；
+            # 写入缓存需要计算提问的向量，放到后台线程，与TTS播放同时进行
+            is_cacheable = getattr(self.ai_service, 'is_cacheable', None)
+            if (response and self._response_cache is not None
+                    and not getattr(self.ai_service, 'used_fallback', False)
+                    and (is_cacheable is None or is_cacheable(user_input, response))):
+                self._executor.submit(self._response_cache.add, user_input, response)
             
             return response
             
         except Exception as e:
-            print(f"❌ AI回复获取失败：{e}")
+            logger.error("❌ AI回复获取失败：%s", e)
             return None
     
-    def _play_tts_response(self, text: str):
+    def _stream_response_to_tts(self, user_input: str) -> str:
+        """
+        流式获取AI回复，每生成一个完整句子就交给TTS按顺序播放
+        
+        Args:
+            user_input: 用户输入
+            
+        Returns:
+            完整的AI回复
+        """
+        from services.streaming_tts_enhanced import EnhancedTextChunker
+        
+        parts = []
+        
+        def _collect():
+            for chunk in self.ai_service.stream_response(user_input):
+                parts.append(chunk)
+                yield chunk
+        
+        self._tts_done.clear()
+        self._last_tts_time = 0.0
+        generation = self._tts_generation
+        tts_start = time.perf_counter()
+        
+        # TTS服务自带按句流式播放时，把AI输出的片段直接交给它
+        if hasattr(self.tts_service, 'speak_stream'):
+            chunks = queue.Queue()
+            finished = self._tts_executor.submit(
+                self._speak_stream_and_signal, iter(chunks.get, None), tts_start
+            )
+            try:
+                for chunk in _collect():
+                    self._reply_spoken = True
+                    chunks.put(chunk)
+            finally:
+                chunks.put(None)
+        else:
+            try:
+                for sentence in EnhancedTextChunker.iter_sentences(_collect()):
+                    self._reply_spoken = True
+                    self._tts_executor.submit(self._speak_sentence, sentence, generation)
+            finally:
+                # 所有句子播放完成后记录耗时并设置完成事件
+                finished = self._tts_executor.submit(
+                    self._finish_streamed_tts, tts_start, self._reply_spoken
+                )
+        
+        # AI回复已生成完毕；等待播放完成交给调用方，AI耗时不包含剩余句子的播放时间
+        self._pending_stream_tts = finished
+        return ''.join(parts)
+    
+    def _speak_stream_and_signal(self, chunks, tts_start: float):
+        """
+        由TTS服务边接收AI回复片段边播放，结束后记录耗时并设置完成事件
+        
+        Args:
+            chunks: AI回复片段迭代器
+            tts_start: 开始接收片段的时间
+        """
+        spoken = False
+        try:
+            spoken = self.tts_service.speak_stream(chunks)
+        except Exception as e:
+            logger.error("❌ TTS播放失败：%s", e)
+        finally:
+            self._finish_streamed_tts(tts_start, spoken)
+    
+    def _speak_sentence(self, sentence: str, generation: int):
+        """
+        同步播放一个句子（播放已被打断时跳过）
+        
+        Args:
+            sentence: 句子文本
+            generation: 提交时的播放批次
+        """
+        if generation != self._tts_generation:
+            return
+        
+        try:
+            self.tts_service.speak(sentence, async_play=False)
+        except Exception as e:
+            logger.error("❌ TTS播放失败：%s", e)
+    
+    def _finish_streamed_tts(self, tts_start: float, spoken: bool):
+        """
+        流式播放结束：记录TTS耗时并设置完成事件
+        
+        Args:
+            tts_start: 开始提交句子的时间
+            spoken: 是否播放了句子
+        """
+        if spoken:
+            tts_time = time.perf_counter() - tts_start
+            self._record_timing(_TTS, tts_time)
+            self._last_tts_time = tts_time
+        self._tts_done.set()
+    
+    def _play_tts_response(self, text: str, async_play: bool = False):
         """
         播放TTS回复
         
         Args:
             text: 要播放的文本
+            async_play: 是否异步播放（不等待播放完成）
         """
         if not self.tts_service:
             return
         
+        # 播放前写出AI回复等缓冲的日志
+        flush_logs()
+        
+        self._tts_done.clear()
+        self._last_tts_time = 0.0
+        if async_play:
+            self._tts_executor.submit(self._speak_and_signal, text)
+        else:
+            self._speak_and_signal(text)
+    
+    def _speak_and_signal(self, text: str):
+        """
+        同步播放TTS，结束后设置完成事件
+        
+        Args:
+            text: 要播放的文本
+        """
         try:
-            tts_start = time.time()
+            tts_start = time.perf_counter()
             
-            # 同步播放，等待完成
             success = self.tts_service.speak(text, async_play=False)
             
             if success:
-                tts_time = time.time() - tts_start
-                self.total_tts_time += tts_time
+                tts_time = time.perf_counter() - tts_start
+                self._record_timing(_TTS, tts_time)
+                self._last_tts_time = tts_time
             
         except Exception as e:
-            print(f"❌ TTS播放失败：{e}")
+            logger.error("❌ TTS播放失败：%s", e)
+        finally:
+            self._tts_done.set()
+    
+    @staticmethod
+    def _detect_tts_wait_mode(tts_service) -> str:
+        """
+        检测TTS服务支持的完成等待方式
+        
+        Args:
+            tts_service: TTS服务实例
+            
+        Returns:
+            'event'（完成事件）、'poll'（轮询is_speaking）或 'none'
+        """
+        if tts_service is None:
+            return 'none'
+        if hasattr(tts_service, 'done_event'):
+            return 'event'
+        if hasattr(tts_service, 'is_speaking'):
+            return 'poll'
+        return 'none'
+    
+    def _is_tts_playing(self) -> bool:
+        """TTS是否正在播放"""
+        if not self._tts_done.is_set():
+            return True
+        if self._tts_wait_mode == 'event':
+            return not self.tts_service.done_event.is_set()
+        if self._tts_wait_mode == 'poll':
+            return self.tts_service.is_speaking
+        return False
     
     def _wait_for_tts_completion(self):
-        """等待TTS播放完成"""
-        if not self.tts_service:
-            return
+        """等待TTS播放完成（总共最多等待_TTS_WAIT_TIMEOUT秒）"""
+        deadline = time.monotonic() + _TTS_WAIT_TIMEOUT
+        
+        # 由本管理器发起的播放结束时唤醒
+        finished = self._tts_done.wait(timeout=_TTS_WAIT_TIMEOUT)
         
-        # 检查TTS是否正在播放
-        if hasattr(self.tts_service, 'is_speaking'):
+        # 其他途径发起的播放：使用服务自身的完成事件或播放状态
+        if finished and self._tts_wait_mode == 'event':
+            # 由服务在播放结束时唤醒
+            finished = self.tts_service.done_event.wait(timeout=max(0.0, deadline - time.monotonic()))
+        elif finished and self._tts_wait_mode == 'poll':
             while self.tts_service.is_speaking:
+                if time.monotonic() >= deadline:
+                    finished = False
+                    break
                 time.sleep(0.1)
+        
+        if not finished:
+            logger.warning("⚠️ 等待TTS播放完成超时（%d秒），继续对话", _TTS_WAIT_TIMEOUT)
+    
+    def _mark_start(self):
+        """记录连续对话的开始时间"""
+        self.start_time = time.monotonic()
+        self._wall_start = time.time()
     
-    def _get_conversation_stats(self) -> dict:
+    def _record_timing(self, stage: int, elapsed: float):
+        """
+        将一次阶段耗时计入该阶段的平均值
+        
+        Args:
+            stage: 阶段下标（_RECOGNITION / _AI / _TTS）
+            elapsed: 耗时（秒）
+        """
+        self._counts[stage] += 1
+        self._means[stage] += (elapsed - self._means[stage]) / self._counts[stage]
+    
+    def _get_conversation_stats(self) -> ConvStats:
         """
         获取对话统计信息
         
         Returns:
-            统计信息字典
+            统计信息（可用_asdict()转换为字典）
         """
-        total_time = time.time() - self.start_time if self.start_time else 0
-        
-        stats = {
-            "conversation_count": self.conversation_count,
-            "total_time": total_time,
-            "avg_recognition_time": self.total_recognition_time / max(self.conversation_count, 1),
-            "avg_ai_response_time": self.total_ai_response_time / max(self.conversation_count, 1),
-            "avg_tts_time": self.total_tts_time / max(self.conversation_count, 1),
-            "conversations_per_minute": self.conversation_count / (total_time / 60) if total_time > 0 else 0
-        }
+        total_time = time.monotonic() - self.start_time if self.start_time else 0
+        avg_recognition_time, avg_ai_response_time, avg_tts_time = self._means
         
-        return stats
+        return ConvStats(
+            conversation_count=self.conversation_count,
+            total_time=total_time,
+            avg_recognition_time=avg_recognition_time,
+            avg_ai_response_time=avg_ai_response_time,
+            avg_tts_time=avg_tts_time,
+            conversations_per_minute=self.conversation_count * 60 / total_time if total_time > 0 else 0.0
+        )
     
     def print_conversation_stats(self):
         """打印对话统计信息"""
         stats = self._get_conversation_stats()
         
         print(f"\n📊 对话统计信息：")
-        print(f"   总轮数: {stats['conversation_count']}")
-        print(f"   总时长: {stats['total_time']:.1f} 秒")
-        print(f"   平均识别时间: {stats['avg_recognition_time']:.2f} 秒")
-        print(f"   平均AI响应时间: {stats['avg_ai_response_time']:.2f} 秒")
-        print(f"   平均TTS时间: {stats['avg_tts_time']:.2f} 秒")
-        print(f"   对话频率: {stats['conversations_per_minute']:.1f} 轮/分钟")
+        if self._wall_start:
+            print(f"   开始时间: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self._wall_start))}")
+        print(f"   总轮数: {stats.conversation_count}")
+        print(f"   总时长: {stats.total_time:.1f} 秒")
+        print(f"   平均识别时间: {stats.avg_recognition_time:.2f} 秒")
+        print(f"   平均AI响应时间: {stats.avg_ai_response_time:.2f} 秒")
+        print(f"   平均TTS时间: {stats.avg_tts_time:.2f} 秒")
+        print(f"   对话频率: {stats.conversations_per_minute:.1f} 轮/分钟")
     
     def reset_stats(self):
         """重置统计信息"""
         self.conversation_count = 0
         self.start_time = None
-        self.total_recognition_time = 0
-        self.total_ai_response_time = 0
-        self.total_tts_time = 0
+        self._wall_start = None
+        self._deadline = None
+        self._means = [0.0, 0.0, 0.0]
+        self._counts = [0, 0, 0]
         print("🔄 统计信息已重置")
     
     def set_ai_service(self, ai_service: AIServiceWithFallback):
@@ -442,6 +867,7 @@ class ConversationManager:
             ai_service: AI服务实例
         """
         self.ai_service = ai_service
+        self._refresh_service_state()
         print(f"🔄 AI服务已切换到: {ai_service.get_service_name()}")
     
     def set_tts_service(self, tts_service: TTSServiceInterface):
@@ -452,6 +878,8 @@ class ConversationManager:
             tts_service: TTS服务实例
         """
         self.tts_service = tts_service
+        self._tts_wait_mode = self._detect_tts_wait_mode(tts_service)
+        self._refresh_service_state()
         print(f"🔄 TTS服务已切换到: {tts_service.get_service_name()}")
     
     def enable_tts(self, enable: bool = True):
@@ -468,72 +896,50 @@ class ConversationManager:
         # 可以通过设置为None来禁用TTS
         if not enable:
             self.tts_service = None
+            self._tts_wait_mode = 'none'
+            self._refresh_service_state()
             print("🔇 TTS已禁用")
         else:
             print("🔊 TTS已启用")
     
     def test_all_services(self) -> dict:
         """
-        测试所有服务
+        测试所有服务（各探测并行执行）
         
         Returns:
             测试结果
         """
-        results = {}
-        
         print("🧪 开始服务测试...")
         
-        # 测试ASR服务
-        try:
-            print("\n🎤 测试ASR服务...")
-            asr_available = self.asr_service.test_microphone()
-            results['asr'] = asr_available
-        except Exception as e:
-            print(f"❌ ASR测试失败：{e}")
-            results['asr'] = False
+        # 每个探测的输出先写入各自的缓冲，全部完成后按固定顺序打印
+        service_names = ('asr', 'ai', 'tts', 'vad')
+        outputs = {name: [] for name in service_names}
+        collected = {}
         
-        # 测试AI服务
-        try:
-            print("\n🤖 测试AI服务...")
-            test_response = self.ai_service.get_response("测试")
-            ai_available = bool(test_response and test_response.strip())
-            results['ai'] = ai_available
-            if ai_available:
-                print(f"✅ AI服务测试成功：{test_response[:50]}...")
-        except Exception as e:
-            print(f"❌ AI测试失败：{e}")
-            results['ai'] = False
+        def _probe_audio_input() -> dict:
+            # ASR和VAD探测共用同一个麦克风，需在同一线程中依次执行
+            audio_results = {'asr': self._probe_asr(outputs['asr'])}
+            if self.vad_service:
+                audio_results['vad'] = self._probe_vad(outputs['vad'])
+            return audio_results
         
-        # 测试TTS服务
-        if self.tts_service:
-            try:
-                print("\n🔊 测试TTS服务...")
-                tts_available = self.tts_service.is_available()
-                results['tts'] = tts_available
-                if tts_available:
-                    print("✅ TTS服务可用")
-                else:
-                    print("❌ TTS服务不可用")
-            except Exception as e:
-                print(f"❌ TTS测试失败：{e}")
-                results['tts'] = False
-        else:
-            results['tts'] = None
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(_probe_audio_input),
+                executor.submit(lambda: {'ai': self._probe_ai(outputs['ai'])})
+            ]
+            if self.tts_service:
+                futures.append(executor.submit(lambda: {'tts': self._probe_tts(outputs['tts'])}))
+            
+            for future in as_completed(futures):
+                collected.update(future.result())
         
-        # 测试VAD服务
-        if self.vad_service:
-            try:
-                print("\n🎯 测试VAD服务...")
-                vad_available = self.vad_service.test_voice_detection(
-                    self.asr_service.recognizer, 
-                    self.asr_service.microphone
-                )
-                results['vad'] = vad_available
-            except Exception as e:
-                print(f"❌ VAD测试失败：{e}")
-                results['vad'] = False
-        else:
-            results['vad'] = None
+        for name in service_names:
+            if outputs[name]:
+                print('\n'.join(outputs[name]))
+        
+        # 未配置的服务结果为None
+        results = {name: collected.get(name) for name in service_names}
         
         # 总结测试结果
         print(f"\n📋 服务测试总结：")
@@ -547,6 +953,54 @@ class ConversationManager:
         
         return results
     
+    def _probe_asr(self, out: list) -> bool:
+        """测试ASR服务，输出写入out"""
+        out.append("\n🎤 测试ASR服务...")
+        try:
+            return bool(self.asr_service.test_microphone())
+        except Exception as e:
+            out.append(f"❌ ASR测试失败：{e}")
+            return False
+    
+    def _probe_ai(self, out: list) -> bool:
+        """测试AI服务，输出写入out"""
+        out.append("\n🤖 测试AI服务...")
+        try:
+            test_response = self.ai_service.get_response("测试")
+            ai_available = bool(test_response and test_response.strip())
+            if ai_available:
+                out.append(f"✅ AI服务测试成功：{test_response[:50]}...")
+            return ai_available
+        except Exception as e:
+            out.append(f"❌ AI测试失败：{e}")
+            return False
+    
+    def _probe_tts(self, out: list) -> bool:
+        """测试TTS服务，输出写入out"""
+        out.append("\n🔊 测试TTS服务...")
+        try:
+            tts_available = self.tts_service.is_available()
+            if tts_available:
+                out.append("✅ TTS服务可用")
+            else:
+                out.append("❌ TTS服务不可用")
+            return tts_available
+        except Exception as e:
+            out.append(f"❌ TTS测试失败：{e}")
+            return False
+    
+    def _probe_vad(self, out: list) -> bool:
+        """测试VAD服务，输出写入out"""
+        out.append("\n🎯 测试VAD服务...")
+        try:
+            return bool(self.vad_service.test_voice_detection(
+                self.asr_service.recognizer, 
+                self.asr_service.microphone
+            ))
+        except Exception as e:
+            out.append(f"❌ VAD测试失败：{e}")
+            return False
+    
     def get_service_info(self) -> dict:
         """
         获取服务信息
@@ -564,6 +1018,30 @@ class ConversationManager:
         
         return info
     
+    def close(self):
+        """释放资源：写入缓冲中的聊天记录并停止后台线程"""
+        if self._db_writer is not None and self._db_writer.is_alive():
+            self._db_queue.put(None)
+            self._db_writer.join()
+        
+        if self.db_manager:
+            self.db_manager.flush_pending_writes(wait_for_ack=True)
+        
+        # 等待后台任务（包括缓存写入）完成后，AI回复缓存一次性写入文件
+        self._tts_executor.shutdown(wait=False)
+        self._executor.shutdown(wait=True)
+        if self._response_cache is not None:
+            self._response_cache.save()
+        
+        # 关闭AI服务的HTTP连接（包括异步会话）
+        if hasattr(self.ai_service, 'close'):
+            self.ai_service.close()
+        
+        # 释放保持打开的麦克风
+        microphone = getattr(self.asr_service, 'microphone', None)
+        if hasattr(microphone, 'release'):
+            microphone.release()
+    
     def print_service_info(self):
         """打印服务信息"""
         info = self.get_service_info()
@@ -12,18 +12,25 @@
 └── core/                      # 核心业务模块
 """
 
+import re
+import sys
 import time
-from utils import ConfigManager, MenuHelper, DependencyChecker
+import threading
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from utils import ConfigManager, MenuHelper, DependencyChecker, DatabaseManager, get_logger
 from services import (
     ASRServiceFactory,
     AIServiceFactory, 
     TTSServiceFactory, 
     VoiceActivityDetector
 )
-# 导入流式TTS服务
-from services.streaming_tts_enhanced import EnhancedStreamingTTSFactory
 from core import ConversationManager
 
+logger = get_logger('tts')
+
 
 def main():
     """主函数 - 应用程序入口"""
@@ -38,76 +45,88 @@ def main():
         # 2. 初始化配置管理器（单例模式）
         config_manager = ConfigManager()
         
-        # 3. 用户选择服务配置
-        asr_type = MenuHelper.select_asr_service()
-        ai_type = MenuHelper.select_ai_service()
-        tts_type, enable_tts = MenuHelper.select_tts_service()
-        
-        # 4. 初始化服务
-        print("\n🔧 初始化系统服务...")
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            # 3. 用户选择服务配置
+            # ASR模型加载最慢，选定类型后立即在后台加载，与后续菜单交互重叠；
+            # 环境噪音校准推迟到菜单结束后，避免录入键盘声而抬高能量阈值（有缓存的阈值时直接使用）
+            asr_type = MenuHelper.select_asr_service()
+            print("🎤 后台初始化语音识别服务...")
+            asr_future = executor.submit(
+                ASRServiceFactory.create_service_with_fallback,
+                primary_type=asr_type,
+                config_manager=config_manager,
+                fallback_type="traditional",
+                defer_calibration=True
+            )
+            
+            ai_type = MenuHelper.select_ai_service()
+            tts_type, enable_tts = MenuHelper.select_tts_service()
+            
+            # 询问用户是否使用流式TTS（在并行初始化前完成交互）
+            use_streaming = False
+            if enable_tts:
+                use_streaming = MenuHelper.confirm_action("是否使用流式TTS（推荐，可显著提升长对话响应速度）")
+            
+            # 4. 初始化其余服务（各服务相互独立，并行初始化以缩短启动时间）
+            print("\n🔧 初始化系统服务...")
+            print("🤖 初始化AI对话服务...")
+            if enable_tts:
+                print("🔊 初始化流式TTS语音合成服务..." if use_streaming else "🔊 初始化TTS语音合成服务...")
+            print("🎯 初始化语音活动检测服务...")
+            
+            ai_future = executor.submit(
+                AIServiceFactory.create_service_with_fallback,
+                ai_type, config_manager, fallback_type="simple"
+            )
+            tts_future = executor.submit(
+                _create_tts_service, tts_type, config_manager, use_streaming
+            ) if enable_tts else None
+            vad_future = executor.submit(VoiceActivityDetector, config_manager)
+            
+            # AI服务创建很快，随即在后台预热（探测服务、加载模型），与ASR模型加载和环境噪声校准重叠
+            ai_service = ai_future.result()
+            ai_warmup_future = executor.submit(ai_service.warmup) if hasattr(ai_service, 'warmup') else None
+            
+            asr_service = asr_future.result()
+            if asr_service and hasattr(asr_service, 'ensure_noise_calibrated'):
+                asr_service.ensure_noise_calibrated()
+            tts_service = tts_future.result() if tts_future else None
+            vad_service = vad_future.result()
+            ai_ready = ai_warmup_future.result() if ai_warmup_future else True
         
-        # 初始化ASR服务（新增Whisper支持）
-        print("🎤 初始化语音识别服务...")
-        asr_service = ASRServiceFactory.create_service_with_fallback(
-            primary_type=asr_type, 
-            config_manager=config_manager, 
-            fallback_type="traditional"
-        )
+        if not ai_ready:
+            print("⚠️ AI主要服务暂不可用，对话时将使用回退服务")
         
         if not asr_service:
             print("❌ ASR服务初始化失败，程序无法继续运行")
             return
         
+        # 支持bf16的CPU上编码器使用bf16（需在量化之前设置，此时量化只作用于解码器）
+        if (config_manager.get_bool('WHISPER_SETTINGS', 'encoder_bf16', True)
+                and hasattr(asr_service, 'enable_encoder_autocast')):
+            asr_service.enable_encoder_autocast()
+        
+        # 本地Whisper模型按配置进行int8动态量化
+        asr_quantization = config_manager.get_string('WHISPER_SETTINGS', 'quantization', 'int8_dynamic')
+        if asr_quantization != 'fp32' and hasattr(asr_service, 'quantize'):
+            asr_service.quantize(asr_quantization)
+        
+        if (config_manager.get_bool('WHISPER_SETTINGS', 'compile_decoder', False)
+                and hasattr(asr_service, 'compile_decoder')):
+            asr_service.compile_decoder()
+        
         # 显示ASR服务信息
         if hasattr(asr_service, 'print_service_info'):
             asr_service.print_service_info()
         
-        # 初始化AI服务（带回退机制）
-        print("🤖 初始化AI对话服务...")
-        ai_service = AIServiceFactory.create_service_with_fallback(
-            ai_type, config_manager, fallback_type="simple"
-        )
-        
-        # 初始化TTS服务（可选）- 使用流式TTS
-        tts_service = None
-        if enable_tts:
-            print("🔊 初始化流式TTS语音合成服务...")
-            
-            # 询问用户是否使用流式TTS
-            use_streaming = MenuHelper.confirm_action("是否使用流式TTS（推荐，可显著提升长对话响应速度）")
-            
-            if use_streaming:
-                try:
-                    # 创建增强流式TTS服务
-                    tts_service = EnhancedStreamingTTSFactory.create_enhanced_streaming_with_fallback(
-                        primary_type=tts_type,
-                        config_manager=config_manager,
-                        fallback_type="pyttsx3",
-                        max_chunk_size=80,      # 文本片段大小
-                        queue_size=10,          # 播放队列大小
-                        cache_audio=True        # 启用音频缓存
-                    )
-                    print("✅ 流式TTS服务初始化成功")
-                    print("🚀 长对话响应速度将显著提升！")
-                    
-                    # 创建流式TTS适配器，使其兼容原有接口
-                    tts_service = StreamingTTSAdapter(tts_service, config_manager)
-                    
-                except Exception as e:
-                    print(f"⚠️ 流式TTS初始化失败: {e}")
-                    print("🔄 回退到传统TTS服务...")
-                    tts_service = TTSServiceFactory.create_service_with_fallback(
-                        tts_type, config_manager, fallback_type="pyttsx3"
-                    )
-            else:
-                # 使用传统TTS服务
-                tts_service = TTSServiceFactory.create_service_with_fallback(
-                    tts_type, config_manager, fallback_type="pyttsx3"
-                )
-        
-        # 初始化VAD服务
-        print("🎯 初始化语音活动检测服务...")
-        vad_service = VoiceActivityDetector(config_manager)
+        # 服务能力在初始化后确定一次，后续按能力分支而不再检查具体类型
+        asr_name = asr_service.get_service_name() if hasattr(asr_service, 'get_service_name') else ''
+        caps = {
+            'streaming_tts': enable_tts and isinstance(tts_service, StreamingTTSAdapter),
+            'whisper_asr': 'Whisper' in asr_name,
+            'asr_test': hasattr(asr_service, 'test_recognition'),
+            'asr_stats': hasattr(asr_service, 'print_usage_stats'),
+        }
         
         # 5. 创建对话管理器
         print("🎯 初始化对话管理器...")
@@ -115,27 +134,36 @@ def main():
         # 生成或获取用户ID
         user_id = config_manager.get_string('USER_SETTINGS', 'user_id', 'default')
         
+        # 数据库管理器只创建一次，由各组件共享同一个连接池
+        db_manager = None
+        if config_manager.get_bool('MONGODB_SETTINGS', 'enable_database', True):
+            try:
+                db_manager = DatabaseManager(config_manager)
+            except Exception as e:
+                print(f"⚠️ 数据库初始化失败: {e}")
+        
         conversation_manager = ConversationManager(
             config_manager=config_manager,
             asr_service=asr_service,
             ai_service=ai_service,
             tts_service=tts_service,
             vad_service=vad_service,
-            user_id=user_id
+            user_id=user_id,
+            db_manager=db_manager
         )
         
         # 6. 显示使用说明
         MenuHelper.print_usage_guide(enable_tts)
         
         # 如果使用了流式TTS，显示额外说明
-        if enable_tts and isinstance(tts_service, StreamingTTSAdapter):
+        if caps['streaming_tts']:
             print("\n🚀 流式TTS功能已启用:")
             print("   - 长回复将边合成边播放，大幅缩短等待时间")
             print("   - 智能文本分割，保持语音自然连贯")
             print("   - 支持实时进度显示和中途停止")
         
         # 如果使用了Whisper，显示额外说明
-        if hasattr(asr_service, 'get_service_name') and 'Whisper' in asr_service.get_service_name():
+        if caps['whisper_asr']:
             print("\n🎤 Whisper ASR功能已启用:")
             print("   - 高精度语音识别，支持多语言")
             print("   - 自动语言检测和噪声抑制")
@@ -154,12 +182,12 @@ def main():
             conversation_manager.test_all_services()
             
             # 如果使用流式TTS，进行额外的流式测试
-            if enable_tts and isinstance(tts_service, StreamingTTSAdapter):
-                if MenuHelper.confirm_action("是否测试流式TTS性能"):
-                    test_streaming_tts_performance(tts_service)
+            if caps['streaming_tts']:
+                if MenuHelper.confirm_action("是否测试TTS并发合成性能"):
+                    benchmark_tts_synthesis(tts_service)
             
             # 如果使用Whisper，进行额外的Whisper测试
-            if hasattr(asr_service, 'test_recognition'):
+            if caps['asr_test']:
                 if MenuHelper.confirm_action("是否测试Whisper识别功能"):
                     asr_service.test_recognition()
         
@@ -186,11 +214,11 @@ def main():
             conversation_manager.print_conversation_stats()
             
             # 如果使用了流式TTS，显示流式TTS统计
-            if enable_tts and isinstance(tts_service, StreamingTTSAdapter):
+            if caps['streaming_tts']:
                 tts_service.print_streaming_stats()
             
             # 如果使用了Whisper，显示Whisper统计
-            if hasattr(asr_service, 'print_usage_stats'):
+            if caps['asr_stats']:
                 asr_service.print_usage_stats()
             
             # 如果启用了数据库，显示数据库统计和聊天历史
@@ -232,18 +260,106 @@ def main():
         MenuHelper.show_error_message(f"程序运行时发生未预期错误：{e}")
         print("\n💡 建议检查配置文件和依赖包是否正确安装")
     
-    # 程序结束前的清理
+    # 程序结束前的清理（各资源分别关闭，一项失败不影响其余资源）
+    # 写入缓冲中的聊天记录，停止后台线程
+    if 'conversation_manager' in locals():
+        _close_resource('对话管理器', conversation_manager.close)
+    if 'db_manager' in locals() and db_manager:
+        _close_resource('数据库连接', db_manager.close)
+    # 清理流式TTS临时文件，关闭TTS服务的连接
+    if 'tts_service' in locals() and hasattr(tts_service, 'cleanup'):
+        _close_resource('TTS服务', tts_service.cleanup)
+
+
+def _close_resource(name: str, close):
+    """
+    关闭一项资源，失败时只记录日志
+    
+    Args:
+        name: 资源名称（用于日志）
+        close: 关闭资源的函数
+    """
     try:
-        # 清理流式TTS临时文件
-        if 'tts_service' in locals() and hasattr(tts_service, 'cleanup'):
-            tts_service.cleanup()
-    except:
-        pass
+        close()
+    except (OSError, RuntimeError, AttributeError) as e:
+        logger.debug("cleanup %s: %s", name, e)
+    except Exception as e:
+        logger.warning("⚠️ 关闭%s时发生未预期错误: %s", name, e)
+
+
+def _create_tts_service(tts_type: str, config_manager: ConfigManager, use_streaming: bool):
+    """
+    创建TTS服务
+    
+    Args:
+        tts_type: TTS服务类型
+        config_manager: 配置管理器
+        use_streaming: 是否使用流式TTS
+        
+    Returns:
+        TTS服务实例
+    """
+    # 基础TTS服务只创建一次：流式服务包装它，流式初始化失败时直接复用，不再重复探测音频后端
+    cached_base = [None]
+    
+    def _traditional_tts():
+        if cached_base[0] is None:
+            cached_base[0] = TTSServiceFactory.create_service_with_fallback(
+                tts_type, config_manager, fallback_type="pyttsx3"
+            )
+        return cached_base[0]
+    
+    if use_streaming:
+        try:
+            # 仅在启用流式TTS时才导入，未启用TTS的会话不加载相关依赖
+            from services.streaming_tts_enhanced import EnhancedStreamingTTSService
+            
+            # 创建增强流式TTS服务
+            tts_service = EnhancedStreamingTTSService(
+                base_tts_service=_traditional_tts(),
+                config_manager=config_manager,
+                max_chunk_size=80,      # 文本片段大小
+                queue_size=10,          # 播放队列大小
+                cache_audio=True,       # 启用音频缓存
+                tts_concurrency=config_manager.get_int('TTS_SETTINGS', 'tts_concurrency', 3)
+            )
+            print("✅ 流式TTS服务初始化成功")
+            print("🚀 长对话响应速度将显著提升！")
+            
+            # 创建流式TTS适配器，使其兼容原有接口
+            return StreamingTTSAdapter(tts_service, config_manager)
+            
+        except Exception as e:
+            print(f"⚠️ 流式TTS初始化失败: {e}")
+            print("🔄 回退到传统TTS服务...")
+    
+    # 使用传统TTS服务
+    return _traditional_tts()
 
 
 class StreamingTTSAdapter:
     """流式TTS适配器 - 使流式TTS兼容原有TTS接口"""
     
+    # 边接收边播放时的断句规则：句末标点，或缓冲超过上限
+    _SENTENCE_END = re.compile(r'[。！？.!?]\s*$')
+    _MAX_BUFFER_CHARS = 80
+    
+    # 短文本合成音频的缓存条数上限
+    _AUDIO_CACHE_SIZE = 512
+    
+    # 流式播放进度输出的最小间隔（秒）
+    _PROGRESS_INTERVAL = 0.1
+    
+    # 同步播放等待完成的最长时间（秒），播放线程异常未回调时停止播放并返回
+    _SYNC_PLAY_TIMEOUT = 120
+    
+    __slots__ = (
+        'streaming_service', 'config', '_is_speaking',
+        '_done_event', '_active_event', '_stop_requested', '_last_progress_ts',
+        '_audio_cache', '_voice_id', 'cache_hits', 'cache_misses',
+        '_total', '_stream', '_trad', '_chars'
+    )
+    
     def __init__(self, streaming_tts_service, config_manager):
         """
         初始化适配器
@@ -256,14 +372,24 @@ class StreamingTTSAdapter:
         self.config = config_manager
         self._is_speaking = False
         
-        # 统计信息
-        self.usage_stats = {
-            'total_requests': 0,
-            'streaming_requests': 0,
-            'traditional_requests': 0,
-            'total_characters': 0,
-            'avg_response_time': 0
-        }
+        # 流式播放完成事件（由流式服务的播放线程在结束时设置）
+        self._done_event = threading.Event()
+        self._done_event.set()
+        self._active_event = self._done_event
+        self._stop_requested = False
+        self._last_progress_ts = 0.0
+        
+        # 短文本合成音频的LRU缓存（常见的问候、确认语无需重复合成）
+        self._audio_cache: OrderedDict = OrderedDict()
+        self._voice_id = streaming_tts_service.base_tts_service.get_service_name()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
+        # 统计信息：总请求数、流式播放数、传统播放数、总字符数
+        self._total = 0
+        self._stream = 0
+        self._trad = 0
+        self._chars = 0
     
     def speak(self, text: str, async_play: bool = True) -> bool:
         """
@@ -276,61 +402,162 @@ class StreamingTTSAdapter:
         Returns:
             是否成功
         """
-        if not text or not text.strip():
+        stripped = text.strip() if text else ""
+        if not stripped:
             return False
         
-        self.usage_stats['total_requests'] += 1
-        self.usage_stats['total_characters'] += len(text)
+        text_length = len(stripped)
+        self._total += 1
+        self._chars += text_length
         
-        # 根据文本长度决定是否使用流式模式
-        text_length = len(text.strip())
-        use_streaming = text_length > 50  # 超过50字符使用流式
-        
-        if use_streaming:
-            return self._speak_streaming(text, async_play)
+        # 根据文本长度决定是否使用流式模式（超过50字符使用流式）
+        if text_length > 50:
+            return self._speak_streaming(stripped, async_play)
         else:
-            return self._speak_traditional(text, async_play)
+            return self._speak_traditional(stripped, async_play)
+    
+    def speak_stream(self, token_iter) -> bool:
+        """
+        边接收文本片段边播放：遇到句子边界或缓冲过长时立即播放已收到的部分
+        
+        Args:
+            token_iter: 文本片段迭代器（如AI流式回复）
+            
+        Returns:
+            是否播放了内容
+        """
+        self._stop_requested = False
+        spoken = False
+        buffer = ""
+        
+        for token in token_iter:
+            if self._stop_requested:
+                break
+            
+            buffer += token
+            if len(buffer) >= self._MAX_BUFFER_CHARS or self._SENTENCE_END.search(buffer):
+                spoken = self.speak(buffer, async_play=False) or spoken
+                buffer = ""
+        
+        if buffer.strip() and not self._stop_requested:
+            spoken = self.speak(buffer, async_play=False) or spoken
+        
+        return spoken
     
     def _speak_streaming(self, text: str, async_play: bool) -> bool:
         """使用流式TTS播放"""
         try:
-            self.usage_stats['streaming_requests'] += 1
+            self._stream += 1
             self._is_speaking = True
             
-            print(f"🎵 使用流式TTS播放 ({len(text)}字符)")
+            logger.info("🎵 使用流式TTS播放 (%d字符)", len(text))
             
             def progress_callback(progress: float, message: str):
-                if progress > 0:
-                    print(f"🔄 流式TTS: {message}")
+                # 限制刷新频率，并在同一行覆盖输出，避免频繁刷新终端
+                now = time.monotonic()
+                if progress <= 0 or now - self._last_progress_ts < self._PROGRESS_INTERVAL:
+                    return
+                self._last_progress_ts = now
+                sys.stdout.write(f"\r🔄 流式TTS: {message}")
+                sys.stdout.flush()
             
-            success = self.streaming_service.speak_streaming(text, progress_callback)
+            self._active_event = self._done_event
+            self._done_event.clear()
+            success = self.streaming_service.speak_streaming(
+                text, progress_callback, done_callback=self._done_event.set
+            )
             
-            if success and not async_play:
-                # 同步模式：等待播放完成
-                while self.streaming_service.is_streaming:
-                    time.sleep(0.1)
+            if not success:
+                self._done_event.set()
+            elif not async_play:
+                # 同步模式：等待播放线程通知完成
+                if not self._done_event.wait(timeout=self._SYNC_PLAY_TIMEOUT):
+                    logger.warning("⚠️ 流式TTS播放超时（%d秒），停止播放", self._SYNC_PLAY_TIMEOUT)
+                    self.streaming_service.stop_streaming()
+                    self._done_event.set()
             
             return success
             
         except Exception as e:
-            print(f"❌ 流式TTS播放失败: {e}")
+            logger.error("❌ 流式TTS播放失败: %s", e)
             return False
         finally:
             self._is_speaking = False
     
     def _speak_traditional(self, text: str, async_play: bool) -> bool:
-        """使用传统TTS播放"""
+        """使用传统TTS播放（优先使用缓存的合成音频）"""
         try:
-            self.usage_stats['traditional_requests'] += 1
+            self._trad += 1
             
-            # 回退到基础TTS服务
             base_service = self.streaming_service.base_tts_service
+            audio_data = self._get_cached_audio(text, base_service)
+            if audio_data is not None:
+                return self._play_cached_audio(audio_data, async_play)
+            
+            # 基础服务不支持单独合成时直接播放
+            self._active_event = getattr(base_service, 'done_event', self._done_event)
             return base_service.speak(text, async_play)
             
         except Exception as e:
-            print(f"❌ 传统TTS播放失败: {e}")
+            logger.error("❌ 传统TTS播放失败: %s", e)
             return False
     
+    def _get_cached_audio(self, text: str, base_service) -> Optional[bytes]:
+        """
+        获取文本的合成音频，未缓存时合成并加入缓存
+        
+        Args:
+            text: 要合成的文本
+            base_service: 基础TTS服务
+            
+        Returns:
+            音频数据；服务不支持单独合成时返回None
+        """
+        key = blake2b(text.encode('utf-8'), digest_size=16).hexdigest() + self._voice_id
+        
+        audio_data = self._audio_cache.get(key)
+        if audio_data is not None:
+            self._audio_cache.move_to_end(key)
+            self.cache_hits += 1
+            return audio_data
+        
+        self.cache_misses += 1
+        if not hasattr(base_service, 'synthesize'):
+            return None
+        
+        audio_data = base_service.synthesize(text)
+        if audio_data:
+            self._audio_cache[key] = audio_data
+            if len(self._audio_cache) > self._AUDIO_CACHE_SIZE:
+                self._audio_cache.popitem(last=False)
+        return audio_data
+    
+    def _play_cached_audio(self, audio_data: bytes, async_play: bool) -> bool:
+        """
+        播放已合成的音频
+        
+        Args:
+            audio_data: 音频数据
+            async_play: 是否异步播放
+            
+        Returns:
+            是否成功
+        """
+        self._active_event = self._done_event
+        self._done_event.clear()
+        self.streaming_service.stop_event.clear()
+        
+        def _play():
+            try:
+                return self.streaming_service._play_audio_data(audio_data)
+            finally:
+                self._done_event.set()
+        
+        if async_play:
+            threading.Thread(target=_play, daemon=True).start()
+            return True
+        return _play()
+    
     def get_service_name(self) -> str:
         """获取服务名称"""
         return f"智能流式{self.streaming_service.get_service_name()}"
@@ -341,27 +568,51 @@ class StreamingTTSAdapter:
     
     def stop_speaking(self):
         """停止当前播放"""
+        self._stop_requested = True
         try:
             self.streaming_service.stop_streaming()
+        except (OSError, RuntimeError, AttributeError) as e:
+            logger.debug("stop_speaking: %s", e)
+        finally:
             self._is_speaking = False
-        except:
-            pass
     
     @property
     def is_speaking(self) -> bool:
         """是否正在播放"""
         return self._is_speaking or self.streaming_service.is_streaming
     
+    @property
+    def done_event(self) -> threading.Event:
+        """最近一次播放的完成事件（未在播放时处于设置状态）"""
+        return self._active_event
+    
+    def as_dict(self) -> dict:
+        """以字典形式返回使用统计（用于导出）"""
+        return {
+            'total_requests': self._total,
+            'streaming_requests': self._stream,
+            'traditional_requests': self._trad,
+            'total_characters': self._chars,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses
+        }
+    
+    @property
+    def usage_stats(self) -> dict:
+        """使用统计（与其他TTS服务的usage_stats保持兼容）"""
+        return self.as_dict()
+    
     def print_streaming_stats(self):
         """打印流式TTS使用统计"""
         print("\n📊 流式TTS使用统计:")
-        print(f"   总请求数: {self.usage_stats['total_requests']}")
-        print(f"   流式播放: {self.usage_stats['streaming_requests']}")
-        print(f"   传统播放: {self.usage_stats['traditional_requests']}")
-        print(f"   总字符数: {self.usage_stats['total_characters']}")
-        
-        if self.usage_stats['streaming_requests'] > 0:
-            streaming_ratio = self.usage_stats['streaming_requests'] / self.usage_stats['total_requests'] * 100
+        print(f"   总请求数: {self._total}")
+        print(f"   流式播放: {self._stream}")
+        print(f"   传统播放: {self._trad}")
+        print(f"   总字符数: {self._chars}")
+        print(f"   音频缓存: 命中 {self.cache_hits} / 未命中 {self.cache_misses}（{len(self._audio_cache)} 条）")
+        
+        if self._stream > 0:
+            streaming_ratio = self._stream / self._total * 100
             print(f"   流式使用率: {streaming_ratio:.1f}%")
         
         # 显示流式TTS详细统计
@@ -375,13 +626,17 @@ class StreamingTTSAdapter:
                 self.streaming_service.stop_streaming()
             if hasattr(self.streaming_service, '_cleanup_temp_files'):
                 self.streaming_service._cleanup_temp_files()
-        except:
-            pass
+            # 关闭底层TTS服务的连接（如Azure预先建立的连接）
+            base_service = getattr(self.streaming_service, 'base_tts_service', None)
+            if hasattr(base_service, 'cleanup'):
+                base_service.cleanup()
+        except (OSError, RuntimeError, AttributeError) as e:
+            logger.debug("cleanup: %s", e)
 
 
-def test_streaming_tts_performance(tts_service):
-    """测试流式TTS性能"""
-    print("\n🧪 流式TTS性能测试")
+def benchmark_tts_synthesis(tts_service):
+    """TTS合成性能测试（并发合成各测试文本但不播放，分别统计耗时和整体吞吐）"""
+    print("\n🧪 TTS并发合成性能测试")
     print("=" * 40)
     
     test_texts = [
@@ -394,22 +649,37 @@ def test_streaming_tts_performance(tts_service):
         通过智能分割和并行处理，实现更流畅的语音交互体验。"""
     ]
     
-    for i, text in enumerate(test_texts, 1):
+    streaming_service = getattr(tts_service, 'streaming_service', None)
+    base_service = getattr(streaming_service, 'base_tts_service', tts_service)
+    
+    if not hasattr(base_service, 'synthesize'):
+        print("⚠️ 当前TTS服务不支持单独合成，跳过合成性能测试")
+        return
+    
+    def _timed_synthesize(text: str):
+        start_time = time.perf_counter()
+        audio_data = base_service.synthesize(text)
+        return audio_data, time.perf_counter() - start_time
+    
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(test_texts)) as executor:
+        results = list(executor.map(_timed_synthesize, test_texts))
+    wall_time = time.perf_counter() - wall_start
+    
+    total_chars = 0
+    for i, (text, (audio_data, duration)) in enumerate(zip(test_texts, results), 1):
         print(f"\n🔬 测试 {i} - 文本长度: {len(text)}字符")
-        
-        start_time = time.time()
-        
-        success = tts_service.speak(text, async_play=False)
-        
-        end_time = time.time()
-        duration = end_time - start_time
-        
-        if success:
-            print(f"✅ 测试完成 - 耗时: {duration:.2f}秒")
+        if audio_data:
+            total_chars += len(text)
+            print(f"✅ 合成完成 - 耗时: {duration:.2f}秒, 音频: {len(audio_data)} 字节")
         else:
-            print(f"❌ 测试失败")
-        
+            print(f"❌ 合成失败（或服务不支持单独合成）")
         print("-" * 40)
+    
+    serial_time = sum(duration for _, duration in results)
+    print(f"📈 并发合成总耗时: {wall_time:.2f}秒（逐个耗时之和: {serial_time:.2f}秒）")
+    if wall_time > 0:
+        print(f"📈 合成吞吐: {total_chars / wall_time:.1f} 字符/秒")
 
 
 def show_help():
@@ -521,8 +791,6 @@ def show_version():
 
 
 if __name__ == '__main__':
-    import sys
-    
     # 处理命令行参数
     if len(sys.argv) > 1:
         arg = sys.argv[1].lower()
@@ -4,8 +4,10 @@
 
 from .asr_service import ASRService
 from .whisper_asr_service import WhisperASRService
+from .whisper_ort_service import WhisperORTService
+from .faster_whisper_service import FasterWhisperService
 from .asr_service_factory import ASRServiceFactory, ASRServiceManager
-from .ai_service import AIServiceFactory, SimpleAIService, OllamaAIService, OpenAIService
+from .ai_service import AIServiceFactory, AIServiceError, SimpleAIService, OllamaAIService, OpenAIService
 from .tts_service import TTSServiceFactory, PyttsxTTSService, GoogleTTSService, AzureTTSService
 from .vad_service import VoiceActivityDetector
 
@@ -13,11 +15,14 @@ __all__ = [
     # ASR相关服务
     'ASRService',
     'WhisperASRService', 
+    'WhisperORTService',
+    'FasterWhisperService',
     'ASRServiceFactory',
     'ASRServiceManager',
     
     # AI相关服务  
     'AIServiceFactory', 
+    'AIServiceError', 
     'SimpleAIService', 
     'OllamaAIService', 
     'OpenAIService',
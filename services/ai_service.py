@@ -4,17 +4,193 @@ AI对话服务 - 策略模式实现
 """
 
 import os
+import re
+import json
+import queue
+import asyncio
+import threading
 import time
 import random
+import bisect
+import itertools
+import unicodedata
 import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from contextlib import closing
+from typing import Optional, Dict, Any, Iterator, List
 from utils.config_manager import ConfigManager
 
 
+class AIServiceError(Exception):
+    """AI服务请求失败（连接失败、超时、服务返回错误状态、未配置密钥等），调用方据此回退"""
+    pass
+
+
+def _normalize_text(text: str) -> str:
+    """
+    文本规范化：NFKC（全角转半角、统一兼容字符）后做大小写折叠
+    
+    关键词预先规范化，消息只需规范化一次即可直接比较
+    
+    Args:
+        text: 原始文本
+        
+    Returns:
+        规范化后的文本
+    """
+    return unicodedata.normalize('NFKC', text).casefold()
+
+
+# 简单AI的关键词类别，按优先级排列（同时命中多个类别时取靠前的）
+_SIMPLE_AI_KEYWORDS = (
+    ("问候", ("你好", "您好", "hi", "hello", "嗨", "早上好", "下午好", "晚上好")),
+    ("告别", ("再见", "拜拜", "回头见", "告别", "bye", "goodbye")),
+    ("感谢", ("谢谢", "感谢", "thank", "thanks")),
+    ("时间", ("时间", "几点", "现在", "日期", "今天")),
+    ("天气", ("天气", "气温", "下雨", "晴天", "阴天")),
+)
+# 规范化的关键词 -> 类别（逆序构建，同一关键词出现在多个类别时保留优先级高的）
+_KEYWORD_CATEGORY = {_normalize_text(word): category
+                     for category, words in reversed(_SIMPLE_AI_KEYWORDS) for word in words}
+_CATEGORY_PRIORITY = {category: i for i, (category, _) in enumerate(_SIMPLE_AI_KEYWORDS)}
+# 零宽前瞻匹配每个位置上的关键词，一次扫描即可找出所有（包括相互重叠的）关键词；
+# 在规范化后的消息上匹配，不需要再忽略大小写
+_KEYWORD_PATTERN = re.compile(
+    '(?=(' + '|'.join(re.escape(_normalize_text(word))
+                      for _, words in _SIMPLE_AI_KEYWORDS for word in words) + '))'
+)
+
+
+def _build_keyword_automaton():
+    """
+    构建关键词的Aho-Corasick自动机（可选依赖pyahocorasick，C实现，一次线性扫描找出所有关键词）
+    
+    Returns:
+        自动机，值为 (优先级, 类别)；未安装pyahocorasick时返回None
+    """
+    try:
+        import ahocorasick
+    except ImportError:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for word, category in _KEYWORD_CATEGORY.items():
+        automaton.add_word(word, (_CATEGORY_PRIORITY[category], category))
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+def _load_json_codec():
+    """
+    选择请求/响应的JSON编解码函数（可选依赖orjson，C实现，比标准库json快数倍）
+    
+    Returns:
+        (序列化为UTF-8字节的函数, 反序列化函数)；未安装orjson时使用标准库json
+    """
+    try:
+        import orjson
+    except ImportError:
+        return (lambda obj: json.dumps(obj, ensure_ascii=False).encode('utf-8')), json.loads
+    return orjson.dumps, orjson.loads
+
+
+_json_dumps, _json_loads = _load_json_codec()
+
+# 以data=发送预先序列化的请求体时使用的请求头
+_JSON_HEADERS = {'Content-Type': 'application/json'}
+
+# 回复模板中的占位回复，选中时替换为当前时间
+_NOW = "__NOW__"
+
+# 原文缓存键归一化时去掉的标点、符号和空白
+_CACHE_KEY_SEPARATORS = re.compile(r'[\W_]+')
+# 回答随时间变化的提问（几点、日期、星期等），不缓存其回复
+_TIME_VARYING_PATTERN = re.compile(
+    r'\d{1,2}\s*[点:：时]|几点|几号|现在|今天|明天|昨天|日期|星期|礼拜|周几'
+)
+
+
+def _create_session(headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """
+    创建复用连接的HTTP会话（keep-alive），避免每轮对话重新建立TCP/TLS连接
+    
+    Args:
+        headers: 每个请求都携带的默认请求头（可选）
+    
+    Returns:
+        配置了连接池和重试（连接失败及502/503/504）的会话
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                          max_retries=Retry(total=2, backoff_factor=0.2,
+                                            status_forcelist=(502, 503, 504)))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def _get_aio_session(service, aiohttp):
+    """
+    获取服务在当前事件循环上的aiohttp会话（首次使用时创建并保持长连接）
+    
+    aiohttp会话绑定创建它的事件循环，换了事件循环时重新创建
+    
+    Args:
+        service: 带timeout属性（连接超时, 读取超时）的AI服务
+        aiohttp: aiohttp模块
+        
+    Returns:
+        aiohttp.ClientSession
+    """
+    loop = asyncio.get_running_loop()
+    session = getattr(service, '_aio_session', None)
+    if session is None or session.closed or getattr(service, '_aio_loop', None) is not loop:
+        # 换了事件循环：先关闭旧会话，避免连接泄漏
+        _discard_aio_session(session, getattr(service, '_aio_loop', None))
+        session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(sock_connect=service.timeout[0], sock_read=service.timeout[1]),
+            connector=aiohttp.TCPConnector(limit=8, keepalive_timeout=300)
+        )
+        service._aio_session, service._aio_loop = session, loop
+    return session
+
+
+def _discard_aio_session(session, loop):
+    """
+    关闭不再使用的aiohttp会话
+    
+    创建会话的事件循环仍在其他线程运行时，在该循环上关闭；
+    事件循环已停止或关闭时，直接关闭连接器释放底层连接
+    
+    Args:
+        session: aiohttp.ClientSession（可为None）
+        loop: 创建会话的事件循环
+    """
+    if session is None or session.closed:
+        return
+    try:
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            session.connector.close()
+    except Exception as e:
+        print(f"⚠️ 关闭aiohttp会话失败：{e}")
+
+
 class AIServiceInterface(ABC):
     """AI服务接口"""
     
+    # 是否支持逐段生成回复（stream_response返回真正的增量输出）
+    supports_streaming = False
+    
     @abstractmethod
     def get_response(self, message: str) -> str:
         """
@@ -25,6 +201,9 @@ class AIServiceInterface(ABC):
             
         Returns:
             AI回复内容
+        
+        Raises:
+            AIServiceError: 服务请求失败
         """
         pass
     
@@ -37,11 +216,115 @@ class AIServiceInterface(ABC):
     def is_available(self) -> bool:
         """检查服务是否可用"""
         pass
+    
+    def warmup(self) -> bool:
+        """
+        预热服务（建立连接等），可在录音期间并行调用
+        
+        Returns:
+            服务是否就绪
+        """
+        return True
+    
+    async def get_response_async(self, message: str) -> str:
+        """
+        异步获取AI回复，默认在线程池中执行get_response，不阻塞事件循环
+        
+        Args:
+            message: 用户消息
+            
+        Returns:
+            AI回复内容
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.get_response, message)
+    
+    def stream_response(self, message: str) -> Iterator[str]:
+        """
+        逐段获取AI回复，默认一次性返回完整回复
+        
+        Args:
+            message: 用户消息
+            
+        Returns:
+            回复文本片段的迭代器
+        """
+        yield self.get_response(message)
+    
+    async def aclose(self):
+        """在当前事件循环中关闭异步HTTP会话（使用过get_response_async时，在事件循环结束前调用）"""
+        session = getattr(self, '_aio_session', None)
+        if session is not None and not session.closed:
+            await session.close()
+        self._aio_session = self._aio_loop = None
+    
+    def close(self):
+        """释放HTTP连接（同步会话和尚未关闭的异步会话）"""
+        _discard_aio_session(getattr(self, '_aio_session', None), getattr(self, '_aio_loop', None))
+        self._aio_session = self._aio_loop = None
+        session = getattr(self, 'session', None)
+        if session is not None:
+            session.close()
+        # 已关闭的实例不再由工厂复用
+        AIServiceFactory.discard_service(self)
+    
+    def is_cacheable(self, message: str, response: str) -> bool:
+        """
+        该回复能否按原文缓存（相同提问直接复用），询问时间、日期等的回复不缓存
+        
+        Args:
+            message: 用户消息
+            response: AI回复
+            
+        Returns:
+            是否可缓存
+        """
+        return _TIME_VARYING_PATTERN.search(message) is None
 
 
 class SimpleAIService(AIServiceInterface):
     """简单AI服务 - 基于规则的本地AI"""
     
+    # 回复模板（每个类别的候选回复为元组），所有实例共享
+    response_templates = {
+        "问候": (
+            "你好！很高兴和你聊天！",
+            "你好呀！有什么可以帮助你的吗？",
+            "嗨！今天心情怎么样？"
+        ),
+        "时间": (
+            _NOW,
+            "时间过得真快呢！",
+            "让我看看现在几点了"
+        ),
+        "天气": (
+            "今天天气还不错呢！",
+            "我是AI，看不到窗外的天气，但希望今天是个好天气！",
+            "不论什么天气，保持好心情最重要！"
+        ),
+        "告别": (
+            "再见！期待下次和你聊天！",
+            "拜拜！祝你今天愉快！",
+            "下次见！保重身体哦！"
+        ),
+        "感谢": (
+            "不客气！很高兴能帮到你！",
+            "这是我应该做的！",
+            "能为你服务我很开心！"
+        ),
+        "默认": (
+            "这是个很有趣的问题！",
+            "我理解你的意思，让我想想",
+            "谢谢你跟我分享这个！",
+            "你说得很有道理！",
+            "这让我学到了新东西！",
+            "我觉得你的想法很棒！"
+        )
+    }
+    
+    # 每次为一个类别预先抽取的回复数
+    _RING_SIZE = 32
+    
     def __init__(self, config_manager: ConfigManager):
         """
         初始化简单AI服务
@@ -50,45 +333,13 @@ class SimpleAIService(AIServiceInterface):
             config_manager: 配置管理器
         """
         self.config = config_manager
-        self._initialize_responses()
-    
-    def _initialize_responses(self):
-        """初始化回复模板"""
-        self.response_templates = {
-            "问候": [
-                "你好！很高兴和你聊天！",
-                "你好呀！有什么可以帮助你的吗？",
-                "嗨！今天心情怎么样？"
-            ],
-            "时间": [
-                f"现在是{time.strftime('%Y年%m月%d日 %H点%M分')}",
-                "时间过得真快呢！",
-                "让我看看现在几点了"
-            ],
-            "天气": [
-                "今天天气还不错呢！",
-                "我是AI，看不到窗外的天气，但希望今天是个好天气！",
-                "不论什么天气，保持好心情最重要！"
-            ],
-            "告别": [
-                "再见！期待下次和你聊天！",
-                "拜拜！祝你今天愉快！",
-                "下次见！保重身体哦！"
-            ],
-            "感谢": [
-                "不客气！很高兴能帮到你！",
-                "这是我应该做的！",
-                "能为你服务我很开心！"
-            ],
-            "默认": [
-                "这是个很有趣的问题！",
-                "我理解你的意思，让我想想",
-                "谢谢你跟我分享这个！",
-                "你说得很有道理！",
-                "这让我学到了新东西！",
-                "我觉得你的想法很棒！"
-            ]
-        }
+        # 实例独立的随机数生成器，不与其他线程共享全局随机状态
+        self._rng = random.Random()
+        # 每个类别预先抽取好的回复，用完后再批量抽取
+        self._ring = {category: [] for category in self.response_templates}
+        # 按秒缓存格式化后的时间回复
+        self._last_now_sec = None
+        self._last_now_str = ""
     
     def get_response(self, message: str) -> str:
         """
@@ -100,35 +351,101 @@ class SimpleAIService(AIServiceInterface):
         Returns:
             AI回复内容
         """
-        message_lower = message.lower()
+        response = self._pick(self._classify(message))
+        if response is _NOW:
+            # 选中时才格式化当前时间，避免回复停留在程序启动时刻
+            return self._now_text()
+        return response
+    
+    def _pick(self, category: str) -> str:
+        """
+        随机挑选一条回复（一次抽取_RING_SIZE条备用，摊薄随机数生成的开销）
         
-        # 问候词检测
-        greetings = ["你好", "您好", "hi", "hello", "嗨", "早上好", "下午好", "晚上好"]
-        if any(greeting in message_lower for greeting in greetings):
-            return random.choice(self.response_templates["问候"])
+        Args:
+            category: 回复类别
+            
+        Returns:
+            回复模板
+        """
+        ring = self._ring[category]
+        try:
+            return ring.pop()
+        except IndexError:
+            ring.extend(self._rng.choices(self.response_templates[category], k=self._RING_SIZE))
+            return ring.pop()
+    
+    def _now_text(self) -> str:
+        """获取当前时间回复，同一秒内复用上次的格式化结果"""
+        now = int(time.time())
+        if now != self._last_now_sec:
+            self._last_now_str = f"现在是{time.strftime('%Y年%m月%d日 %H点%M分', time.localtime(now))}"
+            self._last_now_sec = now
+        return self._last_now_str
+    
+    def _classify(self, message: str) -> str:
+        """
+        判断用户消息所属的回复类别
         
-        # 告别词检测
-        farewells = ["再见", "拜拜", "回头见", "告别", "bye", "goodbye"]
-        if any(farewell in message_lower for farewell in farewells):
-            return random.choice(self.response_templates["告别"])
+        Args:
+            message: 用户消息
+            
+        Returns:
+            回复类别，未匹配任何关键词时为"默认"
+        """
+        # 消息规范化一次，与预先规范化的关键词直接比较
+        message = _normalize_text(message)
         
-        # 感谢词检测
-        thanks = ["谢谢", "感谢", "thank", "thanks"]
-        if any(thank in message_lower for thank in thanks):
-            return random.choice(self.response_templates["感谢"])
+        if _KEYWORD_AUTOMATON is not None:
+            best = None
+            for _, hit in _KEYWORD_AUTOMATON.iter(message):
+                if best is None or hit < best:
+                    best = hit
+                    if not best[0]:
+                        break
+            return best[1] if best else "默认"
         
-        # 时间相关
-        time_words = ["时间", "几点", "现在", "日期", "今天"]
-        if any(word in message_lower for word in time_words):
-            return random.choice(self.response_templates["时间"])
+        best = None
+        for match in _KEYWORD_PATTERN.finditer(message):
+            category = _KEYWORD_CATEGORY[match.group(1)]
+            if best is None or _CATEGORY_PRIORITY[category] < _CATEGORY_PRIORITY[best]:
+                best = category
+                if _CATEGORY_PRIORITY[best] == 0:
+                    break
+        
+        # 未命中关键词时使用默认回复
+        return best or "默认"
+    
+    def classify_many(self, messages: List[str]) -> List[str]:
+        """
+        批量判断消息的回复类别（如分析聊天记录）
+        
+        安装了pyahocorasick时把所有消息拼接起来，由自动机一次扫描完成，
+        再按命中位置归属到各条消息；否则逐条判断
+        
+        Args:
+            messages: 用户消息列表
+            
+        Returns:
+            与输入顺序一致的回复类别列表
+        """
+        if _KEYWORD_AUTOMATON is None:
+            return [self._classify(message) for message in messages]
         
-        # 天气相关
-        weather_words = ["天气", "气温", "下雨", "晴天", "阴天"]
-        if any(word in message_lower for word in weather_words):
-            return random.choice(self.response_templates["天气"])
+        normalized = [_normalize_text(message) for message in messages]
+        # 每条消息在拼接文本中的结束位置（其后为分隔符，关键词不会跨消息匹配）
+        bounds = list(itertools.accumulate(len(message) + 1 for message in normalized))
+        bounds = [bound - 1 for bound in bounds]
         
-        # 默认回复
-        return random.choice(self.response_templates["默认"])
+        best = [None] * len(messages)
+        for end, hit in _KEYWORD_AUTOMATON.iter('\n'.join(normalized)):
+            index = bisect.bisect_right(bounds, end)
+            if best[index] is None or hit < best[index]:
+                best[index] = hit
+        return [hit[1] if hit else "默认" for hit in best]
+    
+    def is_cacheable(self, message: str, response: str) -> bool:
+        """匹配到关键词类别的回复每次随机挑选，只缓存默认类别的回复"""
+        return self._classify(message) == "默认"
     
     def get_service_name(self) -> str:
         """获取服务名称"""
@@ -142,6 +459,18 @@ class SimpleAIService(AIServiceInterface):
 class OllamaAIService(AIServiceInterface):
     """Ollama AI服务"""
     
+    supports_streaming = True
+    
+    # 固定的系统提示词：Ollama只复用逐字节相同的前缀的KV缓存，
+    # 时间、用户名等动态内容不能放在这里，否则每次请求都要重新预填充
+    SYSTEM_PROMPT = "你是一个友善的AI助手，请用中文简洁地回答用户的问题。"
+    
+    # 模型常驻内存的时间，避免空闲5分钟后被卸载
+    KEEP_ALIVE = "60m"
+    
+    # 上下文长度（单轮问答足够，越小占用的KV缓存越少）
+    NUM_CTX = 1024
+    
     def __init__(self, config_manager: ConfigManager, model: str = "qwen2:0.5b"):
         """
         初始化Ollama AI服务
@@ -152,8 +481,11 @@ class OllamaAIService(AIServiceInterface):
         """
         self.config = config_manager
         self.model = model
-        self.base_url = "http://localhost:11434/api/generate"
-        self.timeout = 30
+        self.host = "http://localhost:11434"
+        self.base_url = f"{self.host}/api/chat"
+        # (连接超时, 读取超时)：连接不上时很快失败，生成较慢时仍有足够的等待时间
+        self.timeout = (2.0, 28.0)
+        self.session = _create_session(_JSON_HEADERS)
     
     def get_response(self, message: str) -> str:
         """
@@ -166,26 +498,94 @@ class OllamaAIService(AIServiceInterface):
             AI回复内容
         """
         try:
-            payload = {
-                "model": self.model,
-                "prompt": f"你是一个友善的AI助手，请用中文简洁地回答用户的问题。用户说：{message}",
-                "stream": False
-            }
+            payload = self._build_payload(message, stream=False)
             
-            response = requests.post(self.base_url, json=payload, timeout=self.timeout)
+            response = self.session.post(self.base_url, data=_json_dumps(payload), timeout=self.timeout)
+                
+        except requests.exceptions.ConnectionError as e:
+            raise AIServiceError("无法连接到Ollama服务，请确保Ollama正在运行。") from e
+        except requests.exceptions.Timeout as e:
+            raise AIServiceError("请求超时，请稍后再试。") from e
+        except requests.exceptions.RequestException as e:
+            raise AIServiceError(f"Ollama对话出错：{e}") from e
+        
+        if response.status_code != 200:
+            raise AIServiceError(f"Ollama服务错误：{response.status_code}")
+        
+        result = _json_loads(response.content)
+        return result.get('message', {}).get('content') or '抱歉，我无法理解您的问题。'
+    
+    async def get_response_async(self, message: str) -> str:
+        """
+        异步获取Ollama AI回复（安装了aiohttp时使用异步HTTP，否则在线程池中执行）
+        
+        Args:
+            message: 用户消息
             
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('response', '抱歉，我无法理解您的问题。')
-            else:
-                return f"Ollama服务错误：{response.status_code}"
+        Returns:
+            AI回复内容
+        """
+        try:
+            import aiohttp
+        except ImportError:
+            return await super().get_response_async(message)
+        
+        try:
+            session = _get_aio_session(self, aiohttp)
+            payload = self._build_payload(message, stream=False)
+            async with session.post(self.base_url, data=_json_dumps(payload), headers=_JSON_HEADERS) as response:
+                if response.status != 200:
+                    raise AIServiceError(f"Ollama服务错误：{response.status}")
+                result = _json_loads(await response.read())
+                return result.get('message', {}).get('content') or '抱歉，我无法理解您的问题。'
                 
-        except requests.exceptions.ConnectionError:
-            return "无法连接到Ollama服务，请确保Ollama正在运行。"
-        except requests.exceptions.Timeout:
-            return "请求超时，请稍后再试。"
-        except Exception as e:
-            return f"Ollama对话出错：{e}"
+        except aiohttp.ClientConnectionError as e:
+            raise AIServiceError("无法连接到Ollama服务，请确保Ollama正在运行。") from e
+        except asyncio.TimeoutError as e:
+            raise AIServiceError("请求超时，请稍后再试。") from e
+        except aiohttp.ClientError as e:
+            raise AIServiceError(f"Ollama对话出错：{e}") from e
+    
+    def _build_payload(self, message: str, stream: bool) -> Dict[str, Any]:
+        """构建Ollama对话请求参数（系统提示词在前且固定不变，可复用其KV缓存）"""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": message}
+            ],
+            "stream": stream,
+            "keep_alive": self.KEEP_ALIVE,
+            "options": {"num_ctx": self.NUM_CTX}
+        }
+    
+    def stream_response(self, message: str) -> Iterator[str]:
+        """
+        流式获取Ollama AI回复（逐行读取NDJSON输出）
+        
+        连接失败或服务出错时直接抛出异常，由调用方决定是否回退
+        
+        Args:
+            message: 用户消息
+            
+        Returns:
+            回复文本片段的迭代器
+        """
+        payload = self._build_payload(message, stream=True)
+        
+        with self.session.post(self.base_url, data=_json_dumps(payload), timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                raise AIServiceError(f"Ollama服务错误：{response.status_code}")
+            
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = _json_loads(line)
+                chunk = data.get('message', {}).get('content', '')
+                if chunk:
+                    yield chunk
+                if data.get('done'):
+                    break
     
     def get_service_name(self) -> str:
         """获取服务名称"""
@@ -194,17 +594,31 @@ class OllamaAIService(AIServiceInterface):
     def is_available(self) -> bool:
         """检查服务是否可用"""
         try:
-            response = requests.get("http://localhost:11434/api/version", timeout=3)
+            response = self.session.get(f"{self.host}/api/version", timeout=3)
             return response.status_code == 200
         except:
             return False
     
+    def warmup(self) -> bool:
+        """
+        预热Ollama：发送不含消息的对话请求，让模型加载到内存并延长常驻时间
+        
+        Returns:
+            服务是否就绪
+        """
+        try:
+            payload = {"model": self.model, "messages": [], "keep_alive": self.KEEP_ALIVE}
+            response = self.session.post(self.base_url, data=_json_dumps(payload), timeout=self.timeout)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+    
     def list_models(self) -> list:
         """列出可用的模型"""
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=5)
+            response = self.session.get(f"{self.host}/api/tags", timeout=5)
             if response.status_code == 200:
-                data = response.json()
+                data = _json_loads(response.content)
                 return [model['name'] for model in data.get('models', [])]
             return []
         except:
@@ -218,6 +632,8 @@ class OllamaAIService(AIServiceInterface):
 class OpenAIService(AIServiceInterface):
     """OpenAI GPT服务"""
     
+    supports_streaming = True
+    
     def __init__(self, config_manager: ConfigManager, model: str = "gpt-3.5-turbo"):
         """
         初始化OpenAI服务
@@ -230,7 +646,14 @@ class OpenAIService(AIServiceInterface):
         self.model = model
         self.api_key = os.getenv('OPENAI_API_KEY')
         self.base_url = "https://api.openai.com/v1/chat/completions"
-        self.timeout = 30
+        # (连接超时, 读取超时)：DNS解析、TLS握手受阻时很快失败
+        self.timeout = (3.0, 27.0)
+        # 请求头只构建一次，作为会话的默认请求头
+        self.headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        self.session = _create_session(self.headers if self.api_key else None)
     
     def get_response(self, message: str) -> str:
         """
@@ -243,39 +666,100 @@ class OpenAIService(AIServiceInterface):
             AI回复内容
         """
         if not self.api_key:
-            return "请设置OPENAI_API_KEY环境变量"
+            raise AIServiceError("请设置OPENAI_API_KEY环境变量")
         
         try:
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "你是一个友善的AI助手，请用中文简洁地回答用户的问题。"},
-                    {"role": "user", "content": message}
-                ],
-                "max_tokens": 150,
-                "temperature": 0.7
-            }
-            
-            response = requests.post(
+            response = self.session.post(
                 self.base_url,
-                headers=headers,
-                json=payload,
+                data=_json_dumps(self._build_payload(message, stream=False)),
                 timeout=self.timeout
             )
+                
+        except requests.exceptions.RequestException as e:
+            raise AIServiceError(f"OpenAI对话出错：{e}") from e
+        
+        if response.status_code != 200:
+            raise AIServiceError(f"OpenAI API错误：{response.status_code}")
+        
+        result = _json_loads(response.content)
+        return result['choices'][0]['message']['content'].strip()
+    
+    async def get_response_async(self, message: str) -> str:
+        """
+        异步获取OpenAI回复（安装了aiohttp时使用异步HTTP，否则在线程池中执行）
+        
+        Args:
+            message: 用户消息
             
-            if response.status_code == 200:
-                result = response.json()
+        Returns:
+            AI回复内容
+        """
+        if not self.api_key:
+            raise AIServiceError("请设置OPENAI_API_KEY环境变量")
+        
+        try:
+            import aiohttp
+        except ImportError:
+            return await super().get_response_async(message)
+        
+        try:
+            session = _get_aio_session(self, aiohttp)
+            async with session.post(self.base_url, headers=self.headers,
+                                    data=_json_dumps(self._build_payload(message, stream=False))) as response:
+                if response.status != 200:
+                    raise AIServiceError(f"OpenAI API错误：{response.status}")
+                result = _json_loads(await response.read())
                 return result['choices'][0]['message']['content'].strip()
-            else:
-                return f"OpenAI API错误：{response.status_code}"
                 
-        except Exception as e:
-            return f"OpenAI对话出错：{e}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise AIServiceError(f"OpenAI对话出错：{e}") from e
+    
+    def _build_payload(self, message: str, stream: bool) -> Dict[str, Any]:
+        """构建OpenAI请求参数"""
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": "你是一个友善的AI助手，请用中文简洁地回答用户的问题。"},
+                {"role": "user", "content": message}
+            ],
+            "max_tokens": 150,
+            "temperature": 0.7,
+            "stream": stream
+        }
+    
+    def stream_response(self, message: str) -> Iterator[str]:
+        """
+        流式获取OpenAI回复（逐行读取SSE输出）
+        
+        未配置密钥、连接失败或服务出错时直接抛出异常，由调用方决定是否回退
+        
+        Args:
+            message: 用户消息
+            
+        Returns:
+            回复文本片段的迭代器
+        """
+        if not self.api_key:
+            raise AIServiceError("请设置OPENAI_API_KEY环境变量")
+        
+        payload = self._build_payload(message, stream=True)
+        
+        with self.session.post(self.base_url, data=_json_dumps(payload), timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                raise AIServiceError(f"OpenAI API错误：{response.status_code}")
+            
+            for line in response.iter_lines():
+                # SSE格式：每个事件为一行 "data: {...}"，以 "data: [DONE]" 结束
+                if not line.startswith(b'data:'):
+                    continue
+                data = line[5:].strip()
+                if data == b'[DONE]':
+                    break
+                
+                choices = _json_loads(data).get('choices') or [{}]
+                chunk = choices[0].get('delta', {}).get('content')
+                if chunk:
+                    yield chunk
     
     def get_service_name(self) -> str:
         """获取服务名称"""
@@ -287,11 +771,6 @@ class OpenAIService(AIServiceInterface):
             return False
         
         try:
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
             # 测试API连接
             test_payload = {
                 "model": self.model,
@@ -299,10 +778,9 @@ class OpenAIService(AIServiceInterface):
                 "max_tokens": 1
             }
             
-            response = requests.post(
+            response = self.session.post(
                 self.base_url,
-                headers=headers,
-                json=test_payload,
+                data=_json_dumps(test_payload),
                 timeout=5
             )
             
@@ -314,16 +792,59 @@ class OpenAIService(AIServiceInterface):
 class AIServiceWithFallback:
     """带有回退机制的AI服务"""
     
-    def __init__(self, primary_service: AIServiceInterface, fallback_service: AIServiceInterface):
+    # 原文完全相同的提问直接复用回复，缓存条数上限
+    _EXACT_CACHE_SIZE = 256
+    
+    def __init__(self, primary_service: AIServiceInterface, fallback_service: AIServiceInterface,
+                 first_chunk_timeout: float = 0.0, hedge_delay: float = 0.0):
         """
         初始化带回退的AI服务
         
         Args:
             primary_service: 主要AI服务
             fallback_service: 回退AI服务
+            first_chunk_timeout: 流式回复等待第一个片段的最长时间（秒），超时回退；0表示不限制
+            hedge_delay: 主要服务超过该时间（秒）未开始回复时同时请求回退服务，采用先返回的回复；0表示不启用
         """
         self.primary_service = primary_service
         self.fallback_service = fallback_service
+        self.first_chunk_timeout = first_chunk_timeout
+        self.hedge_delay = hedge_delay
+        self._hedge_executor: Optional[ThreadPoolExecutor] = None
+        self.used_fallback = False  # 最近一次回复是否来自回退服务
+        self._exact_cache: OrderedDict = OrderedDict()
+    
+    def _cache_key(self, message: str):
+        """
+        原文缓存的键：主要服务名称 + 归一化的提问
+        
+        提问经NFKC规范化（全角转半角）并做大小写折叠，再去掉所有标点和空白，
+        只有标点、空白或大小写不同的提问（如"你好，世界"和"你好世界"）共用同一条缓存
+        """
+        normalized = _normalize_text(message)
+        return (self.primary_service.get_service_name(),
+                _CACHE_KEY_SEPARATORS.sub('', normalized))
+    
+    def _cache_get(self, message: str) -> Optional[str]:
+        """查找原文缓存，命中时更新为最近使用"""
+        key = self._cache_key(message)
+        response = self._exact_cache.get(key)
+        if response is not None:
+            self._exact_cache.move_to_end(key)
+        return response
+    
+    def is_cacheable(self, message: str, response: str) -> bool:
+        """最近一次回复能否缓存（回退服务的回复和主要服务认为不可缓存的回复除外）"""
+        return (bool(response) and not self.used_fallback
+                and self.primary_service.is_cacheable(message, response))
+    
+    def _cache_put(self, message: str, response: str):
+        """写入原文缓存（回退服务的回复和不可缓存的回复除外）"""
+        if not self.is_cacheable(message, response):
+            return
+        self._exact_cache[self._cache_key(message)] = response
+        if len(self._exact_cache) > self._EXACT_CACHE_SIZE:
+            self._exact_cache.popitem(last=False)
     
     def get_response(self, message: str) -> str:
         """
@@ -335,39 +856,226 @@ class AIServiceWithFallback:
         Returns:
             AI回复内容
         """
+        self.used_fallback = False
+        cached = self._cache_get(message)
+        if cached is not None:
+            return cached
+        
         print(f"🤖 正在思考回复...")
         
-        # 尝试主要服务
+        # 尝试主要服务，请求失败时回退
         try:
+            if self.hedge_delay > 0:
+                return self._hedged_response(message)
+            
             response = self.primary_service.get_response(message)
+            self._cache_put(message, response)
+            return response
             
-            # 检查是否需要回退
-            if self._should_fallback(response):
-                print(f"🔄 {self.primary_service.get_service_name()}服务不可用，使用{self.fallback_service.get_service_name()}回复...")
-                return self.fallback_service.get_response(message)
+        except AIServiceError as e:
+            print(f"🔄 {self.primary_service.get_service_name()}服务不可用（{e}），使用{self.fallback_service.get_service_name()}回复...")
+            self.used_fallback = True
+            return self.fallback_service.get_response(message)
+        except Exception as e:
+            print(f"🔄 {self.primary_service.get_service_name()}出错，使用{self.fallback_service.get_service_name()}回复...")
+            self.used_fallback = True
+            return self.fallback_service.get_response(message)
+    
+    async def get_response_async(self, message: str) -> str:
+        """
+        异步获取AI回复（带回退机制），等待回复期间事件循环可处理其他任务
+        
+        Args:
+            message: 用户消息
+            
+        Returns:
+            AI回复内容
+        """
+        self.used_fallback = False
+        cached = self._cache_get(message)
+        if cached is not None:
+            return cached
+        
+        print(f"🤖 正在思考回复...")
+        
+        try:
+            if self.hedge_delay > 0:
+                return await self._hedged_response_async(message)
             
+            response = await self.primary_service.get_response_async(message)
+            self._cache_put(message, response)
             return response
             
+        except AIServiceError as e:
+            print(f"🔄 {self.primary_service.get_service_name()}服务不可用（{e}），使用{self.fallback_service.get_service_name()}回复...")
+            self.used_fallback = True
+            return await self.fallback_service.get_response_async(message)
         except Exception as e:
             print(f"🔄 {self.primary_service.get_service_name()}出错，使用{self.fallback_service.get_service_name()}回复...")
-            return self.fallback_service.get_response(message)
+            self.used_fallback = True
+            return await self.fallback_service.get_response_async(message)
     
-    def _should_fallback(self, response: str) -> bool:
+    def _hedged_response(self, message: str) -> str:
         """
-        判断是否需要回退到备选服务
+        对冲请求：主要服务超过hedge_delay仍未开始回复时，同时请求回退服务，采用先完成的回复
+        
+        支持流式回复的主要服务以收到第一个片段作为开始回复，开始回复后不再对冲；
+        不支持流式回复的主要服务以完成回复为准。两者都已完成时优先采用主要服务的回复。
+        回退服务先完成时，主要服务在收到下一个片段时停止读取并关闭响应；
+        主要服务先完成时，取消尚未开始的回退请求
         
         Args:
-            response: AI回复
+            message: 用户消息
             
         Returns:
-            是否需要回退
+            AI回复内容
         """
-        fallback_indicators = [
-            "错误", "失败", "无法连接", "超时", 
-            "请设置", "服务错误", "API错误"
-        ]
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ai-hedge')
+        
+        responding = threading.Event()  # 主要服务已开始回复（或已结束）
+        abandoned = threading.Event()   # 已采用回退服务的回复，主要服务停止读取
+        
+        def _primary() -> str:
+            try:
+                if not self.primary_service.supports_streaming:
+                    return self.primary_service.get_response(message)
+                chunks = []
+                with closing(self.primary_service.stream_response(message)) as stream:
+                    for chunk in stream:
+                        responding.set()
+                        if abandoned.is_set():
+                            break
+                        chunks.append(chunk)
+                return ''.join(chunks)
+            finally:
+                responding.set()
         
-        return any(indicator in response for indicator in fallback_indicators)
+        primary = self._hedge_executor.submit(_primary)
+        if not responding.wait(self.hedge_delay):
+            print(f"⏳ {self.primary_service.get_service_name()} {self.hedge_delay:g}秒未开始回复，同时请求{self.fallback_service.get_service_name()}...")
+            backup = self._hedge_executor.submit(self.fallback_service.get_response, message)
+            wait([primary, backup], return_when=FIRST_COMPLETED)
+            # 主要服务未完成或出错时等待回退服务的回复
+            if not primary.done() or primary.exception() is not None:
+                abandoned.set()
+                self.used_fallback = True
+                return backup.result()
+            backup.cancel()
+        
+        response = primary.result()
+        self._cache_put(message, response)
+        return response
+    
+    async def _hedged_response_async(self, message: str) -> str:
+        """
+        异步对冲请求：在线程池中执行_hedged_response（以主要服务的第一个片段判断是否开始回复），
+        等待回复期间事件循环可处理其他任务
+        
+        Args:
+            message: 用户消息
+            
+        Returns:
+            AI回复内容
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._hedged_response, message)
+    
+    @property
+    def supports_streaming(self) -> bool:
+        """主要服务是否支持流式回复"""
+        return self.primary_service.supports_streaming
+    
+    def stream_response(self, message: str) -> Iterator[str]:
+        """
+        流式获取AI回复（带回退机制）
+        
+        在收到第一个片段前出错时回退到备选服务；之后出错则结束输出
+        
+        Args:
+            message: 用户消息
+            
+        Returns:
+            回复文本片段的迭代器
+        """
+        self.used_fallback = False
+        cached = self._cache_get(message)
+        if cached is not None:
+            yield cached
+            return
+        
+        print(f"🤖 正在思考回复...")
+        
+        try:
+            stream = self.primary_service.stream_response(message)
+            first_chunk = self._first_chunk(stream)
+            
+            if not first_chunk:
+                print(f"🔄 {self.primary_service.get_service_name()}服务不可用，使用{self.fallback_service.get_service_name()}回复...")
+                self.used_fallback = True
+                yield from self.fallback_service.stream_response(message)
+                return
+                
+        except AIServiceError as e:
+            print(f"🔄 {self.primary_service.get_service_name()}服务不可用（{e}），使用{self.fallback_service.get_service_name()}回复...")
+            self.used_fallback = True
+            yield from self.fallback_service.stream_response(message)
+            return
+        except Exception as e:
+            print(f"🔄 {self.primary_service.get_service_name()}出错，使用{self.fallback_service.get_service_name()}回复...")
+            self.used_fallback = True
+            yield from self.fallback_service.stream_response(message)
+            return
+        
+        yield first_chunk
+        chunks = [first_chunk]
+        try:
+            for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"⚠️ {self.primary_service.get_service_name()}回复中断：{e}")
+            return
+        
+        # 完整接收后才缓存，中断的回复不缓存
+        self._cache_put(message, ''.join(chunks))
+    
+    def _first_chunk(self, stream: Iterator[str]) -> str:
+        """
+        获取流式回复的第一个片段
+        
+        主要服务支持流式回复且设置了超时时，在后台线程中等待第一个片段，
+        超时未收到则放弃该回复（后台请求自行结束），由调用方回退
+        
+        Args:
+            stream: 回复文本片段的迭代器
+            
+        Returns:
+            第一个片段；没有输出时返回空字符串
+        
+        Raises:
+            AIServiceError: 等待第一个片段超时
+        """
+        if not (self.first_chunk_timeout > 0 and self.primary_service.supports_streaming):
+            return next(stream, '')
+        
+        result = queue.Queue(maxsize=1)
+        
+        def _fetch():
+            try:
+                result.put((True, next(stream, '')))
+            except Exception as e:
+                result.put((False, e))
+        
+        threading.Thread(target=_fetch, daemon=True).start()
+        try:
+            ok, value = result.get(timeout=self.first_chunk_timeout)
+        except queue.Empty:
+            raise AIServiceError(f"{self.first_chunk_timeout:g}秒内未收到回复") from None
+        
+        if not ok:
+            raise value
+        return value
     
     def get_service_name(self) -> str:
         """获取服务名称"""
@@ -376,15 +1084,48 @@ class AIServiceWithFallback:
     def is_available(self) -> bool:
         """检查服务是否可用"""
         return self.primary_service.is_available() or self.fallback_service.is_available()
+    
+    def warmup(self) -> bool:
+        """预热主要服务"""
+        try:
+            return self.primary_service.warmup()
+        except Exception:
+            return False
+    
+    async def aclose(self):
+        """在当前事件循环中关闭主要服务和回退服务的异步HTTP会话"""
+        await self.primary_service.aclose()
+        await self.fallback_service.aclose()
+    
+    def close(self):
+        """释放主要服务和回退服务的连接，并停止对冲请求线程池"""
+        self.primary_service.close()
+        self.fallback_service.close()
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
 
 
 class AIServiceFactory:
     """AI服务工厂 - 工厂模式"""
     
-    @staticmethod
-    def create_service(service_type: str, config_manager: ConfigManager) -> AIServiceInterface:
+    # 服务类型 -> 服务类
+    _SERVICE_CLASSES = {
+        "simple": SimpleAIService,
+        "ollama": OllamaAIService,
+        "openai": OpenAIService,
+    }
+    
+    # 已创建的服务实例：(服务类型, 配置管理器) -> 实例
+    _instances: Dict[tuple, AIServiceInterface] = {}
+    _instances_lock = threading.Lock()
+    
+    @classmethod
+    def create_service(cls, service_type: str, config_manager: ConfigManager) -> AIServiceInterface:
         """
-        创建AI服务实例
+        获取AI服务实例，同一配置下每种服务只创建一次
+        
+        主要服务和回退服务、多次创建的带回退服务共用同一个实例（及其连接池）
         
         Args:
             service_type: 服务类型 ('simple', 'ollama', 'openai')
@@ -393,14 +1134,28 @@ class AIServiceFactory:
         Returns:
             AI服务实例
         """
-        if service_type == "simple":
-            return SimpleAIService(config_manager)
-        elif service_type == "ollama":
-            return OllamaAIService(config_manager)
-        elif service_type == "openai":
-            return OpenAIService(config_manager)
-        else:
+        service_class = cls._SERVICE_CLASSES.get(service_type)
+        if service_class is None:
             raise ValueError(f"不支持的AI服务类型：{service_type}")
+        
+        key = (service_type, config_manager)
+        with cls._instances_lock:
+            service = cls._instances.get(key)
+            if service is None:
+                service = cls._instances[key] = service_class(config_manager)
+            return service
+    
+    @classmethod
+    def discard_service(cls, service: AIServiceInterface):
+        """
+        从实例缓存中移除服务（服务关闭后调用），之后创建同类服务时会得到新实例
+        
+        Args:
+            service: 要移除的服务实例
+        """
+        with cls._instances_lock:
+            for key in [key for key, cached in cls._instances.items() if cached is service]:
+                del cls._instances[key]
     
     @staticmethod
     def create_service_with_fallback(
@@ -422,7 +1177,11 @@ class AIServiceFactory:
         primary_service = AIServiceFactory.create_service(primary_type, config_manager)
         fallback_service = AIServiceFactory.create_service(fallback_type, config_manager)
         
-        return AIServiceWithFallback(primary_service, fallback_service)
+        return AIServiceWithFallback(
+            primary_service, fallback_service,
+            first_chunk_timeout=config_manager.get_float('AI_SETTINGS', 'first_chunk_timeout', 5.0),
+            hedge_delay=config_manager.get_float('AI_SETTINGS', 'hedge_delay', 0.5)
+        )
     
     @staticmethod
     def get_available_services() -> list:
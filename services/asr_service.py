@@ -3,37 +3,241 @@ ASR语音识别服务
 负责语音识别相关功能
 """
 
+import os
+import json
+import time
+import threading
 import speech_recognition as sr
 from typing import Optional
 from utils.config_manager import ConfigManager
 
 
+def _input_device_name(microphone) -> str:
+    """
+    获取麦克风对应的输入设备名称，作为噪音校准缓存的键
+    
+    Args:
+        microphone: 麦克风（sr.Microphone或AudioDeviceHolder）
+        
+    Returns:
+        设备名称；无法获取时返回"default"
+    """
+    try:
+        audio = microphone.pyaudio_module.PyAudio()
+        try:
+            if microphone.device_index is None:
+                info = audio.get_default_input_device_info()
+            else:
+                info = audio.get_device_info_by_index(microphone.device_index)
+            return info['name']
+        finally:
+            audio.terminate()
+    except Exception:
+        return 'default'
+
+
+def calibrate_ambient_noise(recognizer: sr.Recognizer, microphone, config: ConfigManager,
+                            record: bool = True) -> bool:
+    """
+    校准环境噪音能量阈值，并按输入设备缓存到磁盘
+    
+    同一设备在有效期内直接使用缓存的阈值（开启动态阈值继续自适应），跳过2秒的校准
+    
+    Args:
+        recognizer: 语音识别器
+        microphone: 麦克风
+        config: 配置管理器
+        record: 没有有效缓存时是否录音校准（False时只尝试使用缓存的阈值）
+    
+    Returns:
+        是否已得到阈值（使用了缓存或完成了校准）
+    """
+    cache_file = config.get_string('VOICE_DETECTION', 'noise_cache_file', 'data/cache/noise_calibration.json')
+    max_age = config.get_float('VOICE_DETECTION', 'noise_cache_hours', 24.0) * 3600
+    device = _input_device_name(microphone)
+    
+    cache = {}
+    if cache_file and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+    
+    entry = cache.get(device)
+    if entry and time.time() - entry.get('ts', 0) < max_age:
+        recognizer.energy_threshold = entry['energy_threshold']
+        recognizer.dynamic_energy_threshold = True
+        print(f"✅ 使用缓存的环境噪音阈值: {recognizer.energy_threshold:.0f}")
+        return True
+    
+    if not record:
+        return False
+    
+    print("🔧 正在调整环境噪音，请保持安静...")
+    try:
+        with microphone as source:
+            recognizer.adjust_for_ambient_noise(source, duration=2)
+        print("✅ 环境噪音调整完成！")
+    except Exception as e:
+        print(f"⚠️ 环境噪音调整失败：{e}")
+        return False
+    
+    if not cache_file:
+        return True
+    
+    cache[device] = {'energy_threshold': recognizer.energy_threshold, 'ts': time.time()}
+    try:
+        cache_dir = os.path.dirname(cache_file)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"⚠️ 环境噪音阈值缓存保存失败：{e}")
+    return True
+
+
+class AudioDeviceHolder:
+    """
+    麦克风持有器 - 可让输入流在多轮对话间保持打开
+    
+    用法与sr.Microphone相同（with ... as source）；调用hold()后，
+    进入上下文不再重新打开音频流，直到release()时才真正关闭
+    """
+    
+    def __init__(self, microphone: sr.Microphone):
+        """
+        初始化麦克风持有器
+        
+        Args:
+            microphone: 被包装的麦克风
+        """
+        self._microphone = microphone
+        self._source = None
+        self._held = False
+        self._lock = threading.RLock()
+    
+    def hold(self) -> bool:
+        """
+        打开音频流并保持打开
+        
+        Returns:
+            是否成功
+        """
+        with self._lock:
+            if self._held:
+                return True
+            try:
+                self._source = self._microphone.__enter__()
+                self._held = True
+                return True
+            except Exception as e:
+                print(f"⚠️ 麦克风打开失败：{e}")
+                return False
+    
+    def release(self):
+        """关闭保持打开的音频流"""
+        with self._lock:
+            if not self._held:
+                return
+            self._held = False
+            self._source = None
+            try:
+                self._microphone.__exit__(None, None, None)
+            except Exception:
+                pass
+    
+    @property
+    def is_held(self) -> bool:
+        """音频流是否保持打开"""
+        return self._held
+    
+    def __enter__(self):
+        self._lock.acquire()
+        if self._held:
+            return self._source
+        try:
+            return self._microphone.__enter__()
+        except BaseException:
+            self._lock.release()
+            raise
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if not self._held:
+                self._microphone.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self._lock.release()
+    
+    def __getattr__(self, name):
+        # 其余属性（如SAMPLE_RATE、device_index）直接使用被包装的麦克风
+        if name == '_microphone':
+            raise AttributeError(name)
+        return getattr(self._microphone, name)
+
+
 class ASRService:
     """ASR语音识别服务"""
     
-    def __init__(self, config_manager: ConfigManager):
+    def __init__(self, config_manager: ConfigManager, calibrate_now: bool = True):
         """
         初始化ASR服务
         
         Args:
             config_manager: 配置管理器
+            calibrate_now: 没有缓存的噪音阈值时是否立即录音校准（False时由ensure_noise_calibrated()完成）
         """
         self.config = config_manager
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.microphone = AudioDeviceHolder(sr.Microphone())
+        # 识别前的语音检查：超过能量阈值的30毫秒帧至少要有这么多帧
+        self.speech_gate_frames = self.config.get_int('VOICE_DETECTION', 'speech_gate_frames', 3)
         
         # 调整环境噪音
-        self._adjust_ambient_noise()
+        self._noise_calibrated = False
+        self._adjust_ambient_noise(record=calibrate_now)
+    
+    def _adjust_ambient_noise(self, record: bool = True):
+        """调整环境噪音（优先使用缓存的阈值）"""
+        self._noise_calibrated = calibrate_ambient_noise(
+            self.recognizer, self.microphone, self.config, record=record
+        )
     
-    def _adjust_ambient_noise(self):
-        """调整环境噪音"""
-        print("🔧 正在调整环境噪音，请保持安静...")
+    def ensure_noise_calibrated(self):
+        """延迟校准时，在用户不再操作键盘后完成环境噪音校准"""
+        if not self._noise_calibrated:
+            self._adjust_ambient_noise()
+    
+    def _has_speech(self, audio_data: sr.AudioData) -> bool:
+        """
+        判断录音中是否包含足够的语音，避免把静音或背景噪音发送给在线识别服务
+        
+        按30毫秒分帧计算RMS能量，超过能量阈值的帧数达到speech_gate_frames才认为有语音；
+        门限只需几帧，"好"、"嗯"这类很短的回答也能通过
+        
+        Args:
+            audio_data: 音频数据
+            
+        Returns:
+            是否包含语音
+        """
         try:
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=2)
-            print("✅ 环境噪音调整完成！")
-        except Exception as e:
-            print(f"⚠️ 环境噪音调整失败：{e}")
+            import numpy as np
+        except ImportError:
+            return True
+        
+        pcm = np.frombuffer(audio_data.get_raw_data(convert_width=2), np.int16)
+        frame_size = max(1, int(audio_data.sample_rate * 0.03))
+        frame_count = len(pcm) // frame_size
+        if not frame_count:
+            # 录音不足一帧，无法判断，交给识别服务处理
+            return True
+        
+        frames = pcm[:frame_count * frame_size].reshape(frame_count, frame_size).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        speech_frames = np.count_nonzero(rms > self.recognizer.energy_threshold)
+        return speech_frames >= self.speech_gate_frames
     
     def recognize_chinese(self, audio_data: sr.AudioData) -> Optional[str]:
         """
@@ -45,6 +249,10 @@ class ASRService:
         Returns:
             识别结果文本，如果识别失败返回None
         """
+        if not self._has_speech(audio_data):
+            print("🔇 未检测到有效语音，跳过识别")
+            return None
+        
         try:
             # 使用Google Speech Recognition识别中文
             print("🔍 正在使用Google ASR识别中文语音...")
@@ -90,6 +298,10 @@ class ASRService:
         Returns:
             识别结果文本
         """
+        if not self._has_speech(audio_data):
+            print("🔇 未检测到有效语音，跳过识别")
+            return None
+        
         try:
             print("🔍 正在识别英文语音...")
             text = self.recognizer.recognize_google(audio_data, language='en-US')
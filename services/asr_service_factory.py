@@ -8,6 +8,8 @@ from typing import Optional, Union
 from utils.config_manager import ConfigManager
 from .asr_service import ASRService
 from .whisper_asr_service import WhisperASRService
+from .whisper_ort_service import WhisperORTService
+from .faster_whisper_service import FasterWhisperService
 
 
 class ASRServiceFactory:
@@ -23,17 +25,29 @@ class ASRServiceFactory:
             'name': 'Whisper ASR',
             'class': WhisperASRService,
             'description': 'OpenAI Whisper高精度语音识别，支持本地模型和API调用'
+        },
+        'whisper_ort': {
+            'name': 'Whisper ONNX Runtime ASR',
+            'class': WhisperORTService,
+            'description': '使用ONNX Runtime推理的Whisper，注意力融合+int8量化，CPU识别更快'
+        },
+        'faster_whisper': {
+            'name': 'faster-whisper ASR',
+            'class': FasterWhisperService,
+            'description': '基于CTranslate2的Whisper，int8量化，本地离线识别更快'
         }
     }
     
     @classmethod
-    def create_service(cls, service_type: str, config_manager: ConfigManager) -> Optional[Union[ASRService, WhisperASRService]]:
+    def create_service(cls, service_type: str, config_manager: ConfigManager,
+                       defer_calibration: bool = False) -> Optional[Union[ASRService, WhisperASRService]]:
         """
         创建指定类型的ASR服务
         
         Args:
             service_type: 服务类型 ('traditional' 或 'whisper')
             config_manager: 配置管理器
+            defer_calibration: 没有缓存的噪音阈值时推迟录音校准，由调用方稍后调用ensure_noise_calibrated()
             
         Returns:
             ASR服务实例，创建失败返回None
@@ -48,7 +62,7 @@ class ASRServiceFactory:
             service_class = service_info['class']
             
             print(f"🔧 创建{service_info['name']}...")
-            service = service_class(config_manager)
+            service = service_class(config_manager, calibrate_now=not defer_calibration)
             
             # 检查服务是否可用
             if hasattr(service, 'is_available') and not service.is_available():
@@ -66,7 +80,8 @@ class ASRServiceFactory:
     def create_service_with_fallback(cls, 
                                    primary_type: str, 
                                    config_manager: ConfigManager,
-                                   fallback_type: str = 'traditional') -> Optional[Union[ASRService, WhisperASRService]]:
+                                   fallback_type: str = 'traditional',
+                                   defer_calibration: bool = False) -> Optional[Union[ASRService, WhisperASRService]]:
         """
         创建ASR服务（带回退机制）
         
@@ -74,6 +89,7 @@ class ASRServiceFactory:
             primary_type: 首选服务类型
             config_manager: 配置管理器
             fallback_type: 回退服务类型
+            defer_calibration: 没有缓存的噪音阈值时推迟录音校准
             
         Returns:
             ASR服务实例
@@ -83,7 +99,7 @@ class ASRServiceFactory:
         print(f"   回退服务: {fallback_type}")
         
         # 尝试创建首选服务
-        service = cls.create_service(primary_type, config_manager)
+        service = cls.create_service(primary_type, config_manager, defer_calibration)
         if service:
             print(f"✅ 使用首选ASR服务: {primary_type}")
             return service
@@ -91,7 +107,7 @@ class ASRServiceFactory:
         # 首选服务失败，尝试回退服务
         if fallback_type != primary_type:
             print(f"\n🔄 首选服务失败，尝试回退服务...")
-            service = cls.create_service(fallback_type, config_manager)
+            service = cls.create_service(fallback_type, config_manager, defer_calibration)
             if service:
                 print(f"✅ 使用回退ASR服务: {fallback_type}")
                 return service
@@ -122,6 +138,21 @@ class ASRServiceFactory:
                         available = True
                     except ImportError:
                         available = False
+                elif service_type == 'whisper_ort':
+                    # 检查ONNX Runtime依赖
+                    try:
+                        import onnxruntime
+                        import optimum.onnxruntime
+                        available = True
+                    except ImportError:
+                        available = False
+                elif service_type == 'faster_whisper':
+                    # 检查faster-whisper依赖
+                    try:
+                        import faster_whisper
+                        available = True
+                    except ImportError:
+                        available = False
                 else:
                     # 传统ASR通常都可用
                     available = True
@@ -0,0 +1,104 @@
+"""
+faster-whisper语音识别服务
+使用CTranslate2推理引擎运行int8量化的Whisper模型，CPU上识别速度明显快于原版Whisper
+"""
+
+from typing import List, Optional
+import speech_recognition as sr
+from .whisper_asr_service import WhisperASRService
+
+
+class FasterWhisperService(WhisperASRService):
+    """基于faster-whisper（CTranslate2）的Whisper ASR服务"""
+    
+    def _initialize_whisper(self):
+        """加载faster-whisper模型"""
+        # faster-whisper只支持本地推理
+        self.use_api = False
+        self.compute_type = self.config.get_string('WHISPER_SETTINGS', 'faster_whisper_compute_type', 'int8')
+        
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            print("❌ faster-whisper未安装，请运行: pip install faster-whisper")
+            raise
+        
+        print(f"🔧 加载faster-whisper模型: {self.model_size} (计算类型: {self.compute_type})")
+        self.whisper_model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type)
+        self.quantization = self.compute_type
+        print(f"✅ faster-whisper模型加载完成 (模型: {self.model_size}, 设备: {self.device})")
+    
+    def quantize(self, mode: str = 'int8_dynamic') -> bool:
+        """量化方式在加载模型时由compute_type决定"""
+        return False
+    
+    def enable_encoder_autocast(self) -> bool:
+        """计算精度在加载模型时由compute_type决定"""
+        return False
+    
+    def compile_decoder(self) -> bool:
+        """CTranslate2不需要torch.compile"""
+        return False
+    
+    def _transcribe(self, audio_data: sr.AudioData, language: Optional[str]) -> str:
+        """
+        转录一段音频
+        
+        Args:
+            audio_data: 音频数据
+            language: 指定语言代码，None表示自动检测
+        
+        Returns:
+            识别文本
+        """
+        segments, _ = self.whisper_model.transcribe(
+            self._to_float_pcm(audio_data),
+            language=language,
+            beam_size=1,
+            vad_filter=True
+        )
+        return ''.join(segment.text for segment in segments).strip()
+    
+    def _warmup(self):
+        """用一秒静音运行一次转录，预热模型"""
+        import numpy as np
+        
+        language = self.language if self.language != 'auto' else None
+        segments, _ = self.whisper_model.transcribe(np.zeros(16000, dtype=np.float32), language=language)
+        list(segments)
+    
+    def _recognize_with_local_model(self, audio_data: sr.AudioData, language: Optional[str]) -> Optional[str]:
+        """使用faster-whisper模型进行识别"""
+        try:
+            print(f"🎤 正在使用faster-whisper识别语音 (模型: {self.model_size})...")
+            self.usage_stats['local_calls'] += 1
+            
+            text = self._transcribe(audio_data, language)
+            if text:
+                self.usage_stats['successful_recognitions'] += 1
+                print(f"✅ 本地识别成功: {text}")
+                return text
+            
+            print("❌ 本地识别结果为空")
+            return None
+        
+        except Exception as e:
+            print(f"❌ faster-whisper识别失败: {e}")
+            return None
+    
+    def recognize_batch(self, audio_list: List[sr.AudioData], language: Optional[str] = None) -> List[Optional[str]]:
+        """
+        批量识别多段语音（逐段转录）
+        
+        Args:
+            audio_list: 音频数据列表
+            language: 指定语言代码，None表示自动检测
+        
+        Returns:
+            与输入顺序一致的识别结果列表，失败的项为None
+        """
+        return [self._recognize_with_whisper(audio_data, language) for audio_data in audio_list]
+    
+    def get_service_name(self) -> str:
+        """获取服务名称"""
+        return f"FasterWhisper-{self.model_size}"
@@ -9,11 +9,10 @@ import time
 import threading
 import queue
 import tempfile
-import uuid
-from abc import ABC, abstractmethod
-from typing import List, Optional, Callable, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Callable, Iterable, Iterator
 from utils.config_manager import ConfigManager
-from .tts_service import TTSServiceInterface, TTSServiceFactory
+from .tts_service import TTSServiceInterface, TTSServiceFactory, init_mixer, wait_for_music
 
 
 class AudioChunk:
@@ -48,6 +47,35 @@ class AudioChunk:
 class EnhancedTextChunker:
     """增强文本分割器 - 更智能的文本分割"""
     
+    # 句子结束标点（英文句号后需跟空白，避免拆开小数）
+    _SENTENCE_END = re.compile(r'[。！？；!?]+|\.(?=\s)')
+    
+    @staticmethod
+    def iter_sentences(chunks: Iterable[str]) -> Iterator[str]:
+        """
+        从逐段到达的文本中增量切出完整句子
+        
+        Args:
+            chunks: 文本片段（如AI流式回复）
+            
+        Returns:
+            句子迭代器，末尾不完整的部分在输入结束后输出
+        """
+        buffer = ""
+        for chunk in chunks:
+            buffer += chunk
+            start = 0
+            for match in EnhancedTextChunker._SENTENCE_END.finditer(buffer):
+                sentence = buffer[start:match.end()].strip()
+                start = match.end()
+                # 跨片段到达的重复标点不单独成句
+                if any(c.isalnum() for c in sentence):
+                    yield sentence
+            buffer = buffer[start:]
+        
+        if buffer.strip():
+            yield buffer.strip()
+    
     @staticmethod
     def split_text_smart(text: str, max_chunk_size: int = 80) -> List[str]:
         """
@@ -160,7 +188,8 @@ class EnhancedStreamingTTSService:
                  config_manager: ConfigManager,
                  max_chunk_size: int = 80,
                  queue_size: int = 10,
-                 cache_audio: bool = True):
+                 cache_audio: bool = True,
+                 tts_concurrency: int = 3):
         """
         初始化增强流式TTS服务
         
@@ -170,11 +199,13 @@ class EnhancedStreamingTTSService:
             max_chunk_size: 最大文本片段大小
             queue_size: 播放队列大小
             cache_audio: 是否缓存音频数据
+            tts_concurrency: 同时合成的片段数上限
         """
         self.base_tts_service = base_tts_service
         self.config = config_manager
         self.max_chunk_size = max_chunk_size
         self.cache_audio = cache_audio
+        self.tts_concurrency = max(1, tts_concurrency)
         
         # 队列管理
         self.synthesis_queue = queue.Queue(maxsize=queue_size)
@@ -183,6 +214,7 @@ class EnhancedStreamingTTSService:
         # 状态管理
         self.is_streaming = False
         self.stop_event = threading.Event()
+        self._done_callback: Optional[Callable[[], None]] = None
         self.temp_files = []
         
         # 统计信息
@@ -202,16 +234,19 @@ class EnhancedStreamingTTSService:
         print(f"   最大片段: {max_chunk_size}字符")
         print(f"   队列大小: {queue_size}")
         print(f"   音频缓存: {'启用' if cache_audio else '禁用'}")
+        print(f"   并发合成: {self.tts_concurrency}")
     
     def speak_streaming(self, 
                        text: str, 
-                       progress_callback: Optional[Callable[[float, str], None]] = None) -> bool:
+                       progress_callback: Optional[Callable[[float, str], None]] = None,
+                       done_callback: Optional[Callable[[], None]] = None) -> bool:
         """
         流式语音合成和播放
         
         Args:
             text: 要合成的文本
             progress_callback: 进度回调函数 (progress, message)
+            done_callback: 播放结束（完成或被停止）时的回调
             
         Returns:
             是否成功启动
@@ -222,6 +257,7 @@ class EnhancedStreamingTTSService:
         # 重置状态
         self.stop_event.clear()
         self.is_streaming = True
+        self._done_callback = done_callback
         self._reset_stats()
         
         # 智能分割文本
@@ -255,7 +291,7 @@ class EnhancedStreamingTTSService:
             'total_chunks': 0,
             'synthesized_chunks': 0,
             'played_chunks': 0,
-            'start_time': time.time(),
+            'start_time': time.perf_counter(),
             'first_audio_time': None,
             'first_playback_time': None,
             'total_synthesis_time': 0,
@@ -263,24 +299,25 @@ class EnhancedStreamingTTSService:
         }
     
     def _synthesis_worker(self, chunks: List[str], progress_callback: Optional[Callable]):
-        """合成工作线程 - 负责音频合成"""
+        """合成工作线程 - 并发合成各片段，按原顺序送入播放队列"""
+        executor = ThreadPoolExecutor(max_workers=self.tts_concurrency)
+        futures = []
         try:
-            for i, chunk_text in enumerate(chunks):
+            # 一次性提交所有片段，后续片段在前面片段播放时即开始合成
+            futures = [executor.submit(self._timed_synthesize, i, chunk_text, len(chunks))
+                       for i, chunk_text in enumerate(chunks)]
+            
+            for i, future in enumerate(futures):
                 if self.stop_event.is_set():
                     break
                 
-                print(f"🎤 合成片段 {i+1}/{len(chunks)}: {chunk_text[:40]}...")
-                
-                synthesis_start = time.time()
-                audio_chunk = self._synthesize_chunk_enhanced(i, chunk_text)
-                synthesis_time = time.time() - synthesis_start
-                
+                audio_chunk, synthesis_time = future.result()
                 self.stats['total_synthesis_time'] += synthesis_time
                 
                 if audio_chunk and audio_chunk.has_audio():
                     # 记录首次合成时间
                     if self.stats['first_audio_time'] is None:
-                        self.stats['first_audio_time'] = time.time()
+                        self.stats['first_audio_time'] = time.perf_counter()
                         first_response = self.stats['first_audio_time'] - self.stats['start_time']
                         print(f"⚡ 首个音频片段合成完成，响应时间: {first_response:.2f}秒")
                     
@@ -309,6 +346,31 @@ class EnhancedStreamingTTSService:
         except Exception as e:
             print(f"❌ 合成工作线程错误: {e}")
             self.playback_queue.put(None)
+        finally:
+            # 停止时丢弃尚未开始的合成任务
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+    
+    def _timed_synthesize(self, chunk_index: int, text: str, total: int):
+        """
+        合成单个片段并计时（在合成线程池中执行）
+        
+        Args:
+            chunk_index: 片段序号
+            text: 片段文本
+            total: 片段总数
+            
+        Returns:
+            (音频片段, 合成耗时)
+        """
+        if self.stop_event.is_set():
+            return None, 0.0
+        
+        print(f"🎤 合成片段 {chunk_index+1}/{total}: {text[:40]}...")
+        synthesis_start = time.perf_counter()
+        audio_chunk = self._synthesize_chunk_enhanced(chunk_index, text)
+        return audio_chunk, time.perf_counter() - synthesis_start
     
     def _playback_worker(self):
         """播放工作线程 - 负责音频播放"""
@@ -324,14 +386,14 @@ class EnhancedStreamingTTSService:
                     
                     # 记录首次播放时间
                     if self.stats['first_playback_time'] is None:
-                        self.stats['first_playback_time'] = time.time()
+                        self.stats['first_playback_time'] = time.perf_counter()
                         playback_delay = self.stats['first_playback_time'] - self.stats['start_time']
                         print(f"🔊 开始播放，总延迟: {playback_delay:.2f}秒")
                     
                     # 播放音频
-                    playback_start = time.time()
+                    playback_start = time.perf_counter()
                     success = self._play_audio_chunk(audio_chunk)
-                    playback_time = time.time() - playback_start
+                    playback_time = time.perf_counter() - playback_start
                     
                     self.stats['total_playback_time'] += playback_time
                     
@@ -357,6 +419,8 @@ class EnhancedStreamingTTSService:
             print(f"❌ 播放工作线程错误: {e}")
         finally:
             self.is_streaming = False
+            if self._done_callback:
+                self._done_callback()
     
     def _management_worker(self):
         """管理工作线程 - 负责状态监控和清理"""
@@ -512,18 +576,12 @@ class EnhancedStreamingTTSService:
         try:
             import pygame
             
-            pygame.mixer.init()
+            init_mixer()
             pygame.mixer.music.load(file_path)
             pygame.mixer.music.play()
             
             # 等待播放完成
-            while pygame.mixer.music.get_busy():
-                if self.stop_event.is_set():
-                    pygame.mixer.music.stop()
-                    return False
-                time.sleep(0.1)
-            
-            return True
+            return wait_for_music(self.stop_event)
             
         except Exception as e:
             print(f"❌ 音频文件播放失败: {e}")
@@ -535,19 +593,13 @@ class EnhancedStreamingTTSService:
             import pygame
             import io
             
-            pygame.mixer.init()
+            init_mixer()
             audio_buffer = io.BytesIO(audio_data)
             pygame.mixer.music.load(audio_buffer)
             pygame.mixer.music.play()
             
             # 等待播放完成
-            while pygame.mixer.music.get_busy():
-                if self.stop_event.is_set():
-                    pygame.mixer.music.stop()
-                    return False
-                time.sleep(0.1)
-            
-            return True
+            return wait_for_music(self.stop_event)
             
         except Exception as e:
             print(f"❌ 音频数据播放失败: {e}")
@@ -604,7 +656,7 @@ class EnhancedStreamingTTSService:
             print("📊 暂无统计数据")
             return
         
-        current_time = time.time()
+        current_time = time.perf_counter()
         total_time = current_time - self.stats['start_time']
         
         first_audio_delay = (self.stats['first_audio_time'] - self.stats['start_time'] 
@@ -646,7 +698,8 @@ class EnhancedStreamingTTSFactory:
         config_manager: ConfigManager,
         max_chunk_size: int = 80,
         queue_size: int = 10,
-        cache_audio: bool = True
+        cache_audio: bool = True,
+        tts_concurrency: int = 3
     ) -> EnhancedStreamingTTSService:
         """创建增强流式TTS服务"""
         base_service = TTSServiceFactory.create_service(base_service_type, config_manager)
@@ -656,7 +709,8 @@ class EnhancedStreamingTTSFactory:
             config_manager=config_manager,
             max_chunk_size=max_chunk_size,
             queue_size=queue_size,
-            cache_audio=cache_audio
+            cache_audio=cache_audio,
+            tts_concurrency=tts_concurrency
         )
     
     @staticmethod
@@ -666,7 +720,8 @@ class EnhancedStreamingTTSFactory:
         fallback_type: str = "pyttsx3",
         max_chunk_size: int = 80,
         queue_size: int = 10,
-        cache_audio: bool = True
+        cache_audio: bool = True,
+        tts_concurrency: int = 3
     ) -> EnhancedStreamingTTSService:
         """创建带回退的增强流式TTS服务"""
         base_service = TTSServiceFactory.create_service_with_fallback(
@@ -678,7 +733,8 @@ class EnhancedStreamingTTSFactory:
             config_manager=config_manager,
             max_chunk_size=max_chunk_size,
             queue_size=queue_size,
-            cache_audio=cache_audio
+            cache_audio=cache_audio,
+            tts_concurrency=tts_concurrency
         )
 
 
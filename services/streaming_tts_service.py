@@ -7,7 +7,6 @@ import re
 import time
 import threading
 import queue
-from abc import ABC, abstractmethod
 from typing import List, Optional, Callable
 from utils.config_manager import ConfigManager
 from .tts_service import TTSServiceInterface, TTSServiceFactory
@@ -142,7 +141,7 @@ class StreamingTTSService:
         self.stats = {
             'total_chunks': 0,
             'processed_chunks': 0,
-            'start_time': time.time(),
+            'start_time': time.perf_counter(),
             'first_audio_time': None
         }
         
@@ -181,12 +180,12 @@ class StreamingTTSService:
                 print(f"🎤 合成片段 {i+1}/{len(chunks)}: {chunk[:30]}...")
                 
                 # 合成当前片段
-                chunk_start_time = time.time()
+                chunk_start_time = time.perf_counter()
                 
                 # 这里我们需要修改基础TTS服务以支持同步合成
                 success = self._synthesize_chunk_sync(chunk)
                 
-                synthesis_time = time.time() - chunk_start_time
+                synthesis_time = time.perf_counter() - chunk_start_time
                 
                 if success:
                     # 将合成结果放入队列
@@ -199,7 +198,7 @@ class StreamingTTSService:
                     
                     # 如果是第一个音频片段，记录时间
                     if self.stats['first_audio_time'] is None:
-                        self.stats['first_audio_time'] = time.time()
+                        self.stats['first_audio_time'] = time.perf_counter()
                         first_response_time = self.stats['first_audio_time'] - self.stats['start_time']
                         print(f"⚡ 首个音频片段完成，响应时间: {first_response_time:.2f}秒")
                     
@@ -366,7 +365,7 @@ class StreamingTTSService:
             print("📊 暂无统计数据")
             return
         
-        total_time = time.time() - self.stats['start_time']
+        total_time = time.perf_counter() - self.stats['start_time']
         first_response = (self.stats['first_audio_time'] - self.stats['start_time'] 
                          if self.stats['first_audio_time'] else 0)
         
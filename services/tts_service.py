@@ -4,12 +4,57 @@ TTS语音合成服务 - 策略模式实现
 """
 
 import os
+import re
 import time
+import queue
 import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 from utils.config_manager import ConfigManager
 
+# 按句末标点切分长文本，用于边合成边播放
+_SENTENCE_SPLIT = re.compile(r'(?<=[。！？.!?])\s*')
+
+# 等待pygame播放结束时的检查间隔（秒）
+# 播放结束事件（set_endevent）需要pygame的显示/事件子系统并在主线程中处理事件队列，
+# 而播放在后台线程中进行，因此结束检测使用轮询；停止请求通过事件立即响应
+_MUSIC_POLL_INTERVAL = 0.05
+
+# 混音器输出格式：与gTTS/Azure输出的24kHz单声道一致，播放时无需重采样
+_MIXER_FREQUENCY = 24000
+_MIXER_CHANNELS = 1
+
+
+def init_mixer():
+    """初始化pygame混音器（已初始化时直接返回）"""
+    import pygame
+    
+    if not pygame.mixer.get_init():
+        pygame.mixer.init(frequency=_MIXER_FREQUENCY, size=-16, channels=_MIXER_CHANNELS)
+
+
+def wait_for_music(stop_event: Optional[threading.Event] = None) -> bool:
+    """
+    等待pygame音乐播放结束
+    
+    在停止事件上按检查间隔等待，播放结束后最多延迟一个间隔返回，请求停止时立即停止播放
+    
+    Args:
+        stop_event: 停止事件（可选）
+        
+    Returns:
+        是否完整播放
+    """
+    import pygame
+    
+    waiter = stop_event if stop_event is not None else threading.Event()
+    while pygame.mixer.music.get_busy():
+        if waiter.wait(_MUSIC_POLL_INTERVAL):
+            pygame.mixer.music.stop()
+            return False
+    return True
+
 
 class TTSServiceInterface(ABC):
     """TTS服务接口"""
@@ -48,11 +93,36 @@ class TTSServiceInterface(ABC):
     def is_speaking(self) -> bool:
         """是否正在播放"""
         pass
+    
+    @property
+    def done_event(self) -> threading.Event:
+        """播放完成事件（空闲时为set状态，播放期间为clear状态）"""
+        return self._done_event
+    
+    def synthesize(self, text: str) -> Optional[bytes]:
+        """
+        合成音频但不播放
+        
+        Args:
+            text: 要合成的文本
+            
+        Returns:
+            音频数据（pygame可直接加载的格式）；服务不支持时返回None
+        """
+        return None
+    
+    def cleanup(self):
+        """释放服务占用的资源（连接等），程序退出前调用"""
+        pass
 
 
 class PyttsxTTSService(TTSServiceInterface):
     """pyttsx3 TTS服务"""
     
+    # 进程内共享的实例（pyttsx3.init()对同一驱动返回同一个引擎，只能由一个播放线程驱动）
+    _shared: Optional['PyttsxTTSService'] = None
+    _shared_lock = threading.Lock()
+    
     def __init__(self, config_manager: ConfigManager):
         """
         初始化pyttsx3 TTS服务
@@ -63,12 +133,51 @@ class PyttsxTTSService(TTSServiceInterface):
         self.config = config_manager
         self.engine = None
         self._is_speaking = False
-        self._speaking_lock = threading.Lock()
+        self._done_event = threading.Event()
+        self._done_event.set()
+        
+        # 播放请求队列，由常驻的工作线程依次处理
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._worker = None
+        self._ready = threading.Event()
         
         self._initialize_engine()
     
+    @classmethod
+    def get_shared(cls, config_manager: ConfigManager) -> 'PyttsxTTSService':
+        """
+        获取共享的pyttsx3服务实例（首次调用时创建并在后台预热引擎）
+        
+        Args:
+            config_manager: 配置管理器
+            
+        Returns:
+            pyttsx3 TTS服务
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(config_manager)
+            return cls._shared
+    
     def _initialize_engine(self):
-        """初始化pyttsx3引擎"""
+        """启动常驻的播放线程，引擎在后台初始化，不阻塞其他服务的创建"""
+        self._worker = threading.Thread(target=self._run_loop, args=(self._ready,), daemon=True)
+        self._worker.start()
+    
+    def _wait_ready(self) -> bool:
+        """
+        等待引擎初始化完成
+        
+        Returns:
+            引擎是否可用
+        """
+        self._ready.wait()
+        return self.engine is not None
+    
+    def _create_engine(self):
+        """初始化pyttsx3引擎（在播放线程中调用，引擎始终在同一线程内使用）"""
         try:
             import pyttsx3
             self.engine = pyttsx3.init()
@@ -92,6 +201,41 @@ class PyttsxTTSService(TTSServiceInterface):
             print(f"❌ pyttsx3初始化失败：{e}")
             self.engine = None
     
+    def _run_loop(self, ready: threading.Event):
+        """
+        播放线程主循环：创建引擎后依次处理队列中的播放请求
+        
+        Args:
+            ready: 引擎初始化完成（无论成功与否）后设置的事件
+        """
+        self._create_engine()
+        ready.set()
+        if not self.engine:
+            return
+        
+        while True:
+            text, finished, result = self._queue.get()
+            try:
+                print(f"🔊 正在播放语音：{text[:20]}...")
+                self._is_speaking = True
+                self.engine.say(text)
+                self.engine.runAndWait()
+                
+                # TTS完成后的等待时间
+                wait_time = self.config.get_float('TTS_SETTINGS', 'tts_completion_wait', 0.5)
+                time.sleep(wait_time)
+                result['success'] = True
+            except Exception as e:
+                print(f"❌ TTS播放失败：{e}")
+                result['success'] = False
+            finally:
+                self._is_speaking = False
+                finished.set()
+                with self._pending_lock:
+                    self._pending -= 1
+                    if not self._pending:
+                        self._done_event.set()
+    
     def speak(self, text: str, async_play: bool = True) -> bool:
         """
         使用pyttsx3进行语音合成
@@ -103,35 +247,21 @@ class PyttsxTTSService(TTSServiceInterface):
         Returns:
             是否成功
         """
-        if not self.engine or not text.strip():
+        if not text.strip() or not self._wait_ready():
             return False
         
-        def _speak():
-            with self._speaking_lock:
-                try:
-                    print(f"🔊 正在播放语音：{text[:20]}...")
-                    self._is_speaking = True
-                    self.engine.say(text)
-                    self.engine.runAndWait()
-                    
-                    # TTS完成后的等待时间
-                    wait_time = self.config.get_float('TTS_SETTINGS', 'tts_completion_wait', 0.5)
-                    time.sleep(wait_time)
-                    
-                    self._is_speaking = False
-                    return True
-                except Exception as e:
-                    print(f"❌ TTS播放失败：{e}")
-                    self._is_speaking = False
-                    return False
+        finished = threading.Event()
+        result = {}
+        with self._pending_lock:
+            self._pending += 1
+            self._done_event.clear()
+        self._queue.put((text, finished, result))
         
         if async_play:
-            thread = threading.Thread(target=_speak)
-            thread.daemon = True
-            thread.start()
             return True
-        else:
-            return _speak()
+        
+        finished.wait()
+        return result.get('success', False)
     
     def get_service_name(self) -> str:
         """获取服务名称"""
@@ -139,7 +269,7 @@ class PyttsxTTSService(TTSServiceInterface):
     
     def is_available(self) -> bool:
         """检查服务是否可用"""
-        return self.engine is not None
+        return self._wait_ready()
     
     def stop_speaking(self):
         """停止当前播放"""
@@ -163,7 +293,7 @@ class PyttsxTTSService(TTSServiceInterface):
             rate: 语速
             volume: 音量 (0.0-1.0)
         """
-        if not self.engine:
+        if not self._wait_ready():
             return
         
         if rate is not None:
@@ -176,7 +306,7 @@ class PyttsxTTSService(TTSServiceInterface):
     
     def list_voices(self) -> list:
         """列出可用的语音"""
-        if not self.engine:
+        if not self._wait_ready():
             return []
         
         try:
@@ -199,6 +329,9 @@ class GoogleTTSService(TTSServiceInterface):
         self.config = config_manager
         self._is_speaking = False
         self._speaking_lock = threading.Lock()
+        self._done_event = threading.Event()
+        self._done_event.set()
+        self._stop_event = threading.Event()
     
     def speak(self, text: str, async_play: bool = True) -> bool:
         """
@@ -214,32 +347,49 @@ class GoogleTTSService(TTSServiceInterface):
         if not text.strip():
             return False
         
+        self._done_event.clear()
+        
         def _speak():
             with self._speaking_lock:
                 try:
-                    from gtts import gTTS
+                    import gtts
                     import pygame
                     import io
                     
                     print(f"🌐 正在使用Google TTS生成语音...")
                     self._is_speaking = True
+                    self._stop_event.clear()
                     
-                    # 生成语音
-                    tts = gTTS(text=text, lang='zh-cn', slow=False)
-                    
-                    # 保存到内存
-                    audio_buffer = io.BytesIO()
-                    tts.write_to_fp(audio_buffer)
-                    audio_buffer.seek(0)
+                    # 按句切分，播放当前句的同时在后台合成后续句子
+                    sentences = [s for s in _SENTENCE_SPLIT.split(text) if s.strip()] or [text]
+                    executor = ThreadPoolExecutor(max_workers=2)
+                    futures = [executor.submit(self.synthesize, sentence) for sentence in sentences]
+                    played = False
                     
-                    # 播放音频
-                    pygame.mixer.init()
-                    pygame.mixer.music.load(audio_buffer)
-                    pygame.mixer.music.play()
+                    init_mixer()
+                    try:
+                        for future in futures:
+                            if not self._is_speaking:
+                                break
+                            
+                            audio = future.result()
+                            if not audio:
+                                continue
+                            
+                            # 播放音频并等待播放完成
+                            pygame.mixer.music.load(io.BytesIO(audio))
+                            pygame.mixer.music.play()
+                            played = True
+                            if not wait_for_music(self._stop_event):
+                                break
+                    finally:
+                        for future in futures:
+                            future.cancel()
+                        executor.shutdown(wait=False)
                     
-                    # 等待播放完成
-                    while pygame.mixer.music.get_busy():
-                        time.sleep(0.1)
+                    if not played:
+                        self._is_speaking = False
+                        return False
                     
                     # TTS完成后的等待时间
                     wait_time = self.config.get_float('TTS_SETTINGS', 'tts_completion_wait', 0.5)
@@ -257,6 +407,8 @@ class GoogleTTSService(TTSServiceInterface):
                     print(f"❌ Google TTS失败：{e}")
                     self._is_speaking = False
                     return False
+                finally:
+                    self._done_event.set()
         
         if async_play:
             thread = threading.Thread(target=_speak)
@@ -266,6 +418,27 @@ class GoogleTTSService(TTSServiceInterface):
         else:
             return _speak()
     
+    def synthesize(self, text: str) -> Optional[bytes]:
+        """
+        使用Google TTS合成MP3音频
+        
+        Args:
+            text: 要合成的文本
+            
+        Returns:
+            MP3音频数据；失败时返回None
+        """
+        try:
+            from gtts import gTTS
+            import io
+            
+            audio_buffer = io.BytesIO()
+            gTTS(text=text, lang='zh-cn', slow=False).write_to_fp(audio_buffer)
+            return audio_buffer.getvalue()
+        except Exception as e:
+            print(f"❌ Google TTS合成失败：{e}")
+            return None
+    
     def get_service_name(self) -> str:
         """获取服务名称"""
         return "Google TTS"
@@ -281,6 +454,7 @@ class GoogleTTSService(TTSServiceInterface):
     
     def stop_speaking(self):
         """停止当前播放"""
+        self._stop_event.set()
         try:
             import pygame
             pygame.mixer.music.stop()
@@ -309,6 +483,42 @@ class AzureTTSService(TTSServiceInterface):
         self.service_region = os.getenv('AZURE_SPEECH_REGION', 'eastus')
         self._is_speaking = False
         self._speaking_lock = threading.Lock()
+        self._done_event = threading.Event()
+        self._done_event.set()
+        
+        # 合成器复用：播放用的合成器只有一个；仅合成（不播放）的合成器每个线程一个，可并发合成
+        self._synthesizer = None
+        self._local = threading.local()
+        self._connections = []
+    
+    def _create_synthesizer(self, to_speaker: bool):
+        """
+        创建合成器并预先建立到语音服务的连接
+        
+        Args:
+            to_speaker: 是否输出到默认扬声器（否则只返回音频数据）
+            
+        Returns:
+            语音合成器
+        """
+        import azure.cognitiveservices.speech as speechsdk
+        
+        speech_config = speechsdk.SpeechConfig(
+            subscription=self.speech_key, 
+            region=self.service_region
+        )
+        speech_config.speech_synthesis_voice_name = "zh-CN-XiaoxiaoNeural"
+        
+        if to_speaker:
+            synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config)
+        else:
+            synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+        
+        # 提前打开连接，首次合成不再等待握手
+        connection = speechsdk.Connection.from_speech_synthesizer(synthesizer)
+        connection.open(True)
+        self._connections.append(connection)
+        return synthesizer
     
     def speak(self, text: str, async_play: bool = True) -> bool:
         """
@@ -324,25 +534,22 @@ class AzureTTSService(TTSServiceInterface):
         if not text.strip() or not self.speech_key:
             return False
         
+        self._done_event.clear()
+        
         def _speak():
             with self._speaking_lock:
                 try:
                     import azure.cognitiveservices.speech as speechsdk
                     
-                    # 配置语音服务
-                    speech_config = speechsdk.SpeechConfig(
-                        subscription=self.speech_key, 
-                        region=self.service_region
-                    )
-                    speech_config.speech_synthesis_voice_name = "zh-CN-XiaoxiaoNeural"
-                    
-                    # 创建合成器
-                    synthesizer = speechsdk.SpeechSynthesizer(speech_config=speech_config)
+                    # 播放用的合成器只创建一次，后续复用已建立的连接
+                    if self._synthesizer is None:
+                        self._synthesizer = self._create_synthesizer(to_speaker=True)
+                    synthesizer = self._synthesizer
                     
                     print(f"🌐 正在使用Azure TTS生成语音...")
                     self._is_speaking = True
                     
-                    # 合成语音
+                    # 合成语音：输出到扬声器时SDK边接收音频边播放，get()只等待整句播放结束
                     result = synthesizer.speak_text_async(text).get()
                     
                     if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
@@ -366,6 +573,8 @@ class AzureTTSService(TTSServiceInterface):
                     print(f"❌ Azure TTS失败：{e}")
                     self._is_speaking = False
                     return False
+                finally:
+                    self._done_event.set()
         
         if async_play:
             thread = threading.Thread(target=_speak)
@@ -375,6 +584,36 @@ class AzureTTSService(TTSServiceInterface):
         else:
             return _speak()
     
+    def synthesize(self, text: str) -> Optional[bytes]:
+        """
+        使用Azure TTS合成WAV音频（不输出到扬声器）
+        
+        返回整句的完整音频：调用方用pygame的music.load播放，需要完整的音频文件，不逐块输出
+        
+        Args:
+            text: 要合成的文本
+            
+        Returns:
+            WAV音频数据；失败时返回None
+        """
+        if not self.speech_key:
+            return None
+        
+        try:
+            import azure.cognitiveservices.speech as speechsdk
+            
+            synthesizer = getattr(self._local, 'synthesizer', None)
+            if synthesizer is None:
+                synthesizer = self._local.synthesizer = self._create_synthesizer(to_speaker=False)
+            
+            result = synthesizer.speak_text_async(text).get()
+            if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
+                return result.audio_data
+            return None
+        except Exception as e:
+            print(f"❌ Azure TTS合成失败：{e}")
+            return None
+    
     def get_service_name(self) -> str:
         """获取服务名称"""
         return "Azure TTS"
@@ -392,9 +631,26 @@ class AzureTTSService(TTSServiceInterface):
     
     def stop_speaking(self):
         """停止当前播放"""
-        # Azure TTS没有直接的停止方法，通过标记来处理
+        if self._synthesizer is not None:
+            try:
+                self._synthesizer.stop_speaking_async()
+            except Exception as e:
+                print(f"⚠️ Azure TTS停止播放失败：{e}")
         self._is_speaking = False
     
+    def cleanup(self):
+        """停止播放并关闭预先建立的语音服务连接"""
+        self.stop_speaking()
+        connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception as e:
+                print(f"⚠️ Azure TTS连接关闭失败：{e}")
+        # 丢弃使用这些连接的合成器，之后再用时重新创建
+        self._synthesizer = None
+        self._local = threading.local()
+    
     @property
     def is_speaking(self) -> bool:
         """是否正在播放"""
@@ -414,6 +670,7 @@ class TTSServiceWithFallback:
         """
         self.primary_service = primary_service
         self.fallback_service = fallback_service
+        self._active_service = primary_service
     
     def speak(self, text: str, async_play: bool = True) -> bool:
         """
@@ -428,14 +685,29 @@ class TTSServiceWithFallback:
         """
         # 尝试主要服务
         if self.primary_service.is_available():
+            self._active_service = self.primary_service
             success = self.primary_service.speak(text, async_play)
             if success:
                 return True
         
         # 回退到备选服务
         print(f"🔄 {self.primary_service.get_service_name()}不可用，使用{self.fallback_service.get_service_name()}...")
+        self._active_service = self.fallback_service
         return self.fallback_service.speak(text, async_play)
     
+    def synthesize(self, text: str) -> Optional[bytes]:
+        """
+        合成音频但不播放（使用当前可用的服务）
+        
+        Args:
+            text: 要合成的文本
+            
+        Returns:
+            音频数据；服务不支持或失败时返回None
+        """
+        service = self.primary_service if self.primary_service.is_available() else self.fallback_service
+        return service.synthesize(text)
+    
     def get_service_name(self) -> str:
         """获取服务名称"""
         return f"{self.primary_service.get_service_name()} → {self.fallback_service.get_service_name()}"
@@ -449,10 +721,20 @@ class TTSServiceWithFallback:
         self.primary_service.stop_speaking()
         self.fallback_service.stop_speaking()
     
+    def cleanup(self):
+        """释放主要服务和回退服务的资源"""
+        self.primary_service.cleanup()
+        self.fallback_service.cleanup()
+    
     @property
     def is_speaking(self) -> bool:
         """是否正在播放"""
         return self.primary_service.is_speaking or self.fallback_service.is_speaking
+    
+    @property
+    def done_event(self) -> threading.Event:
+        """最近一次使用的服务的播放完成事件"""
+        return self._active_service.done_event
 
 
 class TTSServiceFactory:
@@ -471,7 +753,7 @@ class TTSServiceFactory:
             TTS服务实例
         """
         if service_type == "pyttsx3":
-            return PyttsxTTSService(config_manager)
+            return PyttsxTTSService.get_shared(config_manager)
         elif service_type == "gtts":
             return GoogleTTSService(config_manager)
         elif service_type == "azure":
@@ -5,7 +5,7 @@ VAD语音活动检测服务
 
 import speech_recognition as sr
 import time
-from typing import Optional
+from typing import Iterator, Optional
 from utils.config_manager import ConfigManager
 
 
@@ -115,6 +115,47 @@ class VoiceActivityDetector:
             print(f"❌ 语音检测失败：{e}")
             return None
     
+    def listen_stream(self, recognizer: sr.Recognizer, microphone: sr.Microphone) -> Iterator[sr.AudioData]:
+        """
+        使用VAD进行智能语音检测，录音过程中逐块输出音频（用于边录音边识别）
+        
+        Args:
+            recognizer: 语音识别器
+            microphone: 麦克风
+            
+        Returns:
+            音频块迭代器；第一块包含语音开始前的缓冲，检测到语音结束后迭代结束
+        """
+        print("🎯 智能语音检测已启动...")
+        
+        with microphone as source:
+            # 动态调整噪音阈值
+            self._adjust_energy_threshold(recognizer)
+            
+            # 循环检测语音，检测到语音开始后逐块输出
+            while True:
+                print("👂 等待语音输入...")
+                chunks = recognizer.listen(
+                    source,
+                    timeout=1,  # 1秒超时，然后继续循环
+                    phrase_time_limit=self.max_recording_duration,
+                    stream=True
+                )
+                
+                try:
+                    first_chunk = next(chunks)
+                except sr.WaitTimeoutError:
+                    # 1秒内没有语音，继续监听
+                    continue
+                except StopIteration:
+                    return
+                
+                print("🗣️ 检测到语音，边录音边识别...")
+                yield first_chunk
+                yield from chunks
+                print("✅ 语音录制完成！")
+                return
+    
     def listen_with_timeout(self, recognizer: sr.Recognizer, microphone: sr.Microphone, 
                            timeout: float = 10.0) -> Optional[sr.AudioData]:
         """
@@ -5,27 +5,30 @@ Whisper ASR语音识别服务
 """
 
 import os
-import tempfile
+import inspect
+import threading
 import wave
 import numpy as np
-from typing import Optional, Union
+from typing import Iterable, List, Optional, Union
 import speech_recognition as sr
 from utils.config_manager import ConfigManager
+from .asr_service import AudioDeviceHolder, calibrate_ambient_noise
 
 
 class WhisperASRService:
     """基于OpenAI Whisper的ASR语音识别服务"""
     
-    def __init__(self, config_manager: ConfigManager):
+    def __init__(self, config_manager: ConfigManager, calibrate_now: bool = True):
         """
         初始化Whisper ASR服务
         
         Args:
             config_manager: 配置管理器
+            calibrate_now: 没有缓存的噪音阈值时是否立即录音校准（False时由ensure_noise_calibrated()完成）
         """
         self.config = config_manager
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.microphone = AudioDeviceHolder(sr.Microphone())
         
         # 获取配置
         self.model_size = self.config.get_string('WHISPER_SETTINGS', 'model_size', 'base')
@@ -36,10 +39,13 @@ class WhisperASRService:
         
         # 初始化Whisper
         self.whisper_model = None
+        self.quantization = 'fp32'
+        self.encoder_precision = 'fp32'
         self._initialize_whisper()
         
         # 调整环境噪音
-        self._adjust_ambient_noise()
+        self._noise_calibrated = False
+        self._adjust_ambient_noise(record=calibrate_now)
         
         # 统计信息
         self.usage_stats = {
@@ -62,6 +68,8 @@ class WhisperASRService:
                 print(f"🔧 加载Whisper本地模型: {self.model_size}")
                 import whisper
                 
+                self._configure_torch_threads()
+                
                 # 自动选择设备
                 if self.device == 'auto':
                     import torch
@@ -80,15 +88,167 @@ class WhisperASRService:
             print(f"❌ Whisper初始化失败: {e}")
             raise
     
-    def _adjust_ambient_noise(self):
-        """调整环境噪音"""
-        print("🔧 正在调整环境噪音，请保持安静...")
+    @staticmethod
+    def _configure_torch_threads():
+        """
+        限制PyTorch计算线程数，避免与TTS合成、录音线程争抢CPU
+        
+        默认使用一半的CPU核心，可通过环境变量TORCH_NUM_THREADS覆盖
+        """
         try:
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=2)
-            print("✅ 环境噪音调整完成！")
+            import torch
+            
+            num_threads = int(os.environ.get('TORCH_NUM_THREADS', max(1, (os.cpu_count() or 4) // 2)))
+            torch.set_num_threads(num_threads)
+            try:
+                # 只能在首次并行计算之前设置
+                torch.set_num_interop_threads(2)
+            except RuntimeError:
+                pass
+            print(f"🔧 PyTorch计算线程数: {num_threads}")
+        except (ImportError, ValueError) as e:
+            print(f"⚠️ PyTorch线程数设置失败: {e}")
+    
+    def quantize(self, mode: str = 'int8_dynamic') -> bool:
+        """
+        对本地Whisper模型进行动态int8量化（仅CPU）
+        
+        编码器/解码器的计算主要是Linear层的矩阵乘法，动态量化后CPU推理明显加快，识别精度基本不变；
+        编码器已启用bf16自动混合精度时只量化解码器
+        
+        Args:
+            mode: 量化方式 (int8_dynamic/fp32)
+            
+        Returns:
+            是否完成量化
+        """
+        if mode != 'int8_dynamic' or self.whisper_model is None or self.quantization == mode:
+            return False
+        
+        try:
+            import torch
+            
+            if self.whisper_model.device.type != 'cpu':
+                print("ℹ️ Whisper模型运行在GPU上，跳过int8量化")
+                return False
+            
+            # 量化后的Linear只接受fp32输入，编码器使用bf16时仅量化解码器
+            decoder_only = self.encoder_precision != 'fp32'
+            target = self.whisper_model.decoder if decoder_only else self.whisper_model
+            print(f"🔧 正在对Whisper{'解码器' if decoder_only else '模型'}进行int8动态量化...")
+            
+            # Whisper使用nn.Linear的子类，quantize_dynamic按精确类型匹配，需先还原为nn.Linear
+            for module in target.modules():
+                if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+                    module.__class__ = torch.nn.Linear
+            
+            quantized = torch.quantization.quantize_dynamic(target, {torch.nn.Linear}, dtype=torch.qint8)
+            if decoder_only:
+                self.whisper_model.decoder = quantized
+            else:
+                self.whisper_model = quantized
+            self.quantization = mode
+            
+            # 量化后预热一次，避免首次识别承担额外开销
+            self._warmup()
+            print("✅ Whisper模型int8量化完成")
+            return True
+            
+        except Exception as e:
+            print(f"⚠️ Whisper模型量化失败，继续使用原模型: {e}")
+            return False
+    
+    def enable_encoder_autocast(self) -> bool:
+        """
+        在支持bf16的CPU上以bf16自动混合精度运行Whisper编码器
+        
+        编码器的大矩阵乘法受内存带宽限制，bf16可减半访存量；输出仍转换为fp32供解码器使用。
+        GPU上转录本身已使用fp16，不需要额外处理
+        
+        Returns:
+            是否已启用
+        """
+        if self.whisper_model is None or self.encoder_precision != 'fp32':
+            return False
+        
+        try:
+            import torch
+            
+            if self.whisper_model.device.type != 'cpu':
+                return False
+            
+            if self.quantization != 'fp32':
+                print("ℹ️ 编码器已量化，跳过bf16自动混合精度")
+                return False
+            
+            bf16_supported = getattr(torch.cpu, '_is_avx512_bf16_supported', None)
+            if bf16_supported is None or not bf16_supported():
+                print("ℹ️ 当前CPU不支持bf16指令，编码器保持fp32")
+                return False
+            
+            encoder = self.whisper_model.encoder
+            forward = encoder.forward
+            
+            def _autocast_forward(x):
+                with torch.autocast(device_type='cpu', dtype=torch.bfloat16):
+                    return forward(x).float()
+            
+            encoder.forward = _autocast_forward
+            self.encoder_precision = 'bf16'
+            print("✅ Whisper编码器已启用bf16自动混合精度")
+            return True
+            
+        except Exception as e:
+            print(f"⚠️ 编码器bf16设置失败，保持fp32: {e}")
+            return False
+    
+    def compile_decoder(self) -> bool:
+        """
+        使用torch.compile编译Whisper解码器
+        
+        解码阶段逐token调用解码器，Python调度开销占比很高；编译后可融合算子并减少每步开销
+        
+        Returns:
+            是否完成编译
+        """
+        if self.whisper_model is None:
+            return False
+        
+        try:
+            import torch
+            
+            if not hasattr(torch, 'compile'):
+                print("⚠️ 当前PyTorch版本不支持torch.compile（需要2.0及以上），跳过解码器编译")
+                return False
+            
+            print("🔧 正在编译Whisper解码器（首次编译需要一些时间）...")
+            decoder = self.whisper_model.decoder
+            decoder.forward = torch.compile(decoder.forward, mode="reduce-overhead", fullgraph=False)
+            
+            # 用一段静音触发编译，避免首次识别时才编译
+            self._warmup()
+            print("✅ Whisper解码器编译完成")
+            return True
+            
         except Exception as e:
-            print(f"⚠️ 环境噪音调整失败：{e}")
+            print(f"⚠️ Whisper解码器编译失败，继续使用未编译模型: {e}")
+            return False
+    
+    def _warmup(self):
+        """用一秒静音运行一次转录，预热模型"""
+        language = self.language if self.language != 'auto' else None
+        self.whisper_model.transcribe(np.zeros(16000, dtype=np.float32), language=language, fp16=False)
+    
+    def _adjust_ambient_noise(self, record: bool = True):
+        """调整环境噪音（优先使用缓存的阈值）"""
+        self._noise_calibrated = calibrate_ambient_noise(
+            self.recognizer, self.microphone, self.config, record=record
+        )
+    
+    def ensure_noise_calibrated(self):
+        """延迟校准时，在用户不再操作键盘后完成环境噪音校准"""
+        if not self._noise_calibrated:
+            self._adjust_ambient_noise()
     
     def recognize_chinese(self, audio_data: sr.AudioData) -> Optional[str]:
         """
@@ -149,21 +309,179 @@ class WhisperASRService:
             print(f"❌ Whisper识别失败: {e}")
             return None
     
+    def recognize_batch(self, audio_list: List[sr.AudioData], language: Optional[str] = None) -> List[Optional[str]]:
+        """
+        批量识别多段语音（本地模型一次前向处理整批音频）
+        
+        每段音频填充/截断到30秒后堆叠为一个批次，编码器和解码器都按批次运行，
+        多段音频的总耗时明显低于逐段识别
+        
+        Args:
+            audio_list: 音频数据列表
+            language: 指定语言代码，None表示自动检测
+            
+        Returns:
+            与输入顺序一致的识别结果列表，失败的项为None
+        """
+        if not audio_list:
+            return []
+        
+        # API模式不支持批量，逐段识别
+        if self.use_api or self.whisper_model is None:
+            return [self._recognize_with_whisper(audio, language) for audio in audio_list]
+        
+        self.usage_stats['total_recognitions'] += len(audio_list)
+        self.usage_stats['local_calls'] += len(audio_list)
+        
+        try:
+            import torch
+            import whisper
+            
+            print(f"🎤 正在使用Whisper本地模型批量识别 {len(audio_list)} 段语音...")
+            # 旧版openai-whisper的log_mel_spectrogram没有n_mels参数（固定80个梅尔通道）
+            mel_kwargs = {}
+            if 'n_mels' in inspect.signature(whisper.log_mel_spectrogram).parameters:
+                mel_kwargs['n_mels'] = getattr(self.whisper_model.dims, 'n_mels', 80)
+            mels = []
+            for audio_data in audio_list:
+                audio = whisper.pad_or_trim(self._to_float_pcm(audio_data))
+                mels.append(whisper.log_mel_spectrogram(audio, **mel_kwargs))
+            
+            mel_batch = torch.stack(mels).to(self.whisper_model.device)
+            options = whisper.DecodingOptions(
+                language=language,
+                fp16=self.whisper_model.device.type == 'cuda'
+            )
+            results = whisper.decode(self.whisper_model, mel_batch, options)
+            
+            texts = []
+            for result in results:
+                text = result.text.strip()
+                if text:
+                    self.usage_stats['successful_recognitions'] += 1
+                texts.append(text or None)
+            
+            print(f"✅ 批量识别完成: 成功 {sum(1 for t in texts if t)}/{len(texts)}")
+            return texts
+            
+        except Exception as e:
+            print(f"❌ Whisper批量识别失败: {e}")
+            return [None] * len(audio_list)
+    
+    def recognize_stream(self, chunks: Iterable[sr.AudioData], language: Optional[str] = 'zh') -> Optional[str]:
+        """
+        边录音边识别
+        
+        录音过程中后台线程每隔streaming_interval秒转录一次已录制的音频并显示中间结果；
+        语音结束时若最近一次转录已覆盖结尾静音之前的全部音频，直接使用该结果，不再重新转录
+        
+        Args:
+            chunks: 录音过程中逐块产生的音频数据
+            language: 指定语言代码，None表示自动检测
+            
+        Returns:
+            识别结果文本，如果识别失败返回None
+        """
+        # API模式不支持增量识别，录音结束后整段识别
+        if self.use_api or self.whisper_model is None:
+            chunks = list(chunks)
+            if not chunks:
+                return None
+            audio_data = sr.AudioData(b''.join(chunk.frame_data for chunk in chunks),
+                                      chunks[0].sample_rate, chunks[0].sample_width)
+            return self._recognize_with_whisper(audio_data, language)
+        
+        interval = self.config.get_float('WHISPER_SETTINGS', 'streaming_interval', 0.5)
+        # 录音块追加到同一个可增长缓冲区，不保存块列表，也不在每次转录时重新拼接
+        frames = bytearray()
+        frames_lock = threading.Lock()
+        finished = threading.Event()
+        latest = {'size': 0, 'text': ''}
+        sample_rate = sample_width = None
+        worker = None
+        
+        def _partial_worker():
+            while not finished.wait(interval):
+                with frames_lock:
+                    data = bytes(frames)
+                if len(data) <= latest['size']:
+                    continue
+                try:
+                    text = self._transcribe(sr.AudioData(data, sample_rate, sample_width), language)
+                except Exception as e:
+                    print(f"⚠️ 中间识别失败: {e}")
+                    return
+                latest['size'], latest['text'] = len(data), text
+                if text:
+                    print(f"📝 {text}")
+        
+        for chunk in chunks:
+            with frames_lock:
+                frames += chunk.frame_data
+            if worker is None:
+                sample_rate, sample_width = chunk.sample_rate, chunk.sample_width
+                worker = threading.Thread(target=_partial_worker, daemon=True)
+                worker.start()
+        
+        if worker is None:
+            return None
+        finished.set()
+        worker.join()
+        
+        self.usage_stats['total_recognitions'] += 1
+        self.usage_stats['local_calls'] += 1
+        data = bytes(frames)
+        
+        try:
+            # 语音结束判定所需的静音段不含语音，最近一次转录覆盖到静音之前即可直接使用
+            silence_tail = int(self.recognizer.pause_threshold * sample_rate) * sample_width
+            if latest['text'] and latest['size'] >= len(data) - silence_tail:
+                text = latest['text']
+            else:
+                text = self._transcribe(sr.AudioData(data, sample_rate, sample_width), language)
+        except Exception as e:
+            print(f"❌ Whisper识别失败: {e}")
+            return None
+        
+        if text:
+            self.usage_stats['successful_recognitions'] += 1
+            print(f"✅ 本地识别成功: {text}")
+            return text
+        
+        print("❌ 本地识别结果为空")
+        return None
+    
+    def _transcribe(self, audio_data: sr.AudioData, language: Optional[str]) -> str:
+        """
+        使用本地模型转录一段音频（不输出日志、不计入统计）
+        
+        Args:
+            audio_data: 音频数据
+            language: 指定语言代码，None表示自动检测
+            
+        Returns:
+            识别文本
+        """
+        result = self.whisper_model.transcribe(
+            self._to_float_pcm(audio_data),
+            language=language,
+            fp16=self.whisper_model.device.type == 'cuda'
+        )
+        return result.get('text', '').strip()
+    
+    @staticmethod
+    def _to_float_pcm(audio_data: sr.AudioData) -> np.ndarray:
+        """将音频数据转换为16kHz单声道、取值[-1, 1]的浮点数组"""
+        pcm = np.frombuffer(audio_data.get_raw_data(convert_rate=16000, convert_width=2), np.int16)
+        return pcm.astype(np.float32) / 32768.0
+    
     def _recognize_with_api(self, audio_data: sr.AudioData, language: Optional[str]) -> Optional[str]:
         """使用Whisper API进行识别"""
         try:
             print("🌐 正在使用Whisper API识别语音...")
             self.usage_stats['api_calls'] += 1
             
-            # 将音频数据保存为临时文件
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_filename = temp_file.name
-                
-                # 转换音频格式
-                audio_wav = audio_data.get_wav_data()
-                temp_file.write(audio_wav)
-            
-            # 使用speech_recognition的whisper API支持
+            # 使用speech_recognition的whisper API支持（直接上传内存中的音频）
             if language:
                 result = self.recognizer.recognize_whisper_api(
                     audio_data, 
@@ -176,12 +494,6 @@ class WhisperASRService:
                     api_key=self.api_key
                 )
             
-            # 清理临时文件
-            try:
-                os.unlink(temp_filename)
-            except:
-                pass
-            
             if result:
                 self.usage_stats['successful_recognitions'] += 1
                 print(f"✅ API识别成功: {result}")
@@ -200,26 +512,12 @@ class WhisperASRService:
             print(f"🎤 正在使用Whisper本地模型识别语音 (模型: {self.model_size})...")
             self.usage_stats['local_calls'] += 1
             
-            # 将音频数据转换为numpy数组
-            audio_wav = audio_data.get_wav_data()
-            
-            # 保存为临时wav文件
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                temp_filename = temp_file.name
-                temp_file.write(audio_wav)
-            
-            # 使用Whisper进行转录
+            # 直接在内存中转换为16kHz浮点数组，不写临时wav文件、不经ffmpeg重新解码
             transcribe_options = {}
             if language:
                 transcribe_options['language'] = language
             
-            result = self.whisper_model.transcribe(temp_filename, **transcribe_options)
-            
-            # 清理临时文件
-            try:
-                os.unlink(temp_filename)
-            except:
-                pass
+            result = self.whisper_model.transcribe(self._to_float_pcm(audio_data), **transcribe_options)
             
             text = result.get('text', '').strip()
             
@@ -311,6 +609,8 @@ class WhisperASRService:
         if not self.use_api:
             print(f"   模型大小: {self.model_size}")
             print(f"   设备: {self.device}")
+            print(f"   量化: {self.quantization}")
+            print(f"   编码器精度: {self.encoder_precision}")
         
         print(f"   默认语言: {self.language}")
         print(f"   支持语言: {', '.join(self.get_supported_languages()[:10])}...")
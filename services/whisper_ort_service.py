@@ -0,0 +1,187 @@
+"""
+Whisper ONNX Runtime语音识别服务
+使用经过ONNX Runtime图优化（注意力融合、多头注意力内核）并int8量化的Whisper模型进行CPU推理
+
+导出优化模型：python -m services.whisper_ort_service [模型大小] [输出目录]
+"""
+
+import os
+import sys
+from typing import List, Optional
+import speech_recognition as sr
+from .whisper_asr_service import WhisperASRService
+
+
+class WhisperORTService(WhisperASRService):
+    """基于ONNX Runtime的Whisper ASR服务"""
+    
+    def _initialize_whisper(self):
+        """加载ONNX格式的Whisper模型"""
+        # ONNX Runtime后端只支持本地CPU推理
+        self.use_api = False
+        self.device = 'cpu'
+        self.processor = None
+        self.onnx_model_dir = self.config.get_string('WHISPER_SETTINGS', 'onnx_model_dir', 'models/whisper_onnx')
+        
+        try:
+            import onnxruntime as ort
+            from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+            from transformers import WhisperProcessor
+        except ImportError:
+            print("❌ ONNX Runtime依赖未安装，请运行: pip install onnxruntime optimum[onnxruntime]")
+            raise
+        
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        
+        # 优先加载已导出并优化的模型；不存在时从原始模型在线导出（未做离线优化和量化）
+        if os.path.isdir(self.onnx_model_dir) and any(
+                name.endswith('.onnx') for name in os.listdir(self.onnx_model_dir)):
+            source, export = self.onnx_model_dir, False
+            print(f"🔧 加载Whisper ONNX模型: {self.onnx_model_dir}")
+        else:
+            source, export = f"openai/whisper-{self.model_size}", True
+            print(f"⚠️ 未找到优化后的ONNX模型，在线导出 {source}")
+            print("💡 运行 python -m services.whisper_ort_service 可导出优化并量化的模型")
+        
+        self.processor = WhisperProcessor.from_pretrained(source)
+        self.whisper_model = ORTModelForSpeechSeq2Seq.from_pretrained(
+            source,
+            export=export,
+            provider='CPUExecutionProvider',
+            session_options=session_options
+        )
+        print(f"✅ Whisper ONNX模型加载完成 (模型: {self.model_size}, 设备: cpu)")
+    
+    def quantize(self, mode: str = 'int8_dynamic') -> bool:
+        """ONNX模型在导出时完成量化，运行时不再处理"""
+        return False
+    
+    def enable_encoder_autocast(self) -> bool:
+        """ONNX模型的精度在导出时确定"""
+        return False
+    
+    def compile_decoder(self) -> bool:
+        """ONNX Runtime已进行图优化，不需要torch.compile"""
+        return False
+    
+    def _generate(self, audio_list: List[sr.AudioData], language: Optional[str]) -> List[str]:
+        """
+        对一批音频执行特征提取和解码
+        
+        Args:
+            audio_list: 音频数据列表
+            language: 指定语言代码，None表示自动检测
+        
+        Returns:
+            识别文本列表
+        """
+        features = self.processor(
+            [self._to_float_pcm(audio_data) for audio_data in audio_list],
+            sampling_rate=16000,
+            return_tensors='pt'
+        ).input_features
+        
+        generate_kwargs = {'language': language, 'task': 'transcribe'} if language else {}
+        token_ids = self.whisper_model.generate(features, **generate_kwargs)
+        return [text.strip() for text in self.processor.batch_decode(token_ids, skip_special_tokens=True)]
+    
+    def _transcribe(self, audio_data: sr.AudioData, language: Optional[str]) -> str:
+        """转录一段音频（不输出日志、不计入统计）"""
+        return self._generate([audio_data], language)[0]
+    
+    def _recognize_with_local_model(self, audio_data: sr.AudioData, language: Optional[str]) -> Optional[str]:
+        """使用ONNX Runtime模型进行识别"""
+        try:
+            print(f"🎤 正在使用Whisper ONNX模型识别语音 (模型: {self.model_size})...")
+            self.usage_stats['local_calls'] += 1
+            
+            text = self._generate([audio_data], language)[0]
+            if text:
+                self.usage_stats['successful_recognitions'] += 1
+                print(f"✅ 本地识别成功: {text}")
+                return text
+            
+            print("❌ 本地识别结果为空")
+            return None
+        
+        except Exception as e:
+            print(f"❌ Whisper ONNX识别失败: {e}")
+            return None
+    
+    def recognize_batch(self, audio_list: List[sr.AudioData], language: Optional[str] = None) -> List[Optional[str]]:
+        """
+        批量识别多段语音
+        
+        Args:
+            audio_list: 音频数据列表
+            language: 指定语言代码，None表示自动检测
+        
+        Returns:
+            与输入顺序一致的识别结果列表，失败的项为None
+        """
+        if not audio_list:
+            return []
+        
+        self.usage_stats['total_recognitions'] += len(audio_list)
+        self.usage_stats['local_calls'] += len(audio_list)
+        
+        try:
+            texts = [text or None for text in self._generate(audio_list, language)]
+            self.usage_stats['successful_recognitions'] += sum(1 for text in texts if text)
+            return texts
+        except Exception as e:
+            print(f"❌ Whisper ONNX批量识别失败: {e}")
+            return [None] * len(audio_list)
+    
+    def get_service_name(self) -> str:
+        """获取服务名称"""
+        return f"WhisperORT-{self.model_size}"
+
+
+def export_optimized_model(model_size: str = 'base', output_dir: str = 'models/whisper_onnx',
+                           quantize: bool = True):
+    """
+    导出Whisper为ONNX模型，并使用ONNX Runtime的Transformer优化器和动态int8量化处理
+    
+    Args:
+        model_size: Whisper模型大小
+        output_dir: 输出目录
+        quantize: 是否进行动态int8量化（逐通道）
+    """
+    from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+    from transformers import WhisperProcessor
+    from onnxruntime.transformers import optimizer
+    from onnxruntime.transformers.fusion_options import FusionOptions
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    model_id = f"openai/whisper-{model_size}"
+    print(f"🔧 导出ONNX模型: {model_id} -> {output_dir}")
+    ORTModelForSpeechSeq2Seq.from_pretrained(model_id, export=True).save_pretrained(output_dir)
+    WhisperProcessor.from_pretrained(model_id).save_pretrained(output_dir)
+    
+    # Whisper与BART同为编码器-解码器结构，使用bart的融合规则，并启用多头注意力内核
+    fusion_options = FusionOptions('bart')
+    fusion_options.use_multi_head_attention = True
+    
+    for file_name in sorted(os.listdir(output_dir)):
+        if not file_name.endswith('.onnx'):
+            continue
+        
+        path = os.path.join(output_dir, file_name)
+        temp_path = path + '.tmp'
+        
+        print(f"🔧 优化 {file_name}...")
+        optimized = optimizer.optimize_model(path, model_type='bart', optimization_options=fusion_options)
+        optimized.save_model_to_file(path)
+        
+        if quantize:
+            print(f"🔧 量化 {file_name}...")
+            quantize_dynamic(path, temp_path, per_channel=True, weight_type=QuantType.QInt8)
+            os.replace(temp_path, path)
+    
+    print(f"✅ Whisper ONNX模型导出完成: {output_dir}")
+
+
+if __name__ == "__main__":
+    export_optimized_model(*sys.argv[1:3])
@@ -0,0 +1,54 @@
+"""
+对话管理器冒烟测试
+使用最小的假配置和假服务构造对话管理器，确认初始化和关闭流程可以正常完成
+"""
+
+import importlib.util
+import unittest
+
+
+class _FakeConfig:
+    """只提供对话管理器用到的读取接口，未覆盖的配置项返回默认值"""
+
+    def __init__(self, overrides=None):
+        self._overrides = overrides or {}
+
+    def _get(self, section, key, default):
+        return self._overrides.get((section, key), default)
+
+    get_bool = get_float = get_int = get_string = _get
+
+
+class _FakeService:
+    """只提供服务名称的假服务"""
+
+    def __init__(self, name):
+        self._name = name
+
+    def get_service_name(self):
+        return self._name
+
+
+@unittest.skipUnless(importlib.util.find_spec('pymongo'), '需要安装pymongo')
+class ConversationManagerSmokeTest(unittest.TestCase):
+    """对话管理器构造冒烟测试"""
+
+    def test_construct_and_close_without_database(self):
+        from core.conversation_manager import ConversationManager
+
+        config = _FakeConfig({('MONGODB_SETTINGS', 'enable_database'): False})
+        manager = ConversationManager(
+            config_manager=config,
+            asr_service=_FakeService('fake-asr'),
+            ai_service=_FakeService('fake-ai'),
+        )
+        try:
+            self.assertFalse(manager.enable_database)
+            self.assertEqual(manager.conversation_count, 0)
+            self.assertIsNone(manager._pending_stream_tts)
+        finally:
+            manager.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
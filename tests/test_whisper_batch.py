@@ -0,0 +1,99 @@
+"""
+Whisper批量识别测试
+使用假的whisper/torch模块，验证新旧版本log_mel_spectrogram接口下的批量识别流程
+"""
+
+import types
+import unittest
+from unittest import mock
+
+try:
+    import speech_recognition as sr
+    from services.whisper_asr_service import WhisperASRService
+except ImportError:  # 未安装语音识别相关依赖
+    WhisperASRService = None
+
+
+def _fake_whisper(log_mel_spectrogram):
+    """构造只包含批量识别用到的接口的假whisper模块"""
+    def decode(model, mel_batch, options):
+        return [types.SimpleNamespace(text=f" 第{i}段 ") for i in range(len(mel_batch.items))]
+
+    module = types.ModuleType('whisper')
+    module.pad_or_trim = lambda audio: audio
+    module.log_mel_spectrogram = log_mel_spectrogram
+    module.DecodingOptions = lambda **kwargs: kwargs
+    module.decode = decode
+    return module
+
+
+def _fake_torch():
+    """构造只包含torch.stack的假torch模块"""
+    class _Batch:
+        def __init__(self, items):
+            self.items = items
+
+        def to(self, device):
+            return self
+
+    module = types.ModuleType('torch')
+    module.stack = lambda items: _Batch(list(items))
+    return module
+
+
+@unittest.skipIf(WhisperASRService is None, '需要安装ASR服务依赖')
+class WhisperBatchRecognitionTest(unittest.TestCase):
+    """WhisperASRService.recognize_batch 测试"""
+
+    def _make_service(self, n_mels):
+        # 跳过__init__（需要麦克风和模型），只设置批量识别用到的属性
+        service = WhisperASRService.__new__(WhisperASRService)
+        service.use_api = False
+        service.whisper_model = types.SimpleNamespace(
+            dims=types.SimpleNamespace(n_mels=n_mels),
+            device=types.SimpleNamespace(type='cpu')
+        )
+        service.usage_stats = {'total_recognitions': 0, 'successful_recognitions': 0, 'local_calls': 0}
+        return service
+
+    def _audio_list(self, count):
+        return [sr.AudioData(b'\x00\x00' * 1600, 16000, 2) for _ in range(count)]
+
+    def test_old_whisper_without_n_mels_argument(self):
+        calls = []
+
+        def log_mel_spectrogram(audio, padding=0):
+            calls.append({})
+            return audio
+
+        service = self._make_service(80)
+        with mock.patch.dict('sys.modules', whisper=_fake_whisper(log_mel_spectrogram),
+                             torch=_fake_torch()):
+            texts = service.recognize_batch(self._audio_list(3), language='zh')
+
+        self.assertEqual(texts, ['第0段', '第1段', '第2段'])
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(service.usage_stats['successful_recognitions'], 3)
+
+    def test_new_whisper_passes_model_n_mels(self):
+        calls = []
+
+        def log_mel_spectrogram(audio, n_mels=80, padding=0):
+            calls.append({'n_mels': n_mels})
+            return audio
+
+        service = self._make_service(128)
+        with mock.patch.dict('sys.modules', whisper=_fake_whisper(log_mel_spectrogram),
+                             torch=_fake_torch()):
+            texts = service.recognize_batch(self._audio_list(2))
+
+        self.assertEqual(texts, ['第0段', '第1段'])
+        self.assertEqual(calls, [{'n_mels': 128}, {'n_mels': 128}])
+
+    def test_empty_batch(self):
+        service = self._make_service(80)
+        self.assertEqual(service.recognize_batch([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,13 @@
 """
-工具模块 - 提供配置管理、菜单工具、依赖检查、数据库管理等功能
+工具模块 - 提供配置管理、菜单工具、依赖检查、数据库管理、日志等功能
 """
 
 from .config_manager import ConfigManager
 from .menu_helper import MenuHelper
 from .dependency_checker import DependencyChecker
 from .database_manager import DatabaseManager
+from .response_cache import SemanticResponseCache
+from .log import get_logger, flush_logs
 
-__all__ = ['ConfigManager', 'MenuHelper', 'DependencyChecker', 'DatabaseManager'] 
\ No newline at end of file
+__all__ = ['ConfigManager', 'MenuHelper', 'DependencyChecker', 'DatabaseManager',
+           'SemanticResponseCache', 'get_logger', 'flush_logs'] 
\ No newline at end of file
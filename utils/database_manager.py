@@ -5,20 +5,58 @@ MongoDB数据库管理器 - 单例模式
 
 import os
 import time
+import threading
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Any
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, IndexModel, InsertOne, UpdateOne, ASCENDING, DESCENDING
+from pymongo.write_concern import WriteConcern
 from pymongo.database import Database
 from pymongo.collection import Collection
+from pymongo.client_session import ClientSession
 from pymongo.errors import (
     ConnectionFailure, 
     ServerSelectionTimeoutError, 
     DuplicateKeyError,
+    BulkWriteError,
     PyMongoError
 )
 from utils.config_manager import ConfigManager
 
 
+# 进程内共享的MongoDB客户端（每个客户端自带连接池，应在进程内复用）
+_shared_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+
+def get_mongo_client(connection_string: str, **client_kwargs) -> MongoClient:
+    """
+    获取进程内共享的MongoDB客户端，不存在时创建
+    
+    Args:
+        connection_string: MongoDB连接字符串
+        **client_kwargs: MongoClient参数，仅首次创建时生效
+        
+    Returns:
+        共享的MongoClient实例
+    """
+    global _shared_client
+    with _client_lock:
+        if _shared_client is None:
+            options = {'maxPoolSize': 8, 'minPoolSize': 1, 'retryWrites': True}
+            options.update(client_kwargs)
+            _shared_client = MongoClient(connection_string, **options)
+        return _shared_client
+
+
+def close_mongo_client():
+    """关闭共享的MongoDB客户端"""
+    global _shared_client
+    with _client_lock:
+        if _shared_client is not None:
+            _shared_client.close()
+            _shared_client = None
+
+
 class DatabaseManager:
     """MongoDB数据库管理器 - 单例模式"""
     
@@ -27,16 +65,25 @@ class DatabaseManager:
     _database: Optional[Database] = None
     _config: Optional[ConfigManager] = None
     
-    def __new__(cls, config_manager: ConfigManager = None):
-        """单例模式实现"""
+    def __new__(cls, config_manager: ConfigManager = None,
+                client_kwargs: Dict[str, Any] = None):
+        """
+        单例模式实现
+        
+        Args:
+            config_manager: 配置管理器
+            client_kwargs: 额外的MongoClient参数（如连接池设置），仅首次创建时生效
+        """
         if cls._instance is None:
             cls._instance = super(DatabaseManager, cls).__new__(cls)
-            cls._instance._initialize(config_manager)
+            cls._instance._initialize(config_manager, client_kwargs)
         return cls._instance
     
-    def _initialize(self, config_manager: ConfigManager):
+    def _initialize(self, config_manager: ConfigManager,
+                    client_kwargs: Dict[str, Any] = None):
         """初始化数据库管理器"""
         self._config = config_manager or ConfigManager()
+        self._client_kwargs = dict(client_kwargs or {})
         self._connection_string = None
         self._database_name = None
         self._is_connected = False
@@ -49,6 +96,12 @@ class DatabaseManager:
             'failed_operations': 0
         }
         
+        # 待批量写入的聊天记录和会话更新
+        self._pending_chat_docs: List[Dict] = []
+        self._pending_session_updates: Dict[str, Dict] = {}
+        self._last_flush = time.monotonic()
+        self._write_lock = threading.Lock()
+        
         # 从配置文件加载设置
         self._load_config()
         
@@ -76,6 +129,16 @@ class DatabaseManager:
         self._data_retention_days = self._config.get_int(
             'MONGODB_SETTINGS', 'data_retention_days', 30
         )
+        self._write_batch_size = self._config.get_int(
+            'MONGODB_SETTINGS', 'write_batch_size', 8
+        )
+        self._write_flush_interval = self._config.get_float(
+            'MONGODB_SETTINGS', 'write_flush_interval', 2.0
+        )
+        # w=0写入需显式开启：服务器不返回写入结果，失败的记录不会被重试
+        self._unacknowledged_writes = self._config.get_bool(
+            'MONGODB_SETTINGS', 'unacknowledged_writes', False
+        )
     
     def _connect(self):
         """连接到MongoDB数据库"""
@@ -83,14 +146,13 @@ class DatabaseManager:
             print("🔌 正在连接MongoDB数据库...")
             self._stats['connection_attempts'] += 1
             
-            # 创建MongoDB客户端
-            self._client = MongoClient(
-                self._connection_string,
-                connectTimeoutMS=self._connection_timeout,
-                serverSelectionTimeoutMS=self._server_selection_timeout,
-                maxPoolSize=50,
-                retryWrites=True
-            )
+            # 获取共享的MongoDB客户端（调用方传入的参数覆盖默认值）
+            client_kwargs = {
+                'connectTimeoutMS': self._connection_timeout,
+                'serverSelectionTimeoutMS': self._server_selection_timeout
+            }
+            client_kwargs.update(self._client_kwargs)
+            self._client = get_mongo_client(self._connection_string, **client_kwargs)
             
             # 测试连接
             self._client.admin.command('ping')
@@ -107,7 +169,7 @@ class DatabaseManager:
             
             # 创建索引
             if self._auto_create_indexes:
-                self._create_indexes()
+                self.ensure_indexes()
             
         except (ConnectionFailure, ServerSelectionTimeoutError) as e:
             self._stats['failed_connections'] += 1
@@ -118,37 +180,66 @@ class DatabaseManager:
             print(f"❌ MongoDB初始化失败: {e}")
             self._is_connected = False
     
-    def _create_indexes(self):
-        """创建数据库索引"""
+    # 旧版本创建、已被复合索引取代的索引：集合名 -> 索引名
+    _LEGACY_INDEXES = {
+        'chat_records': ('user_id_1',),
+        'sessions': ('user_id_1_created_at_-1',),
+    }
+    
+    def ensure_indexes(self) -> bool:
+        """
+        创建/确认数据库索引（幂等）
+        
+        复合索引按照 等值-排序-范围(ESR) 顺序定义，
+        使按会话/用户查询并按时间排序只需一次索引遍历；
+        同时删除旧版本留下的冗余索引，写入时不再维护它们
+        
+        Returns:
+            是否创建成功
+        """
         try:
             print("🔧 创建数据库索引...")
             
-            # 聊天记录索引
+            # 聊天记录索引：会话历史 / 用户统计 / 过期清理
             chat_collection = self.get_collection('chat_records')
-            chat_collection.create_index([
-                ('session_id', ASCENDING),
-                ('timestamp', DESCENDING)
+            chat_collection.create_indexes([
+                IndexModel([('session_id', ASCENDING), ('timestamp', DESCENDING)]),
+                IndexModel([('user_id', ASCENDING), ('timestamp', DESCENDING)]),
+                IndexModel([('timestamp', ASCENDING)])
             ])
-            chat_collection.create_index('user_id')
-            chat_collection.create_index('timestamp')
             
             # 用户信息索引
             user_collection = self.get_collection('users')
-            user_collection.create_index('user_id', unique=True)
-            user_collection.create_index('created_at')
+            user_collection.create_indexes([
+                IndexModel([('user_id', ASCENDING)], unique=True),
+                IndexModel([('created_at', ASCENDING)])
+            ])
             
             # 会话信息索引
             session_collection = self.get_collection('sessions')
-            session_collection.create_index('session_id', unique=True)
-            session_collection.create_index([
-                ('user_id', ASCENDING),
-                ('created_at', DESCENDING)
+            session_collection.create_indexes([
+                IndexModel([('session_id', ASCENDING)], unique=True),
+                IndexModel([('user_id', ASCENDING), ('updated_at', DESCENDING)])
             ])
             
+            self._drop_legacy_indexes()
+            
             print("✅ 数据库索引创建完成")
+            return True
             
         except Exception as e:
             print(f"⚠️ 索引创建失败: {e}")
+            return False
+    
+    def _drop_legacy_indexes(self):
+        """删除旧版本创建的冗余索引（不存在时跳过）"""
+        for collection_name, index_names in self._LEGACY_INDEXES.items():
+            collection = self.get_collection(collection_name)
+            existing = collection.index_information()
+            for index_name in index_names:
+                if index_name in existing:
+                    collection.drop_index(index_name)
+                    print(f"🧹 删除冗余索引 {collection_name}.{index_name}")
     
     def is_connected(self) -> bool:
         """检查数据库连接状态"""
@@ -169,6 +260,12 @@ class DatabaseManager:
             return None
         return self._database
     
+    def get_client(self) -> Optional[MongoClient]:
+        """获取MongoDB客户端实例（用于会话/事务）"""
+        if not self.is_connected():
+            return None
+        return self._client
+    
     def get_collection(self, collection_name: str = None) -> Optional[Collection]:
         """获取集合实例"""
         if not self.is_connected():
@@ -208,24 +305,11 @@ class DatabaseManager:
         try:
             self._stats['total_operations'] += 1
             
-            # 生成会话ID（如果没有提供）
-            if session_id is None:
-                session_id = f"session_{int(time.time())}"
-            
             # 构建聊天记录
-            chat_record = {
-                'session_id': session_id,
-                'user_id': user_id,
-                'user_message': user_message,
-                'ai_response': ai_response,
-                'timestamp': datetime.utcnow(),
-                'services': {
-                    'asr': asr_service,
-                    'ai': ai_service,
-                    'tts': tts_service
-                },
-                'metadata': metadata or {}
-            }
+            chat_record = self._build_chat_record(
+                user_message, ai_response, session_id, user_id,
+                asr_service, ai_service, tts_service, metadata
+            )
             
             # 保存到数据库
             collection = self.get_collection('chat_records')
@@ -242,8 +326,218 @@ class DatabaseManager:
         
         return False
     
+    def _build_chat_record(self, user_message: str, ai_response: str,
+                           session_id: str = None, user_id: str = "default",
+                           asr_service: str = None, ai_service: str = None,
+                           tts_service: str = None, metadata: Dict = None,
+                           timestamp: datetime = None) -> Dict:
+        """构建聊天记录文档"""
+        # 生成会话ID（如果没有提供）
+        if session_id is None:
+            session_id = f"session_{int(time.time())}"
+        
+        return {
+            'session_id': session_id,
+            'user_id': user_id,
+            'user_message': user_message,
+            'ai_response': ai_response,
+            'timestamp': timestamp or datetime.utcnow(),
+            'services': {
+                'asr': asr_service,
+                'ai': ai_service,
+                'tts': tts_service
+            },
+            'metadata': metadata or {}
+        }
+    
+    def save_chat_records_bulk(self, records: List[Dict], batch_size: int = 100,
+                               client_session: ClientSession = None) -> int:
+        """
+        批量保存聊天记录（每批一次insert_many往返）
+        
+        Args:
+            records: 聊天记录参数字典列表，键与save_chat_record的参数相同
+            batch_size: 每批插入的文档数
+            client_session: 事务会话（提供时出错将向上抛出以便回滚）
+            
+        Returns:
+            成功插入的记录数
+        """
+        if not records or not self.is_connected():
+            return 0
+        
+        try:
+            self._stats['total_operations'] += 1
+            
+            # 同一批记录共用一个时间戳
+            now = datetime.utcnow()
+            docs = [self._build_chat_record(**{'timestamp': now, **record})
+                    for record in records]
+            
+            collection = self.get_collection('chat_records')
+            inserted_count = 0
+            for start in range(0, len(docs), batch_size):
+                result = collection.insert_many(
+                    docs[start:start + batch_size],
+                    ordered=False,
+                    session=client_session
+                )
+                inserted_count += len(result.inserted_ids)
+            
+            self._stats['successful_operations'] += 1
+            return inserted_count
+            
+        except Exception as e:
+            self._stats['failed_operations'] += 1
+            if client_session is not None:
+                raise
+            print(f"❌ 批量保存聊天记录失败: {e}")
+        
+        return 0
+    
+    def queue_chat_record(self, user_message: str, ai_response: str,
+                          session_id: str = None, user_id: str = "default",
+                          asr_service: str = None, ai_service: str = None,
+                          tts_service: str = None, metadata: Dict = None,
+                          session_updates: Dict = None):
+        """
+        将聊天记录加入写入缓冲，攒够一批或超过刷新间隔时批量写入
+        
+        Args:
+            user_message: 用户消息
+            ai_response: AI回复
+            session_id: 会话ID
+            user_id: 用户ID
+            asr_service: ASR服务名称
+            ai_service: AI服务名称
+            tts_service: TTS服务名称
+            metadata: 附加元数据
+            session_updates: 需要同时更新到会话上的字段
+        """
+        chat_record = self._build_chat_record(
+            user_message, ai_response, session_id, user_id,
+            asr_service, ai_service, tts_service, metadata
+        )
+        with self._write_lock:
+            self._pending_chat_docs.append(chat_record)
+            self._pending_session_updates.setdefault(
+                chat_record['session_id'], {}
+            ).update(session_updates or {})
+            
+            should_flush = (len(self._pending_chat_docs) >= self._write_batch_size or
+                            time.monotonic() - self._last_flush >= self._write_flush_interval)
+        
+        if should_flush:
+            self.flush_pending_writes()
+    
+    def flush_if_due(self) -> int:
+        """
+        缓冲中有记录且已超过刷新间隔时写入（供空闲时周期调用）
+        
+        Returns:
+            写入的聊天记录数
+        """
+        if (self._pending_chat_docs and
+                time.monotonic() - self._last_flush >= self._write_flush_interval):
+            return self.flush_pending_writes()
+        return 0
+    
+    def flush_pending_writes(self, wait_for_ack: bool = False) -> int:
+        """
+        批量写入缓冲中的聊天记录和会话更新
+        
+        聊天记录用一次bulk_write写入；每个会话的消息数用$inc累加
+        
+        Args:
+            wait_for_ack: 是否等待服务器确认（随后需要读取这些数据或即将关闭连接时使用）
+            
+        Returns:
+            写入的聊天记录数
+        """
+        self._last_flush = time.monotonic()
+        if not self._pending_chat_docs or not self.is_connected():
+            return 0
+        
+        with self._write_lock:
+            docs, self._pending_chat_docs = self._pending_chat_docs, []
+            session_updates, self._pending_session_updates = self._pending_session_updates, {}
+        if not docs:
+            return 0
+        
+        try:
+            self._stats['total_operations'] += 1
+            
+            write_concern = None
+            if self._unacknowledged_writes and not wait_for_ack:
+                write_concern = WriteConcern(w=0)
+            
+            chat_collection = self.get_collection('chat_records').with_options(
+                write_concern=write_concern
+            )
+            try:
+                chat_collection.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+            except BulkWriteError as e:
+                # 重新写入时，上次已写入的记录会报重复键错误（代码11000），视为写入成功
+                details = e.details or {}
+                if (details.get('writeConcernErrors') or
+                        any(error.get('code') != 11000 for error in details.get('writeErrors', []))):
+                    raise
+            
+        except Exception as e:
+            # 聊天记录未能写入：放回缓冲，下次写入时重试
+            self._stats['failed_operations'] += 1
+            self._requeue_pending_writes(docs, session_updates)
+            print(f"❌ 批量写入聊天记录失败，{len(docs)} 条记录将在下次写入时重试: {e}")
+            return 0
+        
+        # 每个会话新增的消息数
+        message_counts: Dict[str, int] = {}
+        for doc in docs:
+            message_counts[doc['session_id']] = message_counts.get(doc['session_id'], 0) + 1
+        
+        try:
+            now = datetime.utcnow()
+            session_collection = self.get_collection('sessions').with_options(
+                write_concern=write_concern
+            )
+            session_collection.bulk_write([
+                UpdateOne(
+                    {'session_id': session_id},
+                    {
+                        '$inc': {'message_count': count},
+                        '$set': {**session_updates.get(session_id, {}), 'updated_at': now}
+                    }
+                )
+                for session_id, count in message_counts.items()
+            ], ordered=False)
+        except Exception as e:
+            # 聊天记录已写入，只有会话统计未更新，不再重试（避免重复累加消息数）
+            self._stats['failed_operations'] += 1
+            print(f"⚠️ 聊天记录已写入，但 {len(message_counts)} 个会话的统计更新失败: {e}")
+            return len(docs)
+        
+        self._stats['successful_operations'] += 1
+        return len(docs)
+    
+    def _requeue_pending_writes(self, docs: List[Dict], session_updates: Dict[str, Dict]):
+        """
+        将写入失败的聊天记录和会话更新放回缓冲（排在新记录之前）
+        
+        Args:
+            docs: 聊天记录
+            session_updates: 会话更新字段
+        """
+        with self._write_lock:
+            self._pending_chat_docs[:0] = docs
+            for session_id, updates in session_updates.items():
+                # 缓冲中较新的更新优先
+                self._pending_session_updates[session_id] = {
+                    **updates, **self._pending_session_updates.get(session_id, {})
+                }
+    
     def get_chat_history(self, session_id: str = None, user_id: str = None,
-                        limit: int = 50, offset: int = 0) -> List[Dict]:
+                        limit: int = 50, offset: int = 0,
+                        projection: Dict = None, count_only: bool = False):
         """
         获取聊天历史记录
         
@@ -252,12 +546,17 @@ class DatabaseManager:
             user_id: 用户ID
             limit: 返回记录数限制
             offset: 偏移量
+            projection: 返回字段投影（None表示返回全部字段）
+            count_only: 只返回匹配的记录数
             
         Returns:
-            聊天记录列表
+            聊天记录列表；count_only为True时返回记录数
         """
         if not self.is_connected():
-            return []
+            return 0 if count_only else []
+        
+        # 先写入缓冲中的记录，保证能读到最新数据
+        self.flush_pending_writes(wait_for_ack=True)
         
         try:
             collection = self.get_collection('chat_records')
@@ -269,8 +568,11 @@ class DatabaseManager:
             if user_id:
                 query['user_id'] = user_id
             
+            if count_only:
+                return collection.count_documents(query)
+            
             # 执行查询
-            cursor = collection.find(query).sort('timestamp', DESCENDING)
+            cursor = collection.find(query, projection).sort('timestamp', DESCENDING)
             
             if offset > 0:
                 cursor = cursor.skip(offset)
@@ -287,7 +589,7 @@ class DatabaseManager:
             
         except Exception as e:
             print(f"❌ 获取聊天历史失败: {e}")
-            return []
+            return 0 if count_only else []
     
     def create_session(self, user_id: str = "default", 
                       session_name: str = None) -> Optional[str]:
@@ -329,8 +631,16 @@ class DatabaseManager:
         
         return None
     
-    def update_session(self, session_id: str, **updates):
-        """更新会话信息"""
+    def update_session(self, session_id: str, client_session: ClientSession = None,
+                       **updates):
+        """
+        更新会话信息
+        
+        Args:
+            session_id: 会话ID
+            client_session: 事务会话（提供时出错将向上抛出以便回滚）
+            **updates: 要更新的字段
+        """
         if not self.is_connected():
             return False
         
@@ -340,12 +650,15 @@ class DatabaseManager:
             
             result = collection.update_one(
                 {'session_id': session_id},
-                {'$set': updates}
+                {'$set': updates},
+                session=client_session
             )
             
             return result.modified_count > 0
             
         except Exception as e:
+            if client_session is not None:
+                raise
             print(f"❌ 更新会话失败: {e}")
             return False
     
@@ -354,6 +667,8 @@ class DatabaseManager:
         if not self.is_connected():
             return {}
         
+        self.flush_pending_writes(wait_for_ack=True)
+        
         try:
             collection = self.get_collection('chat_records')
             
@@ -412,6 +727,7 @@ class DatabaseManager:
         }
         
         if self.is_connected():
+            self.flush_pending_writes(wait_for_ack=True)
             try:
                 # 获取集合统计
                 collections_stats = {}
@@ -451,7 +767,11 @@ class DatabaseManager:
         """关闭数据库连接"""
         if self._client:
             try:
-                self._client.close()
+                # 最后一批记录等待服务器确认后再关闭连接，写入失败时可以看到错误
+                self.flush_pending_writes(wait_for_ack=True)
+                if self._pending_chat_docs:
+                    print(f"⚠️ {len(self._pending_chat_docs)} 条聊天记录未能写入数据库")
+                close_mongo_client()
                 print("🔌 MongoDB连接已关闭")
             except:
                 pass
@@ -4,7 +4,9 @@
 
 import sys
 import subprocess
+from functools import lru_cache
 from typing import List, Dict, Tuple
+import importlib
 import importlib.util
 
 
@@ -70,10 +72,11 @@ class DependencyChecker:
         
         return status
     
-    @classmethod
-    def _is_package_installed(cls, module_name: str) -> bool:
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _is_package_installed(module_name: str) -> bool:
         """
-        检查单个包是否已安装
+        检查单个包是否已安装（只查找模块，不执行模块代码；结果会被缓存）
         
         Args:
             module_name: 模块名称
@@ -82,10 +85,13 @@ class DependencyChecker:
             bool: 是否已安装
         """
         try:
-            # 尝试导入模块
+            # 子模块的查找会导入父包，父包不存在时直接返回
+            top_level = module_name.partition('.')[0]
+            if top_level != module_name and importlib.util.find_spec(top_level) is None:
+                return False
             spec = importlib.util.find_spec(module_name)
             return spec is not None
-        except (ImportError, ModuleNotFoundError, AttributeError):
+        except (ImportError, ModuleNotFoundError, AttributeError, ValueError):
             return False
     
     @classmethod
@@ -128,6 +134,9 @@ class DependencyChecker:
                 check=True
             )
             print(f"✅ {package_name} 安装成功")
+            # 安装后清除查找缓存，重新检查时能找到新安装的包
+            importlib.invalidate_caches()
+            cls._is_package_installed.cache_clear()
             return True
         except subprocess.CalledProcessError as e:
             print(f"❌ {package_name} 安装失败：{e}")
@@ -0,0 +1,58 @@
+"""
+日志工具 - 带缓冲的控制台输出
+对话热路径上的输出先写入内存缓冲，在阶段边界或出现警告时统一写到控制台
+"""
+
+import os
+import sys
+import logging
+import threading
+from logging.handlers import MemoryHandler
+
+# 对话日志器名称
+_LOGGER_NAME = 'chat'
+
+# 缓冲条数上限，超过后自动写出
+_BUFFER_CAPACITY = 64
+
+_handler: MemoryHandler = None
+_lock = threading.Lock()
+
+
+def get_logger(name: str = None) -> logging.Logger:
+    """
+    获取对话日志器，首次调用时配置缓冲处理器
+    
+    INFO级别的输出会被缓冲；WARNING及以上级别会立即写出（连同之前缓冲的内容）
+    输出级别可通过环境变量LOGLEVEL调整（默认INFO），低于该级别的日志不会进行字符串格式化
+    
+    Args:
+        name: 子日志器名称（可选）
+    
+    Returns:
+        日志器实例
+    """
+    global _handler
+    logger = logging.getLogger(_LOGGER_NAME)
+    
+    with _lock:
+        if _handler is None:
+            console = logging.StreamHandler(sys.stdout)
+            console.setFormatter(logging.Formatter('%(message)s'))
+            _handler = MemoryHandler(
+                capacity=_BUFFER_CAPACITY,
+                flushLevel=logging.WARNING,
+                target=console
+            )
+            logger.addHandler(_handler)
+            level = logging.getLevelName(os.environ.get('LOGLEVEL', 'INFO').upper())
+            logger.setLevel(level if isinstance(level, int) else logging.INFO)
+            logger.propagate = False
+    
+    return logger.getChild(name) if name else logger
+
+
+def flush_logs():
+    """立即写出缓冲中的日志（在等待用户输入或开始播放前调用）"""
+    if _handler is not None:
+        _handler.flush()
@@ -35,19 +35,21 @@ class MenuHelper:
         print("\n🎤 选择ASR语音识别服务：")
         options = {
             "1": ("传统ASR", "traditional", "基于Google/PocketSphinx，快速启动"),
-            "2": ("Whisper ASR", "whisper", "OpenAI Whisper，高精度识别")
+            "2": ("Whisper ASR", "whisper", "OpenAI Whisper，高精度识别"),
+            "3": ("Whisper ONNX", "whisper_ort", "ONNX Runtime推理，CPU上更快"),
+            "4": ("faster-whisper", "faster_whisper", "CTranslate2 int8推理，本地离线识别")
         }
         
         for key, (name, _, desc) in options.items():
             print(f"{key}. {name} ({desc})")
         
-        choice = input("请选择（1或2）：").strip()
+        choice = input("请选择（1-4）：").strip()
         
         if choice in options:
             name, asr_type, _ = options[choice]
             print(f"\n💡 选择了{name}")
             
-            if choice == "2":
+            if choice in ("2", "3", "4"):
                 MenuHelper._show_whisper_guide()
                 
             return asr_type
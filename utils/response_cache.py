@@ -0,0 +1,257 @@
+"""
+AI回复缓存 - 基于文本相似度的语义缓存
+相似或重复的提问直接返回缓存的回复，跳过AI服务调用
+"""
+
+import os
+import json
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Optional
+from utils.config_manager import ConfigManager
+
+
+class SemanticResponseCache:
+    """
+    AI回复语义缓存
+    
+    配置了句向量模型（sentence-transformers）时，用归一化句向量矩阵做一次矩阵-向量乘法找出最相似的提问；
+    否则使用字符二元组的余弦相似度。条目按最近使用顺序淘汰（LRU）
+    """
+    
+    # 计算相似度前忽略的字符
+    _IGNORED_CHARS = set(" \t\r\n，。！？、；：,.!?;:\"'“”‘’（）()…~～")
+    
+    def __init__(self, similarity_threshold: float = 0.9, max_entries: int = 1000,
+                 cache_file: Optional[str] = None, embedding_model: Optional[str] = None):
+        """
+        初始化回复缓存
+        
+        Args:
+            similarity_threshold: 命中缓存所需的最小相似度 (0-1)
+            max_entries: 最大缓存条目数
+            cache_file: 持久化文件路径（None表示不持久化）
+            embedding_model: 句向量模型名称（None表示使用字符n-gram相似度）
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.cache_file = cache_file
+        # 提问 -> (向量, 回复)，按最近使用排序
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        
+        # 句向量模式下的向量矩阵及对应的提问（条目增删后重建）
+        self._encoder = None
+        self._matrix = None
+        self._matrix_keys = []
+        if embedding_model:
+            self._load_encoder(embedding_model)
+        
+        if self.cache_file:
+            self.load()
+    
+    @classmethod
+    def from_config(cls, config_manager: ConfigManager) -> Optional['SemanticResponseCache']:
+        """
+        根据配置创建缓存
+        
+        Args:
+            config_manager: 配置管理器
+        
+        Returns:
+            缓存实例；未启用时返回None
+        """
+        if not config_manager.get_bool('AI_CACHE', 'enable_semantic_cache', False):
+            return None
+        
+        return cls(
+            similarity_threshold=config_manager.get_float('AI_CACHE', 'similarity_threshold', 0.9),
+            max_entries=config_manager.get_int('AI_CACHE', 'max_entries', 1000),
+            cache_file=config_manager.get_string(
+                'AI_CACHE', 'cache_file', 'data/cache/ai_response_cache.json'
+            ) or None,
+            embedding_model=config_manager.get_string('AI_CACHE', 'embedding_model', '') or None
+        )
+    
+    def _load_encoder(self, model_name: str):
+        """
+        加载句向量模型，依赖缺失或加载失败时保持字符n-gram模式
+        
+        Args:
+            model_name: sentence-transformers模型名称或路径
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+            
+            self._encoder = SentenceTransformer(model_name)
+            print(f"✅ AI回复缓存句向量模型加载成功：{model_name}")
+        except ImportError:
+            print("⚠️ 未安装sentence-transformers，AI回复缓存使用字符相似度")
+        except Exception as e:
+            print(f"⚠️ 句向量模型加载失败，AI回复缓存使用字符相似度：{e}")
+    
+    def _encode(self, text: str):
+        """
+        计算提问的向量（句向量模式为归一化numpy向量，否则为n-gram稀疏向量）
+        
+        Args:
+            text: 输入文本
+        
+        Returns:
+            向量；文本无有效内容时返回None
+        """
+        if self._encoder is not None:
+            if not text.strip():
+                return None
+            return self._encoder.encode(text, normalize_embeddings=True, convert_to_numpy=True)
+        return self._embed(text) or None
+    
+    @classmethod
+    def _embed(cls, text: str) -> Dict[str, float]:
+        """
+        将文本转换为归一化的字符二元组向量
+        
+        Args:
+            text: 输入文本
+        
+        Returns:
+            稀疏向量 {n-gram: 权重}
+        """
+        chars = [c for c in text.lower() if c not in cls._IGNORED_CHARS]
+        if len(chars) < 2:
+            grams = Counter(chars)
+        else:
+            grams = Counter(a + b for a, b in zip(chars, chars[1:]))
+        
+        norm = math.sqrt(sum(count * count for count in grams.values()))
+        if not norm:
+            return {}
+        return {gram: count / norm for gram, count in grams.items()}
+    
+    @staticmethod
+    def _similarity(vec_a: Dict[str, float], vec_b: Dict[str, float]) -> float:
+        """计算两个归一化稀疏向量的余弦相似度"""
+        if len(vec_a) > len(vec_b):
+            vec_a, vec_b = vec_b, vec_a
+        return sum(weight * vec_b.get(gram, 0.0) for gram, weight in vec_a.items())
+    
+    def lookup(self, text: str) -> Optional[str]:
+        """
+        查找相似提问的缓存回复
+        
+        Args:
+            text: 用户消息
+        
+        Returns:
+            缓存的回复；未命中返回None
+        """
+        vec = self._encode(text)
+        if vec is None:
+            return None
+        
+        best_score = 0.0
+        best_key = None
+        with self._lock:
+            if self._encoder is not None:
+                matrix = self._get_matrix()
+                if matrix is not None:
+                    scores = matrix @ vec
+                    index = int(scores.argmax())
+                    best_score = float(scores[index])
+                    best_key = self._matrix_keys[index]
+            else:
+                for key, (entry_vec, _) in self._entries.items():
+                    score = self._similarity(vec, entry_vec)
+                    if score > best_score:
+                        best_score = score
+                        best_key = key
+            
+            if best_key is not None and best_score >= self.similarity_threshold:
+                self._entries.move_to_end(best_key)
+                self.hits += 1
+                return self._entries[best_key][1]
+        
+        self.misses += 1
+        return None
+    
+    def _get_matrix(self):
+        """获取所有条目的向量矩阵（需持有锁），条目变化后重新堆叠"""
+        if self._matrix is None and self._entries:
+            import numpy as np
+            
+            self._matrix_keys = list(self._entries)
+            self._matrix = np.stack([self._entries[key][0] for key in self._matrix_keys])
+        return self._matrix
+    
+    def add(self, text: str, response: str):
+        """
+        添加缓存条目
+        
+        Args:
+            text: 用户消息
+            response: AI回复
+        """
+        if not response:
+            return
+        vec = self._encode(text)
+        if vec is None:
+            return
+        self._insert(text, vec, response)
+    
+    def _insert(self, text: str, vec, response: str):
+        """写入条目，超出容量时淘汰最久未使用的条目"""
+        with self._lock:
+            self._entries[text] = (vec, response)
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+    
+    def load(self):
+        """从持久化文件加载缓存"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+            
+            items = [item for item in items[-self.max_entries:] if item.get('response')]
+            if self._encoder is not None and items:
+                # 句向量模式下批量编码，加快加载
+                vecs = self._encoder.encode([item['query'] for item in items],
+                                            normalize_embeddings=True, convert_to_numpy=True)
+                for item, vec in zip(items, vecs):
+                    self._insert(item['query'], vec, item['response'])
+            else:
+                for item in items:
+                    self.add(item['query'], item['response'])
+            
+            print(f"✅ AI回复缓存加载成功：{len(self._entries)} 条")
+        except Exception as e:
+            print(f"⚠️ AI回复缓存加载失败：{e}")
+    
+    def save(self):
+        """将缓存写入持久化文件"""
+        if not self.cache_file:
+            return
+        
+        with self._lock:
+            items = [{'query': text, 'response': response}
+                     for text, (_, response) in self._entries.items()]
+        
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(items, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"⚠️ AI回复缓存保存失败：{e}")
+    
+    def __len__(self) -> int:
+        return len(self._entries)